@@ -15,7 +15,7 @@ if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
 from models.base import Base
-from models import event, ticket, ticket_type, checkin, staff, staff_event  # 你有幾個 model 就 import 幾個
+from models import event, ticket, ticket_type, checkin, staff, staff_event, ticket_counter, idempotency_key, snowflake_worker_lease, rate_limit_bucket  # 你有幾個 model 就 import 幾個
 
 target_metadata = Base.metadata
 # other values from the config, defined by the needs of env.py,
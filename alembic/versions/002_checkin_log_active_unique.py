@@ -0,0 +1,57 @@
+"""Index checkin_logs.ticket_id and enforce one active check-in per ticket
+
+Revision ID: 002_checkin_log_active_unique
+Revises: 001_init_snowflake
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '002_checkin_log_active_unique'
+down_revision: Union[str, None] = '001_init_snowflake'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """新增 ticket_id 索引與「每張票券一筆有效簽到」的部分唯一索引"""
+
+    # is_revoked 為 NULL 的舊資料視為未撤銷，部分索引條件才能涵蓋
+    op.execute("UPDATE checkin_logs SET is_revoked = false WHERE is_revoked IS NULL")
+    op.alter_column('checkin_logs', 'is_revoked', server_default=sa.text('false'))
+
+    # 既有的重複有效簽到只保留最早寫入的一筆，其餘標記為撤銷
+    op.execute("""
+        UPDATE checkin_logs AS dup
+        SET is_revoked = true, revoked_at = now()
+        FROM checkin_logs AS keep
+        WHERE dup.ticket_id = keep.ticket_id
+          AND NOT dup.is_revoked
+          AND NOT keep.is_revoked
+          AND keep.id < dup.id
+    """)
+
+    # 大型資料表上建立索引不鎖寫入
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix_checkin_logs_ticket_id'), 'checkin_logs', ['ticket_id'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            'uq_checkin_logs_active_ticket', 'checkin_logs', ['ticket_id'],
+            unique=True, postgresql_where=sa.text('NOT is_revoked'),
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """移除索引"""
+    with op.get_context().autocommit_block():
+        op.drop_index('uq_checkin_logs_active_ticket', table_name='checkin_logs', postgresql_concurrently=True)
+        op.drop_index(op.f('ix_checkin_logs_ticket_id'), table_name='checkin_logs', postgresql_concurrently=True)
+    op.alter_column('checkin_logs', 'is_revoked', server_default=None)
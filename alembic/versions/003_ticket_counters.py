@@ -0,0 +1,62 @@
+"""Add materialized per-event / per-ticket-type counters
+
+Revision ID: 003_ticket_counters
+Revises: 002_checkin_log_active_unique
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '003_ticket_counters'
+down_revision: Union[str, None] = '002_checkin_log_active_unique'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """建立 ticket_counters 並以現有資料回填（回填結果寫入 shard 0）"""
+    op.create_table(
+        'ticket_counters',
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('ticket_type_id', sa.Integer(), nullable=False),
+        sa.Column('shard', sa.Integer(), nullable=False),
+        sa.Column('issued', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('used', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('active_checkins', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('revoked', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('event_id', 'ticket_type_id', 'shard')
+    )
+
+    # 每張票券一列：是否已使用、有效與已撤銷的簽到記錄數；ticket_type_id = 0 為活動總計
+    op.execute("""
+        WITH per_ticket AS (
+            SELECT t.event_id,
+                   t.ticket_type_id,
+                   CASE WHEN t.is_used THEN 1 ELSE 0 END AS used,
+                   COUNT(l.id) FILTER (WHERE l.is_revoked IS NOT TRUE) AS active_checkins,
+                   COUNT(l.id) FILTER (WHERE l.is_revoked IS TRUE) AS revoked
+            FROM tickets t
+            LEFT JOIN checkin_logs l ON l.ticket_id = t.id
+            GROUP BY t.id
+        )
+        INSERT INTO ticket_counters (event_id, ticket_type_id, shard, issued, used, active_checkins, revoked)
+        SELECT event_id, ticket_type_id, 0, COUNT(*), SUM(used), SUM(active_checkins), SUM(revoked)
+        FROM per_ticket
+        WHERE ticket_type_id IS NOT NULL
+        GROUP BY event_id, ticket_type_id
+        UNION ALL
+        SELECT event_id, 0, 0, COUNT(*), SUM(used), SUM(active_checkins), SUM(revoked)
+        FROM per_ticket
+        GROUP BY event_id
+    """)
+
+
+def downgrade() -> None:
+    """移除 ticket_counters"""
+    op.drop_table('ticket_counters')
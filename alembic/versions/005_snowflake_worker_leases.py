@@ -0,0 +1,35 @@
+"""Add snowflake worker ID leases
+
+Revision ID: 005_snowflake_worker_leases
+Revises: 004_idempotency_keys
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_snowflake_worker_leases'
+down_revision: Union[str, None] = '004_idempotency_keys'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """建立 snowflake_worker_leases"""
+    op.create_table(
+        'snowflake_worker_leases',
+        sa.Column('worker_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('owner', sa.String(length=255), nullable=False),
+        sa.Column('last_timestamp_ms', sa.BigInteger(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('worker_id')
+    )
+
+
+def downgrade() -> None:
+    """移除 snowflake_worker_leases"""
+    op.drop_table('snowflake_worker_leases')
@@ -0,0 +1,34 @@
+"""Add shared rate limit buckets
+
+Revision ID: 006_rate_limit_buckets
+Revises: 005_snowflake_worker_leases
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006_rate_limit_buckets'
+down_revision: Union[str, None] = '005_snowflake_worker_leases'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """建立 rate_limit_buckets（UNLOGGED）"""
+    op.create_table(
+        'rate_limit_buckets',
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('tat', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+        prefixes=['UNLOGGED']
+    )
+
+
+def downgrade() -> None:
+    """移除 rate_limit_buckets"""
+    op.drop_table('rate_limit_buckets')
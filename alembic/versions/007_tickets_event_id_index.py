@@ -0,0 +1,33 @@
+"""Add tickets.event_id index
+
+Revision ID: 007_tickets_event_id_index
+Revises: 006_rate_limit_buckets
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007_tickets_event_id_index'
+down_revision: Union[str, None] = '006_rate_limit_buckets'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """新增 tickets.event_id 索引（熱門活動索引的差異同步每個刷新週期都以 event_id 查詢）"""
+    # 大型資料表上建立索引不鎖寫入
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix_tickets_event_id'), 'tickets', ['event_id'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """移除索引"""
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_tickets_event_id'), table_name='tickets', postgresql_concurrently=True)
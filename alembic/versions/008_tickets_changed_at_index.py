@@ -0,0 +1,35 @@
+"""Add tickets (event_id, last change time) index
+
+Revision ID: 008_tickets_changed_at_index
+Revises: 007_tickets_event_id_index
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '008_tickets_changed_at_index'
+down_revision: Union[str, None] = '007_tickets_event_id_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """新增 (event_id, COALESCE(updated_at, created_at)) 索引：離線清單的 ETag 與差異下載、熱門活動索引的差異同步"""
+    # 大型資料表上建立索引不鎖寫入
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_tickets_event_id_changed_at', 'tickets',
+            ['event_id', sa.text('COALESCE(updated_at, created_at)')],
+            unique=False, postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """移除索引"""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_tickets_event_id_changed_at', table_name='tickets', postgresql_concurrently=True)
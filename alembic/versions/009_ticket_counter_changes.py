@@ -0,0 +1,31 @@
+"""Add ticket_counters.changes
+
+Revision ID: 009_ticket_counter_changes
+Revises: 008_tickets_changed_at_index
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '009_ticket_counter_changes'
+down_revision: Union[str, None] = '008_tickets_changed_at_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """新增 changes（離線清單 ETag 的版本）；常數預設值只更新目錄，不改寫資料表"""
+    op.add_column(
+        'ticket_counters',
+        sa.Column('changes', sa.BigInteger(), server_default=sa.text('0'), nullable=False)
+    )
+
+
+def downgrade() -> None:
+    """移除 changes"""
+    op.drop_column('ticket_counters', 'changes')
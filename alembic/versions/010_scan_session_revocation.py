@@ -0,0 +1,30 @@
+"""Store scan-session revocations on staff / staff_events
+
+Revision ID: 010_scan_session_revocation
+Revises: 009_ticket_counter_changes
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '010_scan_session_revocation'
+down_revision: Union[str, None] = '009_ticket_counter_changes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """新增 scan_sessions_valid_after：撤銷時間記錄在資料庫，所有 worker 共用"""
+    op.add_column('staff', sa.Column('scan_sessions_valid_after', sa.DateTime(), nullable=True))
+    op.add_column('staff_events', sa.Column('scan_sessions_valid_after', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """移除 scan_sessions_valid_after"""
+    op.drop_column('staff_events', 'scan_sessions_valid_after')
+    op.drop_column('staff', 'scan_sessions_valid_after')
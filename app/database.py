@@ -1,13 +1,54 @@
 """
 數據庫連接配置
 """
+import time
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from app.config import settings
+from utils.metrics import observe_pool_wait
 
-engine = create_engine(settings.DATABASE_URL)
+
+class _PoolWaitMetricsMixin:
+    """記錄從連線池取得連線的等待時間（含池滿時的排隊）"""
+    metrics_name = ""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            observe_pool_wait(self.metrics_name, time.perf_counter() - start)
+
+
+class _InstrumentedQueuePool(_PoolWaitMetricsMixin, QueuePool):
+    metrics_name = "sync"
+
+
+class _InstrumentedAsyncQueuePool(_PoolWaitMetricsMixin, AsyncAdaptedQueuePool):
+    metrics_name = "async"
+
+
+engine = create_engine(
+    settings.DATABASE_URL,
+    poolclass=_InstrumentedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 非同步引擎（asyncpg），供高流量端點使用，不佔用 threadpool
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    poolclass=_InstrumentedAsyncQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 def get_db():
     """依賴注入：獲取數據庫 session"""
     db = SessionLocal()
@@ -15,3 +56,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    """
+    依賴注入：獲取非同步數據庫 session
+    既有的同步 service 方法可透過 `await db.run_sync(...)` 在 asyncpg 連線上執行。
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
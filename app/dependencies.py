@@ -1,18 +1,26 @@
 """
 Dependency functions for authentication and authorization.
 """
-from fastapi import Depends, HTTPException, status, Header
+import math
+import hashlib
+from typing import Optional
+from fastapi import Depends, HTTPException, status, Header, Request
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.config import settings
 from models.merchant import Merchant
 from models.staff import Staff
-from schemas.token import TokenData
+from schemas.token import TokenData, CheckInPrincipal
+from schemas.staff import StaffProfile
 from services.merchant_service import MerchantService
 from services.staff_service import StaffService
+from services.rate_limit_service import RateLimitService
+from utils.scan_session import SCAN_SESSION_TOKEN_TYPE, decode_scan_session_payload, is_scan_session_revoked
+from utils.cache import staff_principal_cache, scan_session_cache
 
 # OAuth2 scheme for staff JWT authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/staff/login")
@@ -61,50 +69,157 @@ def get_current_merchant(merchant: Merchant = Depends(require_api_key)) -> Merch
 
 # --- Dependencies for Staff JWT Authentication ---
 
-def get_current_staff(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-) -> Staff:
-    """
-    Dependency to get the current staff member from a JWT token.
-    Validates the token, decodes it, and fetches the staff user from the database.
-    """
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _decode_bearer_token(token: str) -> dict:
+    """Decodes a bearer token, raising 401 if it is invalid or expired."""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        token_data = TokenData(**payload)
-        if token_data.sub is None or token_data.type != 'staff':
-            raise credentials_exception
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
     except JWTError:
+        raise _credentials_exception()
+
+def _load_staff_from_payload(payload: dict, db: Session) -> Staff:
+    """Validates a staff login JWT payload and fetches the staff user from the database."""
+    credentials_exception = _credentials_exception()
+    token_data = TokenData(**payload)
+    if token_data.sub is None or token_data.type != 'staff':
         raise credentials_exception
-    
+
     staff = StaffService.get_staff_by_id(db, int(token_data.sub))
     if staff is None or not staff.is_active:
         raise credentials_exception
     return staff
 
-def get_current_active_staff(current_staff: Staff = Depends(get_current_staff)):
+def get_current_staff(
+    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+) -> Staff:
     """
-    Checks if the user obtained from the token is active and returns StaffProfile schema.
-    This is an additional layer, although `get_current_staff` already checks for active status.
-    It provides semantic clarity in the route dependencies.
+    Dependency to get the current staff member from a JWT token.
+    Validates the token, decodes it, and fetches the staff user from the database.
     """
-    if not current_staff.is_active:
-        raise HTTPException(status_code=400, detail="Inactive user")
-    
-    # Import here to avoid circular imports
-    from schemas.staff import StaffProfile
-    
-    # Convert Staff model to StaffProfile schema
-    return StaffProfile(
-        id=current_staff.id,
-        username=current_staff.username,
-        email=current_staff.email,
-        full_name=current_staff.full_name,
-        is_active=current_staff.is_active,
-        is_admin=current_staff.is_admin,
-        last_login=current_staff.last_login
+    return _load_staff_from_payload(_decode_bearer_token(token), db)
+
+def _build_staff_principal(payload: dict, db: Session) -> StaffProfile:
+    """Loads the staff row for a login JWT payload and stores its StaffProfile in the principal cache."""
+    staff = _load_staff_from_payload(payload, db)
+    principal = StaffProfile(
+        id=staff.id,
+        username=staff.username,
+        email=staff.email,
+        full_name=staff.full_name,
+        is_active=staff.is_active,
+        is_admin=staff.is_admin,
+        last_login=staff.last_login
     )
+    staff_principal_cache.set(payload.get("sub"), principal)
+    return principal
+
+def _get_cached_staff_principal(payload: dict) -> Optional[StaffProfile]:
+    """
+    Returns the cached StaffProfile for a login JWT payload, keyed by token subject.
+    Entries are invalidated when staff are updated or deactivated.
+    """
+    subject = payload.get("sub")
+    if subject is None or payload.get("type") != 'staff':
+        return None
+    return staff_principal_cache.get(subject)
+
+async def get_checkin_principal(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
+) -> CheckInPrincipal:
+    """
+    Dependency for check-in endpoints.
+    Accepts either a staff login JWT or an event-scoped scan-session token.
+    Scan-session tokens carry their own StaffEvent permissions; revocation is checked
+    against the staff member's revocation times, cached like the login principal.
+    Runs on the async engine so check-in requests never occupy a threadpool slot.
+    """
+    payload = _decode_bearer_token(token)
+    if payload.get("type") == SCAN_SESSION_TOKEN_TYPE:
+        session = decode_scan_session_payload(payload)
+        if session is None:
+            raise _credentials_exception()
+        staff_id, issued_at = session["staff_id"], session.pop("issued_at")
+        state = scan_session_cache.get(staff_id)
+        if state is None:
+            state = await db.run_sync(lambda sync_db: StaffService.get_scan_session_state(sync_db, staff_id))
+        if is_scan_session_revoked(state, session["event_id"], issued_at):
+            raise _credentials_exception()
+        return CheckInPrincipal(is_scan_session=True, **session)
+
+    staff = _get_cached_staff_principal(payload)
+    if staff is None:
+        staff = await db.run_sync(lambda sync_db: _build_staff_principal(payload, sync_db))
+    return CheckInPrincipal(staff_id=staff.id)
+
+def get_current_active_staff(
+    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+) -> StaffProfile:
+    """
+    Returns the StaffProfile of the active staff member identified by the JWT token.
+    Uses the principal cache, so repeated requests from the same staff member
+    do not reload the `staff` row until the cache entry expires or is invalidated.
+    """
+    payload = _decode_bearer_token(token)
+    principal = _get_cached_staff_principal(payload) or _build_staff_principal(payload, db)
+    if not principal.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+
+# --- Rate Limiting ---
+
+def _client_ip(request: Request) -> str:
+    """
+    Client address used as the rate limit key.
+    Behind RATE_LIMIT_TRUSTED_PROXIES reverse proxies, the address appended by the outermost
+    trusted proxy is used (earlier X-Forwarded-For entries are client-controlled).
+    """
+    hops = settings.RATE_LIMIT_TRUSTED_PROXIES
+    if hops > 0:
+        forwarded = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.client.host if request.client else "unknown"
+
+def _rate_limit_key(key_type: str, request: Request) -> str:
+    """Bucket key for a policy; requests without a merchant API key or valid staff token fall back to the client IP."""
+    if key_type == "merchant":
+        api_key = request.headers.get("x-api-key")
+        if api_key:
+            return "merchant:" + hashlib.sha256(api_key.encode()).hexdigest()[:32]
+    elif key_type == "staff":
+        authorization = request.headers.get("authorization", "")
+        if authorization[:7].lower() == "bearer ":
+            try:
+                subject = jwt.decode(authorization[7:], settings.SECRET_KEY, algorithms=[settings.ALGORITHM]).get("sub")
+            except JWTError:
+                subject = None
+            if subject is not None:
+                return f"staff:{subject}"
+    return _client_ip(request)
+
+def rate_limit(group: str):
+    """
+    Dependency factory enforcing the rate limit policy of a route group
+    (RATE_LIMIT_PUBLIC / RATE_LIMIT_LOGIN / RATE_LIMIT_MGMT / RATE_LIMIT_STAFF).
+    Declare it before authentication dependencies so rejected requests never touch the database.
+    Rejected requests receive 429 with a Retry-After header.
+    """
+    async def check_rate_limit(request: Request) -> None:
+        policy = RateLimitService.get_policy(group)
+        if policy is None:
+            return
+        retry_after = await RateLimitService.hit(group, _rate_limit_key(policy.key_type, request))
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+            )
+    return check_rate_limit
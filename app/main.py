@@ -1,11 +1,18 @@
 """
 QR Check-in System Main Application
 """
-from fastapi import FastAPI
+import os
+import asyncio
+from typing import Any, Callable, Dict, Optional
+from fastapi import FastAPI, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, Response
+from sqlalchemy.orm import Session
 from app.config import settings
+from app.metrics import MetricsMiddleware
+from utils.http_cache import etag_matches
+from utils.metrics import render_metrics
 
 # --- New Router Imports ---
 from routers import (
@@ -15,7 +22,8 @@ from routers import (
     staff, # Staff: Auth & Profile
     staff_management, # Tenant Mgmt: Staff
     checkin, # Staff: Check-in
-    public_tickets # Public: Tickets
+    public_tickets, # Public: Tickets
+    public_members # Public: Members
 )
 
 # FastAPI Application Initialization
@@ -74,10 +82,102 @@ The API is structured into four main categories based on user roles:
         {
             "name": "Public: Tickets",
             "description": "Publicly accessible ticket endpoints."
+        },
+        {
+            "name": "Public: Members",
+            "description": "Member self-service ticket lookup, authenticated with a merchant-issued member token."
         }
     ]
 )
 
+@app.on_event("startup")
+async def configure_threadpool():
+    """Raise the threadpool limit used by the remaining sync endpoints (Starlette default: 40)."""
+    import anyio.to_thread
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+
+_periodic_tasks: Dict[str, asyncio.Task] = {}
+
+def _run_in_session(fn: Callable[[Session], Any]) -> Any:
+    """Run a sync maintenance job with its own DB session (called from a worker thread)."""
+    from app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        return fn(db)
+    finally:
+        db.close()
+
+def _periodic(name: str, interval: float, fn: Callable[[Session], Any], failure: str, immediate: bool = False) -> None:
+    """Run fn(db) every `interval` seconds in a worker thread; failures are logged and retried next round."""
+    async def loop():
+        if not immediate:
+            await asyncio.sleep(interval)
+        while True:
+            try:
+                await asyncio.to_thread(_run_in_session, fn)
+            except Exception as e:
+                print(f"⚠️ [WARN] {failure}: {e}")
+            await asyncio.sleep(interval)
+
+    _periodic_tasks[name] = asyncio.create_task(loop(), name=name)
+
+@app.on_event("startup")
+async def start_periodic_tasks():
+    """Start the background maintenance loops that are enabled in the settings."""
+    from services.hot_event_service import HotEventService
+    from services.ticket_counter_service import TicketCounterService
+    from services.idempotency_service import IdempotencyService
+    from services.rate_limit_service import RateLimitService
+    # Preload hot events near their start time and keep loaded indexes in sync with the DB
+    if settings.HOT_EVENT_REFRESH_SECONDS > 0:
+        _periodic("hot_event_refresher", settings.HOT_EVENT_REFRESH_SECONDS, HotEventService.refresh_all,
+                  "熱門活動索引刷新失敗", immediate=True)
+    # Rebuild the materialized ticket counters; only one worker process runs each round
+    if settings.TICKET_COUNTER_RECONCILE_SECONDS > 0:
+        _periodic("ticket_counter_reconciler", settings.TICKET_COUNTER_RECONCILE_SECONDS,
+                  TicketCounterService.reconcile_exclusive, "票券計數器校正失敗")
+    if settings.IDEMPOTENCY_PURGE_SECONDS > 0:
+        _periodic("idempotency_purger", settings.IDEMPOTENCY_PURGE_SECONDS, IdempotencyService.purge_expired,
+                  "清除過期 Idempotency-Key 失敗")
+    # Refilled buckets only accumulate in the shared (postgres) rate limit backend
+    if settings.RATE_LIMIT_ENABLED and settings.RATE_LIMIT_BACKEND == "postgres" and settings.RATE_LIMIT_PURGE_SECONDS > 0:
+        _periodic("rate_limit_purger", settings.RATE_LIMIT_PURGE_SECONDS, RateLimitService.purge_expired,
+                  "清除速率限制記錄失敗")
+
+@app.on_event("startup")
+async def start_snowflake_worker_lease():
+    """Lease a Snowflake worker ID for this process so multiple workers never share an ID space."""
+    from services.snowflake_worker_service import SnowflakeWorkerService
+    if settings.SNOWFLAKE_WORKER_ID is not None or settings.SNOWFLAKE_WORKER_LEASE_SECONDS <= 0:
+        return
+    try:
+        worker_id = await asyncio.to_thread(_run_in_session, SnowflakeWorkerService.acquire)
+        print(f"🆔 Snowflake worker ID: {worker_id}")
+    except Exception as e:
+        print(f"⚠️ [WARN] 無法租用 Snowflake worker ID，改由主機名稱與 PID 推導: {e}")
+        return
+    _periodic("snowflake_worker_renewer", max(settings.SNOWFLAKE_WORKER_LEASE_SECONDS, 3) / 3,
+              SnowflakeWorkerService.renew, "Snowflake worker ID 續約失敗")
+
+@app.on_event("shutdown")
+async def shutdown_cleanup():
+    """Stop background loops and close pooled asyncpg connections."""
+    from app.database import async_engine
+    from services.snowflake_worker_service import SnowflakeWorkerService
+    for task in _periodic_tasks.values():
+        task.cancel()
+    if "snowflake_worker_renewer" in _periodic_tasks:
+        try:
+            await asyncio.to_thread(_run_in_session, SnowflakeWorkerService.release)
+        except Exception as e:
+            print(f"⚠️ [WARN] 釋放 Snowflake worker ID 失敗: {e}")
+    _periodic_tasks.clear()
+    from services.qr_image_service import QRImageService
+    from services.ticket_sheet_service import TicketSheetService
+    QRImageService.shutdown()
+    TicketSheetService.shutdown()
+    await async_engine.dispose()
+
 # Mount static files directory
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
@@ -90,6 +190,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency / in-flight metrics (outermost, so CORS handling is included)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # --- Include Routers ---
 
 # Admin API (Superuser)
@@ -106,14 +210,26 @@ app.include_router(checkin.router)
 
 # Public APIs (No Auth)
 app.include_router(public_tickets.router)
+app.include_router(public_members.router)
 
 
 # --- Root and Health Check Endpoints ---
 
 @app.get("/member-ticket", include_in_schema=False)
-async def get_member_ticket_page():
-    """Serves the member ticket lookup page."""
-    return FileResponse('app/static/member_ticket.html')
+async def get_member_ticket_page(if_none_match: Optional[str] = Header(None)):
+    """Serves the member ticket lookup page (cacheable, revalidated by ETag)."""
+    path = 'app/static/member_ticket.html'
+    response = FileResponse(
+        path,
+        stat_result=os.stat(path),
+        headers={"Cache-Control": f"public, max-age={settings.MEMBER_PAGE_MAX_AGE_SECONDS}"}
+    )
+    if etag_matches(if_none_match, response.headers["etag"]):
+        return Response(
+            status_code=304,
+            headers={key: response.headers[key] for key in ("etag", "last-modified", "cache-control")}
+        )
+    return response
 
 @app.get("/", include_in_schema=False)
 def read_root():
@@ -128,6 +244,12 @@ def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+    def metrics():
+        """Prometheus metrics (text exposition format)."""
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
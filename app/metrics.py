@@ -0,0 +1,101 @@
+"""
+HTTP 指標 middleware 與抓取時的快照收集
+"""
+import time
+from utils.metrics import (
+    REGISTRY, Gauge, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT, DB_POOL_CONNECTIONS
+)
+
+STAFF_PRINCIPAL_CACHE = REGISTRY.register(Gauge(
+    "staff_principal_cache", "Staff principal cache size and hit/miss counts.", ("field",)
+))
+PUBLIC_TICKET_CACHE = REGISTRY.register(Gauge(
+    "public_ticket_cache", "Public ticket lookup cache size and hit/miss counts.", ("field",)
+))
+RATE_LIMIT_KEYS = REGISTRY.register(Gauge(
+    "rate_limit_keys", "Rate limit buckets tracked in this process, by route group.", ("group",)
+))
+HOT_EVENT_INDEX = REGISTRY.register(Gauge(
+    "hot_event_index", "Hot event index tickets, used tickets, memory and rejections.", ("event_id", "field")
+))
+
+CHECKIN_STREAM_SUBSCRIBERS = REGISTRY.register(Gauge(
+    "checkin_stream_subscribers", "Open live check-in stream connections."
+))
+
+
+class MetricsMiddleware:
+    """
+    純 ASGI middleware：記錄每個請求的延遲（依路由樣板，例如 /api/v1/public/tickets/{ticket_uuid}）
+    與進行中的請求數。未比對到路由的請求歸類為 "unmatched"，避免標籤數量失控。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec(method)
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method, template, str(status_code))
+
+
+def _collect_pool_stats():
+    from app.database import engine, async_engine
+    for name, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+        DB_POOL_CONNECTIONS.set(pool.checkedout(), name, "in_use")
+        DB_POOL_CONNECTIONS.set(pool.checkedin(), name, "idle")
+        DB_POOL_CONNECTIONS.set(max(pool.overflow(), 0), name, "overflow")
+        DB_POOL_CONNECTIONS.set(pool.size(), name, "size")
+
+
+def _collect_cache_stats():
+    from utils.cache import staff_principal_cache, public_ticket_cache
+    for gauge, cache in ((STAFF_PRINCIPAL_CACHE, staff_principal_cache), (PUBLIC_TICKET_CACHE, public_ticket_cache)):
+        stats = cache.stats()
+        for field in ("size", "hits", "misses"):
+            gauge.set(stats[field], field)
+
+
+def _collect_rate_limit_stats():
+    from services.rate_limit_service import RateLimitService
+    for group, keys in RateLimitService.stats().items():
+        RATE_LIMIT_KEYS.set(keys, group)
+
+
+def _collect_hot_event_stats():
+    from services.hot_event_service import HotEventService
+    HOT_EVENT_INDEX.clear()
+    for stats in HotEventService.stats():
+        for field in ("tickets", "used", "memory_bytes", "hits", "rejections"):
+            HOT_EVENT_INDEX.set(stats[field], str(stats["event_id"]), field)
+
+
+def _collect_stream_stats():
+    from services.checkin_stream_service import CheckInStreamService
+    CHECKIN_STREAM_SUBSCRIBERS.set(CheckInStreamService.subscriber_count())
+
+
+REGISTRY.add_collector(_collect_pool_stats)
+REGISTRY.add_collector(_collect_cache_stats)
+REGISTRY.add_collector(_collect_rate_limit_stats)
+REGISTRY.add_collector(_collect_hot_event_stats)
+REGISTRY.add_collector(_collect_stream_stats)
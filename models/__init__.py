@@ -4,4 +4,8 @@ from .ticket_type import TicketType
 from .checkin import CheckInLog
 from .staff import Staff
 from .staff_event import StaffEvent
-from .merchant import Merchant, ApiKey
\ No newline at end of file
+from .merchant import Merchant, ApiKey
+from .ticket_counter import TicketCounter
+from .idempotency_key import IdempotencyKey
+from .snowflake_worker_lease import SnowflakeWorkerLease
+from .rate_limit_bucket import RateLimitBucket
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .base import Base
@@ -6,14 +6,23 @@ from .base import Base
 
 class CheckInLog(Base):
     __tablename__ = "checkin_logs"
+    __table_args__ = (
+        # 每張票券最多一筆未撤銷的簽到記錄，由資料庫保證
+        Index(
+            "uq_checkin_logs_active_ticket",
+            "ticket_id",
+            unique=True,
+            postgresql_where=text("NOT is_revoked")
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    ticket_id = Column(Integer, ForeignKey("tickets.id"), nullable=False)
+    ticket_id = Column(Integer, ForeignKey("tickets.id"), nullable=False, index=True)
     staff_id = Column(Integer, ForeignKey("staff.id"), nullable=True)  # 掃描員 ID
     checkin_time = Column(DateTime, default=func.now())
     ip_address = Column(String(45), nullable=True)  # 支援 IPv6
     user_agent = Column(String(500), nullable=True)
-    is_revoked = Column(Boolean, default=False)  # 是否已撤銷
+    is_revoked = Column(Boolean, default=False, server_default=text("false"))  # 是否已撤銷
     revoked_by = Column(Integer, ForeignKey("staff.id"), nullable=True)  # 撤銷者
     revoked_at = Column(DateTime, nullable=True)
     
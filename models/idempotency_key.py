@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, LargeBinary, ForeignKey
+from sqlalchemy.sql import func
+from .base import Base
+
+
+class IdempotencyKey(Base):
+    """
+    產票端點的 Idempotency-Key 記錄：同一商戶以相同的 key 重送請求時直接回傳儲存的回應。
+    回應內容以 zlib 壓縮的 JSON 儲存；超過 expires_at 的記錄視為不存在並定期清除。
+    """
+    __tablename__ = "idempotency_keys"
+    
+    merchant_id = Column(Integer, ForeignKey("merchants.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)  # 請求方法、路徑與內容的 SHA-256
+    status_code = Column(SmallInteger, nullable=True)  # 與回應、產生的票券在同一個交易中寫入
+    response_body = Column(LargeBinary, nullable=True)  # zlib 壓縮的 JSON
+    created_at = Column(DateTime, nullable=False, default=func.now())
+    expires_at = Column(DateTime, nullable=False, index=True)
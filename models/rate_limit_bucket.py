@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, Float
+from .base import Base
+
+
+class RateLimitBucket(Base):
+    """
+    多 worker 共用的速率限制狀態（RATE_LIMIT_BACKEND=postgres）。
+    每個鍵只存一個數字：GCRA 的理論到達時間（Unix 秒），早於現在即代表桶已滿、可直接刪除。
+    UNLOGGED：不寫 WAL，資料庫當機後清空也只是重置額度。
+    """
+    __tablename__ = "rate_limit_buckets"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key = Column(String(255), primary_key=True)  # <路由群組>:<ip / merchant / staff 鍵>
+    tat = Column(Float, nullable=False)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from .base import Base
+
+
+class SnowflakeWorkerLease(Base):
+    """
+    Snowflake worker ID 租約：每個應用程式程序啟動時租用一個未被使用（或已過期）的 worker ID 並定期續約。
+    last_timestamp_ms 記錄持有者最後續約時已使用的時間戳，接手的程序從其後開始配發。
+    """
+    __tablename__ = "snowflake_worker_leases"
+    
+    worker_id = Column(Integer, primary_key=True, autoincrement=False)  # 0 ~ 1023
+    owner = Column(String(255), nullable=False)  # 主機名稱:PID:隨機值
+    last_timestamp_ms = Column(BigInteger, nullable=False, default=0)
+    expires_at = Column(DateTime, nullable=False)
@@ -18,6 +18,7 @@ class Staff(Base):
     is_admin = Column(Boolean, default=False)
     created_at = Column(DateTime, default=func.now())
     last_login = Column(DateTime, nullable=True)
+    scan_sessions_valid_after = Column(DateTime, nullable=True)  # 此時間（UTC）之前簽發的掃描 session 全部失效
     
     # Relationships
     merchant = relationship("Merchant", back_populates="staff")
@@ -14,6 +14,7 @@ class StaffEvent(Base):
     can_checkin = Column(Boolean, default=True)  # 是否可以進行簽到
     can_revoke = Column(Boolean, default=False)  # 是否可以撤銷簽到
     created_at = Column(DateTime, default=func.now())
+    scan_sessions_valid_after = Column(DateTime, nullable=True)  # 此時間（UTC）之前簽發的該活動掃描 session 失效
     
     # Relationships
     staff = relationship("Staff", back_populates="staff_events")
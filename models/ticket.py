@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text, BigInteger
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text, BigInteger, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from utils.snowflake import generate_snowflake_id
@@ -8,10 +8,14 @@ from .base import Base
 
 class Ticket(Base):
     __tablename__ = "tickets"
+    __table_args__ = (
+        # 依活動查詢最後變更時間（離線清單的 ETag / 差異下載、熱門活動索引的差異同步）
+        Index("ix_tickets_event_id_changed_at", "event_id", text("COALESCE(updated_at, created_at)")),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     uuid = Column(BigInteger, default=generate_snowflake_id, unique=True, nullable=False, index=True)
-    event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
+    event_id = Column(Integer, ForeignKey("events.id"), nullable=False, index=True)
     ticket_type_id = Column(Integer, ForeignKey("ticket_types.id"), nullable=True)
     ticket_code = Column(String(50), unique=True, nullable=False, index=True)
     holder_name = Column(String(100), nullable=False)
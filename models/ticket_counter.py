@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey, text
+from .base import Base
+
+
+class TicketCounter(Base):
+    """
+    活動 / 票種的實體化計數器，取代對 tickets、checkin_logs 的 COUNT(*)。
+    ticket_type_id = 0 代表整個活動的總計；每個 (活動, 票種) 分成數個 shard，
+    並行簽到時寫入隨機 shard，避免所有掃描器爭搶同一列的鎖。讀取時加總各 shard。
+    changes 只增不減：每個改變票券的交易都在活動總計列累加，加總後作為離線清單 ETag 的版本。
+    """
+    __tablename__ = "ticket_counters"
+    
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    ticket_type_id = Column(Integer, primary_key=True)  # 0 = 活動總計
+    shard = Column(Integer, primary_key=True)
+    issued = Column(Integer, nullable=False, default=0, server_default=text("0"))  # 已發行票券
+    used = Column(Integer, nullable=False, default=0, server_default=text("0"))  # 已使用票券
+    active_checkins = Column(Integer, nullable=False, default=0, server_default=text("0"))  # 未撤銷的簽到記錄
+    revoked = Column(Integer, nullable=False, default=0, server_default=text("0"))  # 已撤銷的簽到記錄
+    changes = Column(BigInteger, nullable=False, default=0, server_default=text("0"))  # 累計異動次數（不參與校正）
@@ -1,39 +1,89 @@
 """
 Check-in and logging API for staff operations
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+import json
+import asyncio
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.dependencies import get_current_active_staff
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, get_async_db, SessionLocal
+from app.dependencies import get_checkin_principal, rate_limit
 from schemas.checkin import (
-    CheckInRequest, CheckInResponse, CheckInRevoke, CheckInLogDetail, OfflineCheckInSync
+    CheckInRequest, CheckInResponse, CheckInRevoke, CheckInLogDetail, OfflineCheckInSync,
+    OfflineCheckInSyncItem, OfflineCheckInSyncResult,
+    BatchCheckInRequest, BatchCheckInItem, BatchCheckInResponse
 )
 from schemas.common import APIResponse
-from services.checkin_service import CheckInService
+from services.checkin_service import CheckInService, CheckInStatus
+from services.hot_event_service import HotEventService
+from services.checkin_stream_service import CheckInStreamService, StreamEvent
+from services.ticket_manifest_service import TicketManifestService, MANIFEST_MEDIA_TYPE
 from services.ticket_service import TicketService
 from services.staff_service import StaffService
-from schemas.staff import StaffProfile
+from schemas.token import CheckInPrincipal
 from utils.auth import decode_qr_token
+from utils.metrics import record_checkin_outcome
+from app.config import settings
 
 router = APIRouter(
     prefix="/api/v1/staff/checkin", 
     tags=["Staff: Check-in"], 
-    dependencies=[Depends(get_current_active_staff)]
+    dependencies=[Depends(rate_limit("staff")), Depends(get_checkin_principal)]
 )
 
+
+def _require_session_event(principal: CheckInPrincipal, event_id: int, detail: str):
+    """Scan-session tokens are scoped to a single event."""
+    if principal.is_scan_session and principal.event_id != event_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+
+async def _verify_checkin_permission(
+    db: AsyncSession, principal: CheckInPrincipal, event_id: int, detail: str, hot_only: bool = True
+) -> bool:
+    """
+    Whether check-in permission has been verified before touching any ticket state.
+
+    Scan-session tokens carry their StaffEvent permissions. Login-JWT principals are checked
+    here when the event is hot, so the in-memory index never answers for staff without a grant;
+    otherwise (with `hot_only`) the check runs inside the check-in statement. Pass
+    `hot_only=False` when the outcome must not depend on whether any ticket resolves.
+    """
+    if principal.is_scan_session:
+        return True
+    if hot_only and HotEventService.get_index(event_id) is None:
+        return False
+    allowed = await db.run_sync(lambda sync_db: StaffService.can_checkin(sync_db, principal.staff_id, event_id))
+    if not allowed:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+    return True
+
+def _publish_checkin(event_id: int, result: dict, staff_id: int, source: str):
+    """Push a successful check-in to live stream subscribers."""
+    CheckInStreamService.publish(event_id, StreamEvent.CHECKIN, {
+        "ticket_id": result["ticket_id"],
+        "holder_name": result["holder_name"],
+        "checkin_log_id": result["checkin_log_id"],
+        "checkin_time": result["checkin_time"],
+        "staff_id": staff_id,
+        "source": source
+    })
+
 @router.post("/", response_model=CheckInResponse, summary="Check-in a ticket")
-def check_in_ticket(
+async def check_in_ticket(
     checkin_request: CheckInRequest,
     request: Request,
-    current_staff: StaffProfile = Depends(get_current_active_staff),
-    db: Session = Depends(get_db)
+    principal: CheckInPrincipal = Depends(get_checkin_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Check-in a ticket using its QR token for a specific event.
 
-    - Requires staff authentication (JWT).
+    - Requires staff authentication (login JWT or scan-session token).
     - Staff must have check-in permission for the event.
+    - Returns 409 if the ticket has already been checked in.
     """
     # Decode the QR token to get the ticket UUID
     try:
@@ -42,58 +92,165 @@ def check_in_ticket(
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid QR token payload")
         ticket_uuid = token_data["ticket_uuid"]
     except HTTPException:
+        record_checkin_outcome("single", CheckInStatus.INVALID)
         raise
     except Exception:
+        record_checkin_outcome("single", CheckInStatus.INVALID)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid or expired QR token")
 
-    ticket = TicketService.get_ticket_by_uuid(db, ticket_uuid)
+    # Scan-session tokens already carry the StaffEvent permissions
+    permission_detail = "You do not have permission to check-in for this event"
+    _require_session_event(principal, checkin_request.event_id, permission_detail)
+    if principal.is_scan_session and not principal.can_checkin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=permission_detail)
 
-    if not ticket:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket not found")
+    # Hot events reject tickets of other loaded events from memory, once the principal's
+    # permission for the event is known; everything else is decided by the database
+    permission_checked = await _verify_checkin_permission(db, principal, checkin_request.event_id, permission_detail)
+    result = HotEventService.precheck(checkin_request.event_id, ticket_uuid) if permission_checked else None
+    if result is None:
+        # Permission check, conditional is_used transition and log insert run as one statement
+        try:
+            result = await db.run_sync(
+                CheckInService.check_in_ticket,
+                ticket_uuid=ticket_uuid,
+                event_id=checkin_request.event_id,
+                staff_id=principal.staff_id,
+                ip_address=request.client.host,
+                user_agent=request.headers.get("user-agent"),
+                permission_checked=permission_checked
+            )
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
+        HotEventService.record_checkin(checkin_request.event_id, ticket_uuid, result)
 
-    # Ensure the ticket belongs to the event being checked into
-    if ticket.event_id != checkin_request.event_id:
+    outcome = result["status"]
+    record_checkin_outcome("single", outcome)
+    if outcome == CheckInStatus.OK:
+        _publish_checkin(checkin_request.event_id, result, principal.staff_id, "single")
+    if outcome == CheckInStatus.NOT_FOUND:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket not found")
+    if outcome == CheckInStatus.WRONG_EVENT:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Ticket does not belong to this event")
+    if outcome == CheckInStatus.FORBIDDEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=permission_detail)
+    if outcome == CheckInStatus.ALREADY_USED:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Ticket has already been checked in")
+
+    return CheckInResponse(
+        success=True,
+        ticket_id=result["ticket_id"],
+        holder_name=result["holder_name"],
+        checkin_time=result["checkin_time"],
+        message="Check-in successful"
+    )
+
 
-    # Check if staff has permission for this event
-    if not StaffService.can_checkin(db, current_staff.id, checkin_request.event_id):
+_BATCH_MESSAGES = {
+    CheckInStatus.OK: "Check-in successful",
+    CheckInStatus.ALREADY_USED: "Ticket has already been checked in",
+    CheckInStatus.WRONG_EVENT: "Ticket does not belong to this event",
+    CheckInStatus.INVALID: "Invalid, expired or unknown QR token",
+}
+
+@router.post("/batch", response_model=BatchCheckInResponse, summary="Check-in a batch of tickets")
+async def check_in_batch(
+    batch_request: BatchCheckInRequest,
+    request: Request,
+    principal: CheckInPrincipal = Depends(get_checkin_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Check-in multiple QR tokens at once (turnstiles, multi-lane scanners).
+
+    - Requires staff authentication (login JWT or scan-session token).
+    - All tickets are resolved and transitioned in a single statement; permissions are checked once.
+    - Returns one result per token, in input order: `ok`, `already_used`, `wrong_event` or `invalid`.
+    """
+    if not batch_request.qr_tokens:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="qr_tokens must not be empty")
+    if len(batch_request.qr_tokens) > settings.CHECKIN_BATCH_MAX_SIZE:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have permission to check-in for this event"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.CHECKIN_BATCH_MAX_SIZE} QR tokens per batch"
         )
 
-    # Perform the check-in
-    try:
-        checkin_log = CheckInService.check_in_ticket(
-            db=db,
-            ticket_id=ticket.id,
-            staff_id=current_staff.id,
-            ip_address=request.client.host,
-            user_agent=request.headers.get("user-agent")
-        )
-        return CheckInResponse(
-            success=True,
-            ticket_id=ticket.id,
-            holder_name=ticket.holder_name,
-            checkin_time=checkin_log.checkin_time,
-            message="Check-in successful"
-        )
-    except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
+    permission_detail = "You do not have permission to check-in for this event"
+    _require_session_event(principal, batch_request.event_id, permission_detail)
+    if principal.is_scan_session and not principal.can_checkin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=permission_detail)
+    # Checked up front for every principal, so a batch whose tokens all fail to resolve
+    # still gets 403 rather than a list of invalid results
+    await _verify_checkin_permission(
+        db, principal, batch_request.event_id, permission_detail, hot_only=False
+    )
+
+    # Undecodable tokens are passed as None and reported as invalid
+    ticket_uuids = []
+    for qr_token in batch_request.qr_tokens:
+        try:
+            ticket_uuids.append(decode_qr_token(qr_token)["ticket_uuid"])
+        except Exception:
+            ticket_uuids.append(None)
+
+    # Tickets of other hot events are rejected from memory and never reach the database
+    results = [
+        HotEventService.precheck(batch_request.event_id, u) if u is not None else None
+        for u in ticket_uuids
+    ]
+    pending = [i for i, r in enumerate(results) if r is None]
+    if pending:
+        try:
+            db_results = await db.run_sync(
+                CheckInService.check_in_batch,
+                ticket_uuids=[ticket_uuids[i] for i in pending],
+                event_id=batch_request.event_id,
+                staff_id=principal.staff_id,
+                ip_address=request.client.host,
+                user_agent=request.headers.get("user-agent"),
+                permission_checked=True
+            )
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
+        for i, result in zip(pending, db_results):
+            results[i] = result
+            if ticket_uuids[i] is not None:
+                HotEventService.record_checkin(batch_request.event_id, ticket_uuids[i], result)
+
+    items = []
+    for index, result in enumerate(results):
+        # Unknown tickets are reported as invalid, like undecodable tokens
+        outcome = CheckInStatus.INVALID if result["status"] == CheckInStatus.NOT_FOUND else result["status"]
+        record_checkin_outcome("batch", outcome)
+        if outcome == CheckInStatus.OK:
+            _publish_checkin(batch_request.event_id, result, principal.staff_id, "batch")
+        items.append(BatchCheckInItem(
+            index=index,
+            status=outcome,
+            ticket_id=result["ticket_id"],
+            holder_name=result["holder_name"],
+            checkin_time=result["checkin_time"],
+            message=_BATCH_MESSAGES[outcome]
+        ))
+
+    return BatchCheckInResponse(
+        event_id=batch_request.event_id,
+        total=len(items),
+        succeeded=sum(1 for item in items if item.status == CheckInStatus.OK),
+        results=items
+    )
 
 
 @router.post("/revoke", response_model=APIResponse, summary="Revoke a check-in")
 def revoke_checkin(
     revoke_data: CheckInRevoke,
-    current_staff: StaffProfile = Depends(get_current_active_staff),
+    principal: CheckInPrincipal = Depends(get_checkin_principal),
     db: Session = Depends(get_db)
 ):
     """
     Revoke a ticket check-in.
 
-    - Requires staff authentication (JWT).
+    - Requires staff authentication (login JWT or scan-session token).
     - Staff must have revoke permission for the event.
     """
     checkin_log = CheckInService.get_checkin_log_by_id(db, revoke_data.checkin_log_id)
@@ -105,14 +262,24 @@ def revoke_checkin(
         raise HTTPException(status_code=404, detail="Related ticket not found")
 
     # Check if staff has permission to revoke for this event
-    if not StaffService.can_revoke(db, current_staff.id, ticket.event_id):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have permission to revoke check-ins for this event"
-        )
+    permission_detail = "You do not have permission to revoke check-ins for this event"
+    if principal.is_scan_session:
+        _require_session_event(principal, ticket.event_id, permission_detail)
+        allowed = principal.can_revoke
+    else:
+        allowed = StaffService.can_revoke(db, principal.staff_id, ticket.event_id)
+    if not allowed:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=permission_detail)
 
+    event_id, ticket_id, ticket_uuid = ticket.event_id, ticket.id, ticket.uuid
     try:
-        CheckInService.revoke_checkin(db, revoke_data.checkin_log_id, current_staff.id)
+        CheckInService.revoke_checkin(db, revoke_data.checkin_log_id, principal.staff_id)
+        HotEventService.record_revoke(event_id, ticket_uuid)
+        CheckInStreamService.publish(event_id, StreamEvent.REVOKE, {
+            "checkin_log_id": revoke_data.checkin_log_id,
+            "ticket_id": ticket_id,
+            "revoked_by": principal.staff_id
+        })
         return APIResponse(success=True, message="Check-in revoked successfully")
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
@@ -123,7 +290,7 @@ def get_checkin_logs(
     event_id: int,
     skip: int = 0,
     limit: int = 100,
-    current_staff: StaffProfile = Depends(get_current_active_staff),
+    principal: CheckInPrincipal = Depends(get_checkin_principal),
     db: Session = Depends(get_db)
 ):
     """
@@ -132,30 +299,193 @@ def get_checkin_logs(
     - Requires staff authentication (JWT).
     - Staff must have permission to access the event.
     """
-    if not StaffService.can_access_event(db, current_staff.id, event_id):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have permission to access this event's logs"
-        )
+    permission_detail = "You do not have permission to access this event's logs"
+    _require_session_event(principal, event_id, permission_detail)
+    if not principal.is_scan_session and not StaffService.can_access_event(db, principal.staff_id, event_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=permission_detail)
 
     logs = CheckInService.get_checkin_logs_by_event(db, event_id, skip, limit)
     return logs
 
 
-@router.post("/sync", response_model=APIResponse, summary="Sync offline check-in records", description="Batch sync offline check-in records. Allows staff to cache multiple check-ins when offline and upload them at once when connectivity is restored. Already checked-in tickets will be skipped. The response message indicates the number of new check-ins created.")
-def sync_offline_checkins(
-    sync_data: OfflineCheckInSync,
-    current_staff: StaffProfile = Depends(get_current_active_staff),
+def _format_sse(event_type: str, data: dict, event_id: Optional[str] = None) -> str:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@router.get(
+    "/stream/{event_id}",
+    summary="Stream live check-in events (Server-Sent Events)",
+    responses={200: {"content": {"text/event-stream": {}}}}
+)
+async def stream_checkin_events(
+    event_id: int,
+    request: Request,
+    cursor: Optional[str] = None,
+    principal: CheckInPrincipal = Depends(get_checkin_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Push check-in, revoke and offline-sync events of an event as they happen.
+
+    - Requires staff authentication (login JWT or scan-session token) and access to the event.
+    - Event types: `ready` (sent on connect, carries the current cursor), `checkin`, `revoke`,
+      `sync` and `reset`.
+    - Every event has an `id`; reconnect with the `Last-Event-ID` header (or `?cursor=`) to
+      receive the events missed in between.
+    - `reset` means the cursor can no longer be resumed (server restart or too far behind):
+      reload `GET /logs/{event_id}` and continue from the cursor in the `reset` event.
+    """
+    permission_detail = "You do not have permission to access this event's logs"
+    _require_session_event(principal, event_id, permission_detail)
+    if not principal.is_scan_session:
+        allowed = await db.run_sync(lambda sync_db: StaffService.can_access_event(sync_db, principal.staff_id, event_id))
+        if not allowed:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=permission_detail)
+    # Do not hold a pooled connection for the lifetime of the stream
+    await db.close()
+
+    subscription = CheckInStreamService.subscribe(event_id, request.headers.get("last-event-id") or cursor)
+
+    async def event_stream():
+        try:
+            if subscription.reset:
+                yield _format_sse(StreamEvent.RESET, {"cursor": subscription.start_cursor}, subscription.start_cursor)
+            elif subscription.backlog:
+                for item_cursor, event_type, data in subscription.backlog:
+                    yield _format_sse(event_type, data, item_cursor)
+            else:
+                yield _format_sse("ready", {"cursor": subscription.start_cursor}, subscription.start_cursor)
+
+            while True:
+                try:
+                    item = await asyncio.wait_for(
+                        subscription.queue.get(), timeout=settings.CHECKIN_STREAM_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    # Keep proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    # Subscriber fell too far behind; the client reconnects with its last cursor
+                    break
+                item_cursor, event_type, data = item
+                yield _format_sse(event_type, data, item_cursor)
+        finally:
+            CheckInStreamService.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get(
+    "/manifest/{event_id}",
+    summary="Download the offline ticket manifest for an event",
+    responses={200: {"content": {MANIFEST_MEDIA_TYPE: {}}}, 304: {"description": "Manifest not modified"}}
+)
+def get_ticket_manifest(
+    event_id: int,
+    request: Request,
+    since: int = 0,
+    principal: CheckInPrincipal = Depends(get_checkin_principal),
     db: Session = Depends(get_db)
+):
+    """
+    Download a compact, signed snapshot of an event's tickets for offline scanning.
+
+    - Requires staff authentication (login JWT or scan-session token).
+    - Binary format (see `services/ticket_manifest_service.py`): sorted uuid / ticket id
+      records plus an is_used bitset, without holder details.
+    - Pass the `X-Manifest-Cursor` of the previous response as `since` to receive only
+      tickets created or changed since then.
+    - Supports `If-None-Match`; returns 304 when no ticket of the event has changed.
+    """
+    permission_detail = "You do not have permission to access this event's tickets"
+    _require_session_event(principal, event_id, permission_detail)
+    if not principal.is_scan_session and not StaffService.can_access_event(db, principal.staff_id, event_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=permission_detail)
+
+    total, cursor, version = TicketManifestService.get_manifest_state(db, event_id)
+    etag = TicketManifestService.make_etag(event_id, total, cursor, version)
+    headers = {"ETag": etag, "X-Manifest-Cursor": str(cursor), "Cache-Control": "private, no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    def stream():
+        # 請求範圍的 session 在回應開始串流前就會關閉，串流使用自己的連線
+        stream_db = SessionLocal()
+        try:
+            yield from TicketManifestService.iter_manifest(stream_db, event_id, total, cursor, since)
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(stream(), media_type=MANIFEST_MEDIA_TYPE, headers=headers)
+
+
+@router.post("/sync", response_model=APIResponse, summary="Sync offline check-in records", description="Batch sync offline check-in records. Allows staff to cache multiple check-ins when offline and upload them at once when connectivity is restored. Already checked-in tickets will be skipped. The response message indicates the number of new check-ins created and `data` holds one outcome per item.")
+async def sync_offline_checkins(
+    sync_data: OfflineCheckInSync,
+    principal: CheckInPrincipal = Depends(get_checkin_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Batch sync offline check-in records.
-    - Requires staff JWT authentication.
-    - Input is a list of offline check-in data.
-    - Already checked-in tickets will be skipped automatically.
+    - Requires staff JWT authentication and check-in permission for the event.
+    - Input is a list of offline check-in data (at most `OFFLINE_SYNC_MAX_SIZE` items).
+    - The whole batch is validated and applied in one transaction with set-based statements.
+    - Already checked-in tickets are skipped; `data.results` reports `ok`, `already_used`,
+      `wrong_event` or `not_found` per item, in input order.
     """
+    if len(sync_data.checkins) > settings.OFFLINE_SYNC_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.OFFLINE_SYNC_MAX_SIZE} check-ins per sync"
+        )
+    permission_detail = "You do not have permission to check-in for this event"
+    _require_session_event(principal, sync_data.event_id, "Scan session is not valid for this event")
+    if principal.is_scan_session and not principal.can_checkin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=permission_detail)
+
     try:
-        logs = CheckInService.sync_offline_checkins(db, sync_data, current_staff.id)
-        return APIResponse(success=True, message=f"Sync successful, created {len(logs)} new check-in records.")
+        results = await db.run_sync(
+            CheckInService.sync_offline_checkins,
+            sync_data,
+            principal.staff_id,
+            permission_checked=principal.is_scan_session
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Sync failed: {str(e)}")
+
+    items = []
+    for index, result in enumerate(results):
+        if result["ticket_uuid"] is not None:
+            HotEventService.record_checkin(sync_data.event_id, result["ticket_uuid"], result)
+        record_checkin_outcome("sync", result["status"])
+        items.append(OfflineCheckInSyncItem(
+            index=index,
+            ticket_id=result["ticket_id"],
+            status=result["status"],
+            checkin_log_id=result["checkin_log_id"]
+        ))
+    created = sum(1 for item in items if item.status == CheckInStatus.OK)
+    if created:
+        CheckInStreamService.publish(sync_data.event_id, StreamEvent.SYNC, {
+            "staff_id": principal.staff_id,
+            "created": created,
+            "checkins": [
+                {"ticket_id": item.ticket_id, "checkin_log_id": item.checkin_log_id}
+                for item in items if item.status == CheckInStatus.OK
+            ]
+        })
+    return APIResponse(
+        success=True,
+        message=f"Sync successful, created {created} new check-in records.",
+        data=OfflineCheckInSyncResult(event_id=sync_data.event_id, total=len(items), created=created, results=items)
+    )
@@ -1,21 +1,28 @@
 """
 活動相關 API 路由
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.dependencies import get_current_merchant
+from app.database import get_db, SessionLocal
+from app.dependencies import get_current_merchant, rate_limit
 from schemas.event import (
     EventCreate, EventUpdate, Event, EventWithTicketTypes,
-    TicketTypeBase, TicketTypeCreate, TicketTypeUpdate, TicketType, OfflineTicket
+    TicketTypeBase, TicketTypeCreate, TicketTypeUpdate, TicketType, OfflineTicket,
+    HotEventIndexStats, HotEventConsistencyReport
 )
 from schemas.common import APIResponse
 from services.event_service import EventService
+from services.hot_event_service import HotEventService
+from services.ticket_counter_service import TicketCounterService
+from services.ticket_sheet_service import TicketSheetService, TICKET_SHEET_MEDIA_TYPES
 from app.config import settings
 from models.merchant import Merchant
 
-router = APIRouter(prefix="/api/v1/mgmt/events", tags=["Tenant Mgmt: Events"])
+router = APIRouter(
+    prefix="/api/v1/mgmt/events", tags=["Tenant Mgmt: Events"], dependencies=[Depends(rate_limit("mgmt"))]
+)
 
 @router.get("", response_model=List[Event])
 def get_events(
@@ -238,3 +245,122 @@ def get_event_summary(
         
     summary = EventService.get_event_summary(db, event_id)
     return summary
+
+
+def _get_merchant_event_or_404(db: Session, event_id: int, merchant: Merchant):
+    event = EventService.get_event_by_id(db, event_id)
+    if not event or (settings.ENABLE_MULTI_TENANT and event.merchant_id != merchant.id):
+        raise HTTPException(status_code=404, detail="Event not found")
+    return event
+
+@router.post("/{event_id}/hot-index", response_model=HotEventIndexStats, summary="Warm up the hot event ticket index")
+def warmup_hot_event_index(
+    event_id: int,
+    db: Session = Depends(get_db),
+    merchant: Merchant = Depends(get_current_merchant)
+):
+    """
+    預先載入活動的記憶體票券索引（熱門活動模式）
+
+    載入後，簽到端點可直接在記憶體中拒絕屬於其他已載入活動的票券；其餘票券仍由資料庫判斷。
+    手動啟用的索引會保留到呼叫 DELETE 為止；活動開始前也會自動載入。
+    """
+    _get_merchant_event_or_404(db, event_id, merchant)
+    index = HotEventService.warmup(db, event_id)
+    return index.stats()
+
+@router.get("/{event_id}/hot-index", response_model=HotEventIndexStats, summary="Get hot event index stats")
+def get_hot_event_index(
+    event_id: int,
+    db: Session = Depends(get_db),
+    merchant: Merchant = Depends(get_current_merchant)
+):
+    """查詢活動票券索引的筆數、已使用數與記憶體用量"""
+    _get_merchant_event_or_404(db, event_id, merchant)
+    index = HotEventService.get_index(event_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail="Hot event index is not loaded")
+    return index.stats()
+
+@router.get("/{event_id}/hot-index/consistency", response_model=HotEventConsistencyReport, summary="Check hot event index against the database")
+def check_hot_event_index(
+    event_id: int,
+    repair: bool = False,
+    db: Session = Depends(get_db),
+    merchant: Merchant = Depends(get_current_merchant)
+):
+    """比對記憶體索引與資料庫；`repair=true` 時以資料庫為準修正索引"""
+    _get_merchant_event_or_404(db, event_id, merchant)
+    try:
+        return HotEventService.check_consistency(db, event_id, repair=repair)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.delete("/{event_id}/hot-index", response_model=APIResponse, summary="Disable the hot event index")
+def disable_hot_event_index(
+    event_id: int,
+    db: Session = Depends(get_db),
+    merchant: Merchant = Depends(get_current_merchant)
+):
+    """卸載活動的記憶體票券索引"""
+    _get_merchant_event_or_404(db, event_id, merchant)
+    if not HotEventService.disable(event_id):
+        raise HTTPException(status_code=404, detail="Hot event index is not loaded")
+    return APIResponse(success=True, message="Hot event index disabled")
+
+@router.post("/{event_id}/counters/reconcile", response_model=APIResponse, summary="Rebuild ticket counters from the database")
+def reconcile_ticket_counters(
+    event_id: int,
+    db: Session = Depends(get_db),
+    merchant: Merchant = Depends(get_current_merchant)
+):
+    """以票券與簽到記錄校正活動的計數器，回傳修正的列數與校正後的計數（ticket_type_id 0 為活動總計）"""
+    _get_merchant_event_or_404(db, event_id, merchant)
+    corrected = TicketCounterService.reconcile(db, event_id)
+    return APIResponse(
+        success=True,
+        message=f"Ticket counters reconciled ({corrected} rows corrected)",
+        data={"corrected_rows": corrected, "counters": TicketCounterService.get_counts(db, event_id)}
+    )
+
+@router.get(
+    "/{event_id}/ticket-sheets",
+    summary="Download printable ticket sheets",
+    responses={200: {"content": {"application/pdf": {}, "application/zip": {}}}}
+)
+def download_ticket_sheets(
+    event_id: int,
+    format: str = Query("pdf", pattern="^(pdf|zip)$", description="pdf（A4 每頁多張）或 zip（每張票券一個 PNG）"),
+    ticket_type_id: Optional[int] = Query(None, description="只輸出此票種"),
+    is_used: Optional[bool] = Query(None, description="只輸出已使用 / 未使用的票券"),
+    db: Session = Depends(get_db),
+    merchant: Merchant = Depends(get_current_merchant)
+):
+    """
+    輸出可列印的票券（QR Code、持有人姓名、票種與票券代碼）。
+    以程序池平行繪製並邊繪製邊串流回應，大型活動不需等待全部完成，也不會把整份檔案放在記憶體。
+    """
+    _get_merchant_event_or_404(db, event_id, merchant)
+    total = TicketSheetService.count_tickets(db, event_id, ticket_type_id, is_used)
+    if not total:
+        raise HTTPException(status_code=404, detail="No tickets match the filters")
+
+    def stream():
+        # 請求範圍的 session 在回應開始串流前就會關閉，串流使用自己的連線
+        stream_db = SessionLocal()
+        try:
+            event = EventService.get_event_by_id(stream_db, event_id)
+            yield from TicketSheetService.iter_sheets(
+                stream_db, event, format, ticket_type_id=ticket_type_id, is_used=is_used
+            )
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type=TICKET_SHEET_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="event-{event_id}-tickets.{format}"',
+            "X-Ticket-Count": str(total),
+        }
+    )
@@ -0,0 +1,115 @@
+import asyncio
+import base64
+import hashlib
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import database, dependencies
+from app.config import settings
+from services.ticket_service import TicketService
+from schemas import ticket as ticket_schema
+from services.qr_image_service import QRImageService
+from utils import auth
+from utils.http_cache import strong_etag, etag_matches
+from utils.member_token import decode_member_token
+
+router = APIRouter(
+    prefix="/api/v1/public/members",
+    tags=["Public: Members"],
+    dependencies=[Depends(dependencies.rate_limit("public"))],
+)
+
+
+def _member_from_token(member_token: Optional[str], authorization: Optional[str]) -> dict:
+    """Resolve the member from the `member_token` query parameter or an `Authorization: Bearer` header"""
+    token = member_token
+    if not token and authorization:
+        scheme, _, credentials = authorization.partition(" ")
+        if scheme.lower() == "bearer":
+            token = credentials.strip()
+    member = decode_member_token(token) if token else None
+    if member is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired member token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return member
+
+
+async def _qr_code(qr_token: str, qr_format: str) -> str:
+    """QR image for inlining: SVG markup, or a PNG data URI"""
+    content = await QRImageService.get_image(QRImageService.content_key(qr_token, qr_format), qr_token, qr_format)
+    if qr_format == "svg":
+        return content.decode("utf-8")
+    return "data:image/png;base64," + base64.b64encode(content).decode("ascii")
+
+
+@router.get(
+    "/tickets",
+    response_model=ticket_schema.MemberTicketsResponse,
+    responses={304: {"description": "Not Modified"}, 401: {"description": "Invalid or expired member token"}},
+)
+async def get_member_tickets(
+    member_token: Optional[str] = Query(None, description="會員 token（亦可用 Authorization: Bearer 傳遞）"),
+    qr: str = Query("svg", pattern="^(svg|png|none)$", description="內嵌 QR Code 格式：svg、png（data URI）或 none"),
+    authorization: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """
+    Get all upcoming tickets of the member identified by a member token, with event details.
+
+    Tickets and events are loaded in one joined query; QR tokens (and, unless `qr=none`,
+    the QR images) of unused tickets are inlined so a member page renders from a single request.
+    The ETag covers the tickets, their events and the current QR token window; clients must
+    revalidate (`no-cache`) and receive 304 while nothing has changed.
+    """
+    member = _member_from_token(member_token, authorization)
+    rows = await db.run_sync(
+        TicketService.get_upcoming_member_tickets,
+        member["merchant_id"], member["external_user_id"], settings.MEMBER_TICKETS_MAX
+    )
+
+    window_start, _ = auth.qr_token_window()
+    version = hashlib.sha256(repr((
+        member["merchant_id"], member["external_user_id"], qr, int(window_start),
+        [(row.uuid, row.is_used, row.updated_at or row.created_at, row.event_updated_at) for row in rows],
+    )).encode("utf-8")).hexdigest()[:32]
+    headers = {"ETag": strong_etag(version), "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    qr_tokens = [
+        None if row.is_used else auth.create_qr_token(ticket_uuid=row.uuid, event_id=row.event_id)
+        for row in rows
+    ]
+    qr_codes = [None] * len(rows)
+    if qr != "none":
+        pending = [(i, qr_token) for i, qr_token in enumerate(qr_tokens) if qr_token]
+        rendered = await asyncio.gather(*(_qr_code(qr_token, qr) for _, qr_token in pending))
+        for (i, _), qr_code in zip(pending, rendered):
+            qr_codes[i] = qr_code
+
+    tickets = [
+        ticket_schema.MemberTicket(
+            uuid=row.uuid,
+            holder_name=row.holder_name,
+            is_used=row.is_used,
+            description=row.description,
+            ticket_type_id=row.ticket_type_id,
+            ticket_type_name=row.ticket_type_name,
+            event_id=row.event_id,
+            event_name=row.event_name,
+            event_description=row.event_description,
+            event_location=row.event_location,
+            event_start_time=row.event_start_time,
+            event_end_time=row.event_end_time,
+            qr_token=qr_token,
+            qr_code=qr_code,
+        )
+        for row, qr_token, qr_code in zip(rows, qr_tokens, qr_codes)
+    ]
+    body = ticket_schema.MemberTicketsResponse(external_user_id=member["external_user_id"], tickets=tickets)
+    return Response(content=body.model_dump_json(), media_type="application/json", headers=headers)
@@ -1,26 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import database, dependencies
 from services.ticket_service import TicketService
 from schemas import ticket as ticket_schema
-from utils import qr_code, auth
+from services.qr_image_service import QRImageService
+from utils import auth
+from utils.cache import public_ticket_cache
+from utils.http_cache import strong_etag, etag_matches, http_date, not_modified
 
 router = APIRouter(
     prefix="/api/v1/public/tickets",
     tags=["Public: Tickets"],
+    dependencies=[Depends(dependencies.rate_limit("public"))],
 )
 
-@router.get("/{ticket_uuid}", response_model=ticket_schema.TicketPublic)
-def get_ticket_by_uuid(ticket_uuid: int, db: Session = Depends(database.get_db)):
+_NOT_MODIFIED = {304: {"description": "Not Modified"}}
+
+
+async def _get_public_ticket(db: AsyncSession, ticket_uuid: int) -> Tuple[ticket_schema.TicketPublic, datetime]:
     """
-    Get public ticket details by UUID.
+    Public view of a ticket and its last modification time.
+    Repeat lookups of the same uuid are served from a short-TTL in-process cache.
     """
-    ticket = TicketService.get_ticket_by_uuid(db, ticket_uuid)
+    cached = public_ticket_cache.get(ticket_uuid)
+    if cached is not None:
+        return cached
+
+    ticket = await db.run_sync(TicketService.get_ticket_by_uuid, ticket_uuid)
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
-    
+
     # Manually construct the response to ensure uuid is properly serialized
-    return ticket_schema.TicketPublic(
+    public = ticket_schema.TicketPublic(
         uuid=ticket.uuid,
         holder_name=ticket.holder_name,
         is_used=ticket.is_used,
@@ -28,51 +42,92 @@ def get_ticket_by_uuid(ticket_uuid: int, db: Session = Depends(database.get_db))
         ticket_type_id=ticket.ticket_type_id,
         description=ticket.description
     )
+    cached = (public, ticket.updated_at or ticket.created_at or datetime.utcnow())
+    public_ticket_cache.set(ticket_uuid, cached)
+    return cached
+
+
+def _validators(version: str, last_modified: datetime) -> dict:
+    return {"ETag": strong_etag(version), "Last-Modified": http_date(last_modified)}
 
-@router.get("/{ticket_uuid}/qr-token", response_model=ticket_schema.QRTokenResponse)
-def get_ticket_qr_token(ticket_uuid: int, db: Session = Depends(database.get_db)):
+
+@router.get("/{ticket_uuid}", response_model=ticket_schema.TicketPublic, responses=_NOT_MODIFIED)
+async def get_ticket_by_uuid(
+    ticket_uuid: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: AsyncSession = Depends(database.get_async_db)
+):
     """
-    Get a JWT token for QR code scanning.
+    Get public ticket details by UUID.
+
+    Carries an ETag / Last-Modified derived from the ticket's `updated_at`; clients must
+    revalidate (`no-cache`) and receive 304 while the ticket is unchanged.
     """
-    ticket = TicketService.get_ticket_by_uuid(db, ticket_uuid)
-    if not ticket:
-        raise HTTPException(status_code=404, detail="Ticket not found")
-    
+    ticket, modified_at = await _get_public_ticket(db, ticket_uuid)
+    headers = _validators(f"{ticket_uuid}-{modified_at:%Y%m%d%H%M%S%f}", modified_at)
+    # Responses carry the holder's data (or a check-in credential): browsers may keep them, shared caches may not
+    headers["Cache-Control"] = "private, no-cache"
+    if not_modified(if_none_match, if_modified_since, headers["ETag"], modified_at):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return ticket
+
+@router.get("/{ticket_uuid}/qr-token", response_model=ticket_schema.QRTokenResponse, responses=_NOT_MODIFIED)
+async def get_ticket_qr_token(
+    ticket_uuid: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """
+    Get a signed token for QR code scanning.
+
+    The token is fixed within a validity window, so it may be cached until the window ends.
+    """
+    ticket, modified_at = await _get_public_ticket(db, ticket_uuid)
+    window_start, _ = auth.qr_token_window()
+    last_modified = max(modified_at, datetime.fromtimestamp(window_start, timezone.utc).replace(tzinfo=None))
+    headers = _validators(f"{ticket_uuid}-{modified_at:%Y%m%d%H%M%S%f}-{int(window_start)}", last_modified)
+    headers["Cache-Control"] = f"private, max-age={QRImageService.max_age()}"
+    if not_modified(if_none_match, if_modified_since, headers["ETag"], last_modified):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
     qr_token = auth.create_qr_token(ticket_uuid=ticket.uuid, event_id=ticket.event_id)
     return {"qr_token": qr_token}
 
 
-@router.get("/{ticket_uuid}/qr", responses={200: {"content": {"image/png": {}}}})
-def get_ticket_qr_code(ticket_uuid: int, db: Session = Depends(database.get_db)):
+@router.get(
+    "/{ticket_uuid}/qr",
+    responses={200: {"content": {"image/png": {}, "image/svg+xml": {}}}, **_NOT_MODIFIED}
+)
+async def get_ticket_qr_code(
+    ticket_uuid: int,
+    format: str = Query("png", pattern="^(png|svg)$", description="png or svg"),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(database.get_async_db)
+):
     """
     Get a QR code for a ticket.
+
+    The QR token is fixed within a validity window, so the image is served from a
+    content-addressed cache and carries a strong ETag; `If-None-Match` returns 304.
     """
-    from fastapi.responses import Response
-    import qrcode
-    from io import BytesIO
-    
-    ticket = TicketService.get_ticket_by_uuid(db, ticket_uuid)
-    if not ticket:
-        raise HTTPException(status_code=404, detail="Ticket not found")
-    
+    ticket, _ = await _get_public_ticket(db, ticket_uuid)
+
     # The QR code should contain the QR token, not the UUID directly
     qr_token = auth.create_qr_token(ticket_uuid=ticket.uuid, event_id=ticket.event_id)
-    
-    # Generate QR code directly
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(qr_token)
-    qr.make(fit=True)
-
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert to PNG bytes
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    
-    return Response(content=buffer.getvalue(), media_type="image/png")
+    key = QRImageService.content_key(qr_token, format)
+    headers = {
+        "ETag": strong_etag(key),
+        "Cache-Control": f"private, max-age={QRImageService.max_age()}",
+    }
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    content = await QRImageService.get_image(key, qr_token, format)
+    return Response(content=content, media_type=QRImageService.media_type(format), headers=headers)
@@ -7,15 +7,21 @@ from fastapi import APIRouter, Depends, HTTPException, status, Form
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.dependencies import get_current_active_staff
-from schemas.staff import StaffLogin, StaffLoginResponse, StaffProfile, StaffEventPermission
+from app.dependencies import get_current_active_staff, rate_limit
+from schemas.staff import (
+    StaffLogin, StaffLoginResponse, StaffProfile, StaffEventPermission,
+    ScanSessionCreate, ScanSessionResponse
+)
 from services.staff_service import StaffService
 from utils.auth import create_access_token
+from utils.scan_session import create_scan_session_token
 from app.config import settings
 
 router = APIRouter(prefix="/api/v1/staff", tags=["Staff: Auth & Profile"])
 
-@router.post("/login", response_model=StaffLoginResponse, summary="Staff Login")
+@router.post(
+    "/login", response_model=StaffLoginResponse, summary="Staff Login", dependencies=[Depends(rate_limit("login"))]
+)
 def staff_login(login_data: StaffLogin, db: Session = Depends(get_db)):
     """
     Staff login with username/password or a temporary login code.
@@ -38,6 +44,43 @@ def staff_login(login_data: StaffLogin, db: Session = Depends(get_db)):
         full_name=staff.full_name
     )
 
+@router.post("/scan-session", response_model=ScanSessionResponse, summary="Exchange login JWT for an event-scoped scan session")
+def create_scan_session(
+    session_data: ScanSessionCreate,
+    current_staff: StaffProfile = Depends(get_current_active_staff),
+    db: Session = Depends(get_db)
+):
+    """
+    Exchange the staff login JWT for a short-lived scan-session token scoped to one event.
+
+    - The token embeds the staff member's check-in/revoke permissions for the event,
+      so check-in endpoints no longer read `staff` or `staff_events` per scan.
+    - Sessions are revoked when the staff member's event permission changes or the
+      staff member is deactivated or deleted; the device then needs to exchange a new token.
+      Revocations are stored in the database and reach every worker within
+      `STAFF_PRINCIPAL_CACHE_TTL_SECONDS`.
+    """
+    permission = StaffService.get_event_permission(db, current_staff.id, session_data.event_id)
+    if not permission or not (permission.can_checkin or permission.can_revoke):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission for this event"
+        )
+
+    scan_token, expires_at = create_scan_session_token(
+        staff_id=current_staff.id,
+        event_id=session_data.event_id,
+        can_checkin=permission.can_checkin,
+        can_revoke=permission.can_revoke
+    )
+    return ScanSessionResponse(
+        scan_token=scan_token,
+        event_id=session_data.event_id,
+        can_checkin=bool(permission.can_checkin),
+        can_revoke=bool(permission.can_revoke),
+        expires_at=expires_at
+    )
+
 @router.get("/me/profile", response_model=StaffProfile, summary="Get Own Profile")
 def get_staff_profile(current_staff: StaffProfile = Depends(get_current_active_staff)):
     """
@@ -14,7 +14,7 @@ from models.event import Event
 router = APIRouter(
     prefix="/api/v1/mgmt/staff",
     tags=["Tenant Mgmt: Staff"],
-    dependencies=[Depends(dependencies.get_current_merchant)],
+    dependencies=[Depends(dependencies.rate_limit("mgmt")), Depends(dependencies.get_current_merchant)],
 )
 
 @router.post("/", response_model=staff_schema.StaffProfile, status_code=status.HTTP_201_CREATED)
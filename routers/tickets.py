@@ -1,19 +1,31 @@
 """
 租戶票券管理 API
 """
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Any, Callable, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, File, Form, UploadFile, Header
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.dependencies import get_current_merchant
+from app.dependencies import get_current_merchant, rate_limit
 from schemas.ticket import (
-    TicketCreate, TicketUpdate, Ticket, BatchTicketCreate
+    TicketCreate, TicketUpdate, Ticket, BatchTicketCreate, TicketImportResult,
+    MemberTokenCreate, MemberTokenResponse
 )
 from schemas.common import APIResponse
 from services.ticket_service import TicketService
+from services.event_service import EventService
+from services.ticket_import_service import TicketImportService, ImportFormat, detect_format
+from services.idempotency_service import (
+    IdempotencyService, IdempotencyKeyMismatchError, IdempotencyKeyInProgressError
+)
 from models.merchant import Merchant
+from app.config import settings
+from utils.member_token import create_member_token
 
-router = APIRouter(prefix="/api/v1/mgmt/tickets", tags=["Tenant Mgmt: Tickets"])
+router = APIRouter(
+    prefix="/api/v1/mgmt/tickets", tags=["Tenant Mgmt: Tickets"], dependencies=[Depends(rate_limit("mgmt"))]
+)
 
 def _convert_ticket_model_to_schema(ticket_model) -> Ticket:
     """將 SQLAlchemy Ticket model 轉換為 Pydantic Ticket schema，並處理 uuid."""
@@ -34,6 +46,21 @@ def _convert_ticket_model_to_schema(ticket_model) -> Ticket:
         description=ticket_model.description
     )
 
+@router.post("/member-token", response_model=MemberTokenResponse)
+def issue_member_token(
+    data: MemberTokenCreate,
+    merchant: Merchant = Depends(get_current_merchant)
+):
+    """
+    為會員（external_user_id）簽發會員 token
+
+    會員以此 token 呼叫 `GET /api/v1/public/members/tickets`，一次取得自己所有即將到來的票券與 QR Code。
+    """
+    token, expires_at = create_member_token(merchant.id, data.external_user_id, data.expires_minutes)
+    return MemberTokenResponse(
+        member_token=token, external_user_id=data.external_user_id, expires_at=expires_at
+    )
+
 @router.get("/{ticket_id}", response_model=Ticket)
 def get_ticket(
     ticket_id: int, 
@@ -58,32 +85,127 @@ def get_tickets(
     tickets_db = TicketService.get_tickets_by_event_and_merchant(db, event_id, merchant.id, skip, limit)
     return [_convert_ticket_model_to_schema(t) for t in tickets_db]
 
+def _run_idempotent(
+    db: Session,
+    idempotency_key: Optional[str],
+    merchant_id: int,
+    operation: str,
+    payload: Any,
+    handler: Callable[[], Any]
+):
+    """
+    以 Idempotency-Key 執行產票：handler 在 db 的交易中產票但不提交，由這裡一次提交。
+    帶 key 時 key 記錄與回應在同一個交易中寫入，相同 key 的重送直接回傳儲存的回應
+    （加上 Idempotent-Replayed 標頭），仍在處理中的重複請求立即回傳 409。
+    """
+    if idempotency_key is None:
+        content = handler()
+        db.commit()
+        return content
+    if not idempotency_key.strip() or len(idempotency_key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be 1-255 characters")
+
+    request_hash = IdempotencyService.fingerprint(operation, jsonable_encoder(payload))
+    try:
+        claim = IdempotencyService.claim(db, merchant_id, idempotency_key, request_hash)
+    except IdempotencyKeyMismatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyKeyInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if claim.replayed:
+        return JSONResponse(
+            status_code=claim.status_code, content=claim.body, headers={"Idempotent-Replayed": "true"}
+        )
+
+    try:
+        content = jsonable_encoder(handler())
+    except HTTPException as e:
+        # 4xx（例如配額不足）與成功回應一樣保存；5xx 不保存，讓客戶端重試
+        if e.status_code < 500:
+            claim.complete(e.status_code, {"detail": e.detail})
+        else:
+            claim.release()
+        raise
+    except BaseException:
+        claim.release()
+        raise
+    claim.complete(200, content)
+    return content
+
 @router.post("", response_model=Ticket)
 def create_ticket(
     ticket_data: TicketCreate,
+    idempotency_key: Optional[str] = Header(None, description="重送時帶相同的 key，回傳第一次的結果而不重複產票"),
     db: Session = Depends(get_db),
     merchant: Merchant = Depends(get_current_merchant)
 ):
     """創建單張票券"""
-    try:
-        ticket = TicketService.create_ticket_with_merchant(db, ticket_data, merchant.id)
-        return _convert_ticket_model_to_schema(ticket)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    def handler():
+        try:
+            ticket = TicketService.create_ticket_with_merchant(db, ticket_data, merchant.id, commit=False)
+            return _convert_ticket_model_to_schema(ticket)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return _run_idempotent(db, idempotency_key, merchant.id, "tickets.create", ticket_data, handler)
 
 @router.post("/batch", response_model=List[Ticket])
 def create_batch_tickets(
     batch_data: BatchTicketCreate,
+    idempotency_key: Optional[str] = Header(None, description="重送時帶相同的 key，回傳第一次的結果而不重複產票"),
     db: Session = Depends(get_db),
     merchant: Merchant = Depends(get_current_merchant)
 ):
     """批次產票"""
+    def handler():
+        try:
+            tickets_db = TicketService.create_batch_tickets_with_merchant(db, batch_data, merchant.id, commit=False)
+            return [_convert_ticket_model_to_schema(t) for t in tickets_db]
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return _run_idempotent(db, idempotency_key, merchant.id, "tickets.batch", batch_data, handler)
+
+@router.post(
+    "/import",
+    response_model=TicketImportResult,
+    responses={422: {"model": TicketImportResult, "description": "Rows failed validation; nothing was imported"}}
+)
+def import_tickets(
+    file: UploadFile = File(..., description="CSV（含標題列）或 JSONL，每列一位持有人"),
+    event_id: int = Form(...),
+    ticket_type_id: Optional[int] = Form(None, description="未在資料列指定票種時使用的票種"),
+    file_format: Optional[str] = Form(None, description="csv 或 jsonl，未提供時依檔名判斷"),
+    skip_invalid: bool = Form(False, description="略過驗證失敗的資料列，只匯入有效列"),
+    db: Session = Depends(get_db),
+    merchant: Merchant = Depends(get_current_merchant)
+):
+    """
+    匯入持有人名單產生票券（CSV / JSONL）
+
+    欄位：holder_name（必填）、holder_email、holder_phone、external_user_id、notes、description、ticket_type_id。
+    檔案以串流方式驗證並批次寫入，提交前一次檢查整份檔案的配額；回傳每一列的錯誤報告。
+    預設只要有任何錯誤就不匯入（422），`skip_invalid=true` 時只匯入有效列。
+    """
+    event = EventService.get_event_by_id(db, event_id)
+    if not event or (settings.ENABLE_MULTI_TENANT and event.merchant_id != merchant.id):
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    file_format = (file_format or detect_format(file.filename, file.content_type) or "").lower()
+    if file_format not in (ImportFormat.CSV, ImportFormat.JSONL):
+        raise HTTPException(status_code=400, detail="Unsupported file format. Use csv or jsonl.")
+
     try:
-        tickets_db = TicketService.create_batch_tickets_with_merchant(db, batch_data, merchant.id)
-        return [_convert_ticket_model_to_schema(t) for t in tickets_db]
+        result = TicketImportService.import_file(
+            db, file.file, file_format, event_id, ticket_type_id, skip_invalid
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    if result["error_count"] and not skip_invalid:
+        return JSONResponse(status_code=422, content=TicketImportResult(**result).model_dump())
+    return result
+
 @router.put("/{ticket_id}", response_model=Ticket)
 def update_ticket(
     ticket_id: int,
@@ -2,7 +2,7 @@
 簽到相關的 Pydantic schemas
 """
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 from pydantic import BaseModel
 
 class CheckInRequest(BaseModel):
@@ -16,6 +16,25 @@ class CheckInResponse(BaseModel):
     checkin_time: Optional[datetime] = None
     message: str
 
+# 批次簽到（閘門 / 多通道掃描器）
+class BatchCheckInRequest(BaseModel):
+    event_id: int
+    qr_tokens: List[str]
+
+class BatchCheckInItem(BaseModel):
+    index: int
+    status: str  # ok / already_used / wrong_event / invalid
+    ticket_id: Optional[int] = None
+    holder_name: Optional[str] = None
+    checkin_time: Optional[datetime] = None
+    message: str
+
+class BatchCheckInResponse(BaseModel):
+    event_id: int
+    total: int
+    succeeded: int
+    results: List[BatchCheckInItem]
+
 class CheckInRevoke(BaseModel):
     checkin_log_id: int
     reason: Optional[str] = None
@@ -45,3 +64,15 @@ class OfflineCheckIn(BaseModel):
 class OfflineCheckInSync(BaseModel):
     event_id: int
     checkins: list[OfflineCheckIn]
+
+class OfflineCheckInSyncItem(BaseModel):
+    index: int
+    ticket_id: int
+    status: str  # ok / already_used / wrong_event / not_found
+    checkin_log_id: Optional[int] = None
+
+class OfflineCheckInSyncResult(BaseModel):
+    event_id: int
+    total: int
+    created: int
+    results: List[OfflineCheckInSyncItem]
@@ -67,3 +67,25 @@ class OfflineTicket(BaseModel):
     holder_name: str
     ticket_type_name: Optional[str]
     is_used: bool
+
+# 熱門活動票券索引
+class HotEventIndexStats(BaseModel):
+    event_id: int
+    pinned: bool
+    tickets: int
+    used: int
+    memory_bytes: int
+    synced_at: Optional[datetime] = None
+    hits: int
+    rejections: int
+
+class HotEventConsistencyReport(BaseModel):
+    event_id: int
+    db_tickets: int
+    index_tickets: int
+    missing_in_index: int
+    extra_in_index: int
+    used_mismatch: int
+    consistent: bool
+    repaired: bool
+    sample_mismatched_uuids: List[str] = []
@@ -16,6 +16,17 @@ class StaffLoginResponse(BaseModel):
     staff_id: int
     full_name: str
 
+class ScanSessionCreate(BaseModel):
+    event_id: int
+
+class ScanSessionResponse(BaseModel):
+    scan_token: str
+    token_type: str = "bearer"
+    event_id: int
+    can_checkin: bool
+    can_revoke: bool
+    expires_at: datetime
+
 class StaffProfile(BaseModel):
     id: int
     username: str
@@ -2,8 +2,8 @@
 票券相關的 Pydantic schemas
 """
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator
 
 # 票券基本 schema
 class TicketBase(BaseModel):
@@ -71,6 +71,36 @@ class TicketVerifyResponse(BaseModel):
 class QRTokenResponse(BaseModel):
     qr_token: str
 
+# 會員票券查詢（以 external_user_id 簽發的會員 token）
+class MemberTokenCreate(BaseModel):
+    external_user_id: str = Field(min_length=1, max_length=100)
+    expires_minutes: Optional[int] = Field(None, gt=0, le=525600)  # 未提供時使用 MEMBER_TOKEN_EXPIRE_MINUTES
+
+class MemberTokenResponse(BaseModel):
+    member_token: str
+    external_user_id: str
+    expires_at: datetime
+
+class MemberTicket(BaseModel):
+    uuid: int
+    holder_name: str
+    is_used: bool
+    description: Optional[str] = None
+    ticket_type_id: Optional[int] = None
+    ticket_type_name: Optional[str] = None
+    event_id: int
+    event_name: str
+    event_description: Optional[str] = None
+    event_location: Optional[str] = None
+    event_start_time: datetime
+    event_end_time: datetime
+    qr_token: Optional[str] = None  # 已使用的票券為 None
+    qr_code: Optional[str] = None  # qr=svg 時為 SVG 標記，qr=png 時為 data URI；已使用或 qr=none 時為 None
+
+class MemberTicketsResponse(BaseModel):
+    external_user_id: str
+    tickets: List[MemberTicket]
+
 # 批次產票
 class BatchTicketCreate(BaseModel):
     event_id: int
@@ -78,3 +108,47 @@ class BatchTicketCreate(BaseModel):
     count: int
     holder_name_prefix: str = "票券"  # 例如: "票券001", "票券002"
     description: Optional[str] = None  # JSON 格式的額外資訊，套用到所有票券
+
+# 票券匯入（CSV / JSONL，每列一位持有人）
+class TicketImportRow(BaseModel):
+    holder_name: str = Field(min_length=1, max_length=100)
+    holder_email: Optional[str] = Field(None, max_length=100)
+    holder_phone: Optional[str] = Field(None, max_length=20)
+    external_user_id: Optional[str] = Field(None, max_length=100)
+    notes: Optional[str] = None
+    description: Optional[str] = None  # JSON 格式的額外資訊
+    ticket_type_id: Optional[int] = None  # 未提供時使用匯入請求的 ticket_type_id
+
+    @field_validator("holder_name", mode="before")
+    @classmethod
+    def strip_name(cls, value):
+        return value.strip() if isinstance(value, str) else value
+
+    @field_validator(
+        "holder_email", "holder_phone", "external_user_id", "notes", "description", "ticket_type_id", mode="before"
+    )
+    @classmethod
+    def strip_blank(cls, value):
+        """去除前後空白，空字串視為未提供"""
+        if isinstance(value, str):
+            value = value.strip()
+            return value or None
+        return value
+
+    @field_validator("holder_email")
+    @classmethod
+    def check_email(cls, value):
+        if value is not None and ("@" not in value or value.startswith("@") or value.endswith("@")):
+            raise ValueError("invalid email address")
+        return value
+
+class TicketImportRowError(BaseModel):
+    row: int  # 資料列號（CSV 不含標題列，從 1 開始）
+    errors: List[str]
+
+class TicketImportResult(BaseModel):
+    total_rows: int
+    imported: int
+    error_count: int
+    errors: List[TicketImportRowError]
+    errors_truncated: bool = False  # 錯誤超過 TICKET_IMPORT_MAX_ERRORS 筆時只回傳前面的部分
@@ -8,3 +8,12 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     sub: Optional[str] = None
     type: Optional[str] = None
+
+class CheckInPrincipal(BaseModel):
+    """簽到端點的已驗證身分（登入 JWT 或掃描 session token）"""
+    staff_id: int
+    is_scan_session: bool = False
+    # 以下僅掃描 session 有值，登入 JWT 需另行查詢 staff_events
+    event_id: Optional[int] = None
+    can_checkin: bool = False
+    can_revoke: bool = False
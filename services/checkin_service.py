@@ -1,39 +1,214 @@
 """
 簽到服務
 """
-from typing import List, Optional
-from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+from datetime import datetime, timezone
+from sqlalchemy import select, update, exists, literal, and_, true, func, values, column, text, case, Integer, DateTime
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
-from models import CheckInLog, Ticket, Staff
+from models import CheckInLog, Ticket, Staff, StaffEvent
 from schemas.checkin import CheckInRequest, OfflineCheckInSync
 from services.ticket_service import TicketService
+from services.ticket_counter_service import TicketCounterService
+from utils.metrics import instrument_service
+from utils.cache import invalidate_public_ticket
 
+# checkin_logs 的部分唯一索引條件（每張票券最多一筆未撤銷的簽到記錄）
+_ACTIVE_CHECKIN_WHERE = text("NOT is_revoked")
+
+# 離線同步每個語句處理的票券數（控制單一語句的參數數量與記憶體）
+_OFFLINE_SYNC_CHUNK_SIZE = 1000
+
+
+class CheckInStatus:
+    """簽到結果狀態"""
+    OK = "ok"
+    ALREADY_USED = "already_used"
+    WRONG_EVENT = "wrong_event"
+    NOT_FOUND = "not_found"
+    FORBIDDEN = "forbidden"
+    INVALID = "invalid"
+
+
+@instrument_service
 class CheckInService:
     
     @staticmethod
     def check_in_ticket(
         db: Session, 
-        ticket_id: int, 
-        staff_id: Optional[int] = None,
+        ticket_uuid: int, 
+        event_id: int,
+        staff_id: int,
         ip_address: Optional[str] = None,
-        user_agent: Optional[str] = None
-    ) -> CheckInLog:
-        """簽到票券"""
-        # 標記票券為已使用
-        TicketService.mark_ticket_used(db, ticket_id)
-        
-        # 建立簽到記錄
-        checkin_log = CheckInLog(
-            ticket_id=ticket_id,
-            staff_id=staff_id,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            checkin_time=datetime.utcnow()
+        user_agent: Optional[str] = None,
+        permission_checked: bool = False
+    ) -> dict:
+        """
+        簽到票券（單一語句完成）
+
+        權限檢查、票券 is_used false → true 的條件式轉換以及簽到記錄寫入
+        合併為一個 data-modifying CTE，在同一個交易內一次往返完成。
+        兩台掃描器同時掃同一張票時只有一台會成功，另一台得到 ALREADY_USED。
+        permission_checked=True 表示呼叫端已驗證權限（例如掃描 session token），
+        此時不再查詢 staff_events。
+        """
+        results = CheckInService._check_in_uuids(
+            db, [ticket_uuid], event_id, staff_id, ip_address, user_agent, permission_checked
         )
-        db.add(checkin_log)
-        db.commit()
-        db.refresh(checkin_log)
-        return checkin_log
+        return results.get(ticket_uuid) or CheckInService._empty_result(CheckInStatus.NOT_FOUND)
+
+    @staticmethod
+    def check_in_batch(
+        db: Session,
+        ticket_uuids: List[Optional[int]],
+        event_id: int,
+        staff_id: int,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None,
+        permission_checked: bool = False
+    ) -> List[dict]:
+        """
+        批次簽到（閘門 / 多通道掃描器）
+
+        所有票券以同一個語句查詢與轉換狀態，權限只檢查一次。
+        回傳結果與輸入順序一致；無法解碼的 token 以 None 傳入並回傳 INVALID，
+        同一批次內重複的票券只有第一筆會成功，其餘為 ALREADY_USED。
+        """
+        valid_uuids = [u for u in ticket_uuids if u is not None]
+        by_uuid = CheckInService._check_in_uuids(
+            db, valid_uuids, event_id, staff_id, ip_address, user_agent, permission_checked
+        ) if valid_uuids else {}
+
+        results = []
+        seen = set()
+        for ticket_uuid in ticket_uuids:
+            result = by_uuid.get(ticket_uuid)
+            if result is None:
+                results.append(CheckInService._empty_result(CheckInStatus.INVALID))
+                continue
+            if ticket_uuid in seen and result["status"] == CheckInStatus.OK:
+                result = dict(result, status=CheckInStatus.ALREADY_USED, checkin_log_id=None, checkin_time=None)
+            seen.add(ticket_uuid)
+            results.append(result)
+        return results
+
+    @staticmethod
+    def _empty_result(status: str) -> dict:
+        return {
+            "status": status,
+            "ticket_id": None,
+            "holder_name": None,
+            "checkin_log_id": None,
+            "checkin_time": None
+        }
+
+    @staticmethod
+    def _permitted_clause(staff_id: int, event_id: int, permission_checked: bool):
+        """員工在該活動的簽到權限（呼叫端已驗證時為常數 true）"""
+        if permission_checked:
+            return true()
+        return exists().where(and_(
+            StaffEvent.staff_id == staff_id,
+            StaffEvent.event_id == event_id,
+            StaffEvent.can_checkin == True
+        ))
+
+    @staticmethod
+    def _counter_cte(marked, logged):
+        """依本次標記為已使用的票券與寫入的簽到記錄累加計數器（併入簽到語句的 CTE）"""
+        delta = (select(
+                     marked.c.event_id,
+                     marked.c.ticket_type_id,
+                     literal(0, Integer).label("issued"),
+                     literal(1, Integer).label("used"),
+                     case((logged.c.id.isnot(None), 1), else_=0).label("active_checkins"),
+                     literal(0, Integer).label("revoked"))
+                 .select_from(marked.outerjoin(logged, logged.c.ticket_id == marked.c.id)))
+        return TicketCounterService.upsert_stmt(delta).cte("counted")
+
+    @staticmethod
+    def _check_in_uuids(
+        db: Session,
+        ticket_uuids: List[int],
+        event_id: int,
+        staff_id: int,
+        ip_address: Optional[str],
+        user_agent: Optional[str],
+        permission_checked: bool
+    ) -> Dict[int, dict]:
+        """以一個 data-modifying CTE 簽到一組票券，回傳 uuid -> 結果（找不到的票券不在結果中）"""
+        now = datetime.utcnow()
+        log_columns = CheckInLog.__table__.c
+
+        permitted = CheckInService._permitted_clause(staff_id, event_id, permission_checked)
+
+        # 只有在票券屬於該活動、尚未使用且員工有簽到權限時才會更新
+        marked = (update(Ticket)
+                  .where(Ticket.uuid.in_(ticket_uuids))
+                  .where(Ticket.event_id == event_id)
+                  .where(Ticket.is_used.isnot(True))
+                  .where(permitted)
+                  .values(is_used=True, updated_at=func.now())
+                  .returning(Ticket.id, Ticket.event_id, Ticket.ticket_type_id)
+                  .cte("marked"))
+
+        logged = (insert(CheckInLog)
+                  .from_select(
+                      ["ticket_id", "staff_id", "checkin_time", "ip_address", "user_agent", "is_revoked"],
+                      select(
+                          marked.c.id,
+                          literal(staff_id, log_columns.staff_id.type),
+                          literal(now, log_columns.checkin_time.type),
+                          literal(ip_address, log_columns.ip_address.type),
+                          literal(user_agent, log_columns.user_agent.type),
+                          literal(False, log_columns.is_revoked.type)
+                      )
+                  )
+                  .on_conflict_do_nothing(index_elements=["ticket_id"], index_where=_ACTIVE_CHECKIN_WHERE)
+                  .returning(CheckInLog.id, CheckInLog.ticket_id)
+                  .cte("logged"))
+
+        # 主查詢讀到的是語句開始時的快照，用來判斷失敗原因
+        stmt = (select(
+                    Ticket.id,
+                    Ticket.uuid,
+                    Ticket.event_id,
+                    Ticket.ticket_type_id,
+                    Ticket.holder_name,
+                    permitted.label("permitted"),
+                    logged.c.id.label("checkin_log_id")
+                )
+                .select_from(Ticket)
+                .outerjoin(logged, logged.c.ticket_id == Ticket.id)
+                .where(Ticket.uuid.in_(ticket_uuids))
+                .add_cte(CheckInService._counter_cte(marked, logged)))
+
+        try:
+            rows = db.execute(stmt).all()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        results = {}
+        for row in rows:
+            result = CheckInService._empty_result(CheckInStatus.OK)
+            result["ticket_id"] = row.id
+            result["ticket_type_id"] = row.ticket_type_id
+            result["holder_name"] = row.holder_name
+            if row.checkin_log_id is not None:
+                result["checkin_log_id"] = row.checkin_log_id
+                result["checkin_time"] = now
+                invalidate_public_ticket(row.uuid)
+            elif not row.permitted:
+                result["status"] = CheckInStatus.FORBIDDEN
+            elif row.event_id != event_id:
+                result["status"] = CheckInStatus.WRONG_EVENT
+            else:
+                # 已使用，或在同一瞬間被其他掃描器搶先簽到
+                result["status"] = CheckInStatus.ALREADY_USED
+            results[row.uuid] = result
+        return results
     
     @staticmethod
     def get_checkin_log_by_id(db: Session, checkin_log_id: int) -> Optional[CheckInLog]:
@@ -46,23 +221,48 @@ class CheckInService:
         checkin_log_id: int, 
         revoked_by_staff_id: int
     ) -> Optional[CheckInLog]:
-        """撤銷簽到"""
-        checkin_log = db.query(CheckInLog).filter(CheckInLog.id == checkin_log_id).first()
-        if not checkin_log:
-            return None
-        
-        # 標記為已撤銷
-        checkin_log.is_revoked = True
-        checkin_log.revoked_by = revoked_by_staff_id
-        checkin_log.revoked_at = datetime.utcnow()
-        
-        # 將票券標記為未使用
-        ticket = db.query(Ticket).filter(Ticket.id == checkin_log.ticket_id).first()
-        if ticket:
-            ticket.is_used = False
-        
-        db.commit()
-        db.refresh(checkin_log)
+        """
+        撤銷簽到
+
+        只有未撤銷的記錄會被轉換（條件式 UPDATE），同時撤銷同一筆記錄時只有一個請求成功。
+        記錄不存在時回傳 None；已撤銷時拋出 ValueError。
+        """
+        try:
+            checkin_log = db.execute(
+                update(CheckInLog)
+                .where(CheckInLog.id == checkin_log_id)
+                .where(CheckInLog.is_revoked.isnot(True))
+                .values(is_revoked=True, revoked_by=revoked_by_staff_id, revoked_at=datetime.utcnow())
+                .returning(CheckInLog)
+            ).scalar_one_or_none()
+
+            if checkin_log is None:
+                db.rollback()
+                if CheckInService.get_checkin_log_by_id(db, checkin_log_id) is None:
+                    return None
+                raise ValueError("Check-in has already been revoked")
+
+            # 將票券標記為未使用，並在同一個交易內更新計數器
+            ticket = db.execute(
+                select(Ticket.event_id, Ticket.ticket_type_id).where(Ticket.id == checkin_log.ticket_id)
+            ).one()
+            unmarked = db.execute(
+                update(Ticket)
+                .where(Ticket.id == checkin_log.ticket_id)
+                .where(Ticket.is_used.is_(True))
+                .values(is_used=False, updated_at=func.now())
+                .returning(Ticket.uuid)
+            ).first()
+            TicketCounterService.add(
+                db, ticket.event_id, ticket.ticket_type_id,
+                used=-1 if unmarked else 0, active_checkins=-1, revoked=1
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        if unmarked:
+            invalidate_public_ticket(unmarked.uuid)
         return checkin_log
     
     @staticmethod
@@ -122,34 +322,135 @@ class CheckInService:
         return result
     
     @staticmethod
-    def sync_offline_checkins(db: Session, sync_data: OfflineCheckInSync, staff_id: int) -> List[CheckInLog]:
-        """同步離線簽到記錄"""
-        checkin_logs = []
-        
-        for offline_checkin in sync_data.checkins:
-            # 檢查票券是否已經簽到過
-            existing_checkin = (db.query(CheckInLog)
-                              .filter(CheckInLog.ticket_id == offline_checkin.ticket_id)
-                              .filter(CheckInLog.is_revoked == False)
-                              .first())
-            
-            if existing_checkin:
-                continue  # 跳過已簽到的票券
-            
-            # 建立簽到記錄
-            checkin_log = CheckInLog(
-                ticket_id=offline_checkin.ticket_id,
-                staff_id=staff_id,
-                checkin_time=offline_checkin.checkin_time
-            )
-            db.add(checkin_log)
-            checkin_logs.append(checkin_log)
-            
-            # 標記票券為已使用
-            TicketService.mark_ticket_used(db, offline_checkin.ticket_id)
-        
-        db.commit()
-        for log in checkin_logs:
-            db.refresh(log)
-        
-        return checkin_logs
+    def sync_offline_checkins(
+        db: Session,
+        sync_data: OfflineCheckInSync,
+        staff_id: int,
+        permission_checked: bool = False
+    ) -> List[dict]:
+        """
+        同步離線簽到記錄（集合式處理）
+
+        整批在同一個交易內處理，每 _OFFLINE_SYNC_CHUNK_SIZE 筆以一個 data-modifying CTE
+        完成權限檢查、票券狀態轉換與簽到記錄寫入，與線上簽到使用相同的條件式轉換。
+        回傳結果與輸入順序一致，每筆包含 status / ticket_id / ticket_uuid / checkin_log_id：
+        - 項目的 event_id 與批次不同，或票券屬於其他活動：WRONG_EVENT
+        - 同一批次重複的票券只處理第一筆，其餘為 ALREADY_USED
+        - 票券已被使用（線上或其他裝置先簽到）：ALREADY_USED
+        """
+        event_id = sync_data.event_id
+        results: List[Optional[dict]] = [None] * len(sync_data.checkins)
+        first_index: Dict[int, int] = {}
+        for index, item in enumerate(sync_data.checkins):
+            if item.event_id != event_id:
+                results[index] = CheckInService._sync_result(CheckInStatus.WRONG_EVENT, item.ticket_id)
+            elif item.ticket_id in first_index:
+                results[index] = CheckInService._sync_result(CheckInStatus.ALREADY_USED, item.ticket_id)
+            else:
+                first_index[item.ticket_id] = index
+
+        pending = list(first_index.items())
+        try:
+            for start in range(0, len(pending), _OFFLINE_SYNC_CHUNK_SIZE):
+                chunk = pending[start:start + _OFFLINE_SYNC_CHUNK_SIZE]
+                by_ticket_id = CheckInService._sync_offline_chunk(
+                    db,
+                    [(ticket_id, sync_data.checkins[index].checkin_time) for ticket_id, index in chunk],
+                    event_id,
+                    staff_id,
+                    permission_checked
+                )
+                for ticket_id, index in chunk:
+                    results[index] = by_ticket_id.get(ticket_id) or CheckInService._sync_result(
+                        CheckInStatus.NOT_FOUND, ticket_id
+                    )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        for result in results:
+            if result["status"] == CheckInStatus.OK:
+                invalidate_public_ticket(result["ticket_uuid"])
+        return results
+
+    @staticmethod
+    def _sync_result(status: str, ticket_id: int) -> dict:
+        return {"status": status, "ticket_id": ticket_id, "ticket_uuid": None, "checkin_log_id": None}
+
+    @staticmethod
+    def _sync_offline_chunk(
+        db: Session,
+        items: List[Tuple[int, datetime]],
+        event_id: int,
+        staff_id: int,
+        permission_checked: bool
+    ) -> Dict[int, dict]:
+        """以一個語句同步一段離線簽到，回傳 ticket_id -> 結果（找不到的票券不在結果中），不提交交易"""
+        log_columns = CheckInLog.__table__.c
+        permitted = CheckInService._permitted_clause(staff_id, event_id, permission_checked)
+        ticket_ids = [ticket_id for ticket_id, _ in items]
+
+        # 簽到時間以 naive UTC 儲存，與線上簽到的 datetime.utcnow() 一致
+        offline = values(
+            column("ticket_id", Integer),
+            column("checkin_time", DateTime),
+            name="offline"
+        ).data([
+            (ticket_id, checkin_time.astimezone(timezone.utc).replace(tzinfo=None) if checkin_time.tzinfo else checkin_time)
+            for ticket_id, checkin_time in items
+        ])
+
+        marked = (update(Ticket)
+                  .where(Ticket.id.in_(ticket_ids))
+                  .where(Ticket.event_id == event_id)
+                  .where(Ticket.is_used.isnot(True))
+                  .where(permitted)
+                  .values(is_used=True, updated_at=func.now())
+                  .returning(Ticket.id, Ticket.event_id, Ticket.ticket_type_id)
+                  .cte("marked"))
+
+        logged = (insert(CheckInLog)
+                  .from_select(
+                      ["ticket_id", "staff_id", "checkin_time", "is_revoked"],
+                      select(
+                          marked.c.id,
+                          literal(staff_id, log_columns.staff_id.type),
+                          offline.c.checkin_time,
+                          literal(False, log_columns.is_revoked.type)
+                      ).select_from(marked.join(offline, offline.c.ticket_id == marked.c.id))
+                  )
+                  .on_conflict_do_nothing(index_elements=["ticket_id"], index_where=_ACTIVE_CHECKIN_WHERE)
+                  .returning(CheckInLog.id, CheckInLog.ticket_id)
+                  .cte("logged"))
+
+        stmt = (select(
+                    Ticket.id,
+                    Ticket.uuid,
+                    Ticket.event_id,
+                    Ticket.ticket_type_id,
+                    permitted.label("permitted"),
+                    logged.c.id.label("checkin_log_id")
+                )
+                .select_from(Ticket)
+                .outerjoin(logged, logged.c.ticket_id == Ticket.id)
+                .where(Ticket.id.in_(ticket_ids))
+                .add_cte(CheckInService._counter_cte(marked, logged)))
+
+        results = {}
+        for row in db.execute(stmt):
+            if row.checkin_log_id is not None:
+                status = CheckInStatus.OK
+            elif not row.permitted:
+                status = CheckInStatus.FORBIDDEN
+            elif row.event_id != event_id:
+                status = CheckInStatus.WRONG_EVENT
+            else:
+                status = CheckInStatus.ALREADY_USED
+            results[row.id] = {
+                "status": status,
+                "ticket_id": row.id,
+                "ticket_type_id": row.ticket_type_id,
+                "ticket_uuid": row.uuid,
+                "checkin_log_id": row.checkin_log_id
+            }
+        return results
@@ -0,0 +1,178 @@
+"""
+簽到即時事件串流服務
+
+簽到、撤銷與離線同步完成後發布事件，由單一行程內的 broadcaster 分送給該活動的所有訂閱者
+（/api/v1/staff/checkin/stream/{event_id} 的 SSE 連線），取代儀表板反覆輪詢簽到記錄。
+
+- 每個活動保留最近 CHECKIN_STREAM_BUFFER_SIZE 筆事件，斷線重連時可從游標（SSE Last-Event-ID）續傳；
+  活動沒有訂閱者超過 CHECKIN_STREAM_IDLE_SECONDS 後釋放其緩衝，之後的重連會收到 reset
+- 游標格式為 "<行程 epoch>-<序號>"；行程重啟或游標已超出保留範圍時，訂閱者會收到 reset 事件，
+  應改以簽到記錄 API 重新載入
+- 發布可在事件迴圈或 threadpool 中呼叫，透過 call_soon_threadsafe 投遞給各訂閱者
+- 訂閱者佇列滿（消費過慢）時會被中斷，由客戶端以游標重連
+
+事件只在發布的 worker 內分送，多 worker 部署時需讓同一活動的串流與簽到請求落在同一 worker，
+或改用外部 pub/sub。
+"""
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+from app.config import settings
+
+# 本行程的游標前綴，重啟後舊游標一律視為失效
+_EPOCH = str(int(time.time() * 1000))
+
+_lock = threading.Lock()
+_channels: Dict[int, "_Channel"] = {}
+_sequence = 0
+
+
+class StreamEvent:
+    """串流事件類型"""
+    CHECKIN = "checkin"
+    REVOKE = "revoke"
+    SYNC = "sync"
+    RESET = "reset"
+
+
+class Subscription:
+    """單一訂閱者：續傳的歷史事件、即時事件佇列與所屬事件迴圈"""
+
+    def __init__(self, event_id: int, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.event_id = event_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.backlog: List[Tuple[str, str, dict]] = []
+        self.start_cursor = ""  # 訂閱當下的最新游標
+        self.reset = False
+        self.closed = False
+
+    def _deliver(self, item: Optional[Tuple[str, str, dict]]) -> None:
+        """在訂閱者的事件迴圈中執行；佇列已滿時中斷訂閱（以 None 通知結束）"""
+        if self.closed:
+            return
+        if item is not None and self.queue.full():
+            self.closed = True
+            item = None
+        if item is None:
+            # 讓等待中的消費者醒來並結束
+            while self.queue.full():
+                self.queue.get_nowait()
+        self.queue.put_nowait(item)
+
+
+class _Channel:
+    def __init__(self, buffer_size: int, start_seq: int):
+        self.buffer: Deque[Tuple[int, str, dict]] = deque(maxlen=buffer_size)
+        self.subscribers: Set[Subscription] = set()
+        # 序號 <= resumable_after 的事件已不在保留範圍內（或發生在頻道建立之前）
+        self.resumable_after = start_seq
+        # 最後一位訂閱者離開的時間（monotonic）；有訂閱者時為 None
+        self.idle_since: Optional[float] = None
+
+    def expired(self, now: float) -> bool:
+        return (
+            not self.subscribers
+            and self.idle_since is not None
+            and now - self.idle_since > settings.CHECKIN_STREAM_IDLE_SECONDS
+        )
+
+
+def _drop_idle_channels() -> None:
+    """釋放沒有訂閱者且閒置超過保留時間的頻道（呼叫端須持有 _lock）"""
+    now = time.monotonic()
+    for event_id in [event_id for event_id, channel in _channels.items() if channel.expired(now)]:
+        del _channels[event_id]
+
+
+def _format_cursor(seq: int) -> str:
+    return f"{_EPOCH}-{seq}"
+
+
+def _parse_cursor(cursor: Optional[str]) -> Optional[int]:
+    """解析游標，非本行程發出或格式錯誤時回傳 -1，未提供時回傳 None"""
+    if not cursor:
+        return None
+    epoch, _, seq = cursor.partition("-")
+    if epoch != _EPOCH or not seq.isdigit():
+        return -1
+    return int(seq)
+
+
+class CheckInStreamService:
+
+    @staticmethod
+    def publish(event_id: int, event_type: str, data: dict) -> None:
+        """發布事件；活動沒有任何訂閱紀錄時不做任何事"""
+        global _sequence
+        channel = _channels.get(event_id)
+        if channel is None:
+            return
+        with _lock:
+            if channel.expired(time.monotonic()):
+                if _channels.get(event_id) is channel:
+                    del _channels[event_id]
+                return
+            _sequence += 1
+            seq = _sequence
+            if len(channel.buffer) == channel.buffer.maxlen:
+                channel.resumable_after = channel.buffer[0][0]
+            channel.buffer.append((seq, event_type, data))
+            subscribers = list(channel.subscribers)
+        item = (_format_cursor(seq), event_type, data)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, item)
+            except RuntimeError:
+                # 事件迴圈已關閉
+                CheckInStreamService.unsubscribe(subscription)
+
+    @staticmethod
+    def subscribe(event_id: int, cursor: Optional[str] = None) -> Subscription:
+        """
+        訂閱活動事件（須在事件迴圈中呼叫）。
+        提供游標時，保留範圍內較新的事件會放在 subscription.backlog；
+        游標無法續傳時 subscription.reset 為 True。
+        """
+        subscription = Subscription(
+            event_id, asyncio.get_running_loop(), settings.CHECKIN_STREAM_BUFFER_SIZE
+        )
+        last_seq = _parse_cursor(cursor)
+        with _lock:
+            _drop_idle_channels()
+            channel = _channels.get(event_id)
+            if channel is None:
+                channel = _channels[event_id] = _Channel(settings.CHECKIN_STREAM_BUFFER_SIZE, _sequence)
+            subscription.start_cursor = _format_cursor(_sequence)
+            if last_seq is not None:
+                if last_seq < channel.resumable_after or last_seq > _sequence:
+                    subscription.reset = True
+                else:
+                    subscription.backlog = [
+                        (_format_cursor(seq), event_type, data)
+                        for seq, event_type, data in channel.buffer if seq > last_seq
+                    ]
+            channel.subscribers.add(subscription)
+            channel.idle_since = None
+        return subscription
+
+    @staticmethod
+    def unsubscribe(subscription: Subscription) -> None:
+        subscription.closed = True
+        with _lock:
+            channel = _channels.get(subscription.event_id)
+            if channel is not None:
+                channel.subscribers.discard(subscription)
+                if not channel.subscribers and channel.idle_since is None:
+                    channel.idle_since = time.monotonic()
+            _drop_idle_channels()
+
+    @staticmethod
+    def subscriber_count(event_id: Optional[int] = None) -> int:
+        with _lock:
+            if event_id is not None:
+                channel = _channels.get(event_id)
+                return len(channel.subscribers) if channel else 0
+            return sum(len(c.subscribers) for c in _channels.values())
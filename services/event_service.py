@@ -3,8 +3,9 @@
 """
 from typing import List, Optional
 from sqlalchemy.orm import Session
-from models import Event, TicketType, Ticket
+from models import Event, TicketType, Ticket, TicketCounter
 from schemas.event import EventCreate, EventUpdate, TicketTypeCreate, TicketTypeUpdate
+from services.ticket_counter_service import TicketCounterService, EVENT_TOTAL
 
 class EventService:
     
@@ -201,6 +202,7 @@ class EventService:
         ticket_type = query.first()
         if not ticket_type:
             return False
+        db.query(TicketCounter).filter(TicketCounter.ticket_type_id == ticket_type.id).delete(synchronize_session=False)
         db.delete(ticket_type)
         db.commit()
         return True
@@ -223,6 +225,7 @@ class EventService:
         if existing_tickets > 0:
             raise ValueError(f"無法刪除票種，還有 {existing_tickets} 張票券使用此票種")
         
+        db.query(TicketCounter).filter(TicketCounter.ticket_type_id == ticket_type_id).delete(synchronize_session=False)
         db.delete(ticket_type)
         db.commit()
         return True
@@ -237,27 +240,18 @@ class EventService:
         # 取得票種資訊
         ticket_types = db.query(TicketType).filter(TicketType.event_id == event_id).all()
         
-        # 取得票券統計
-        from models.ticket import Ticket
-        total_tickets = db.query(Ticket).filter(Ticket.event_id == event_id).count()
-        used_tickets = db.query(Ticket).filter(
-            Ticket.event_id == event_id, 
-            Ticket.is_used == True
-        ).count()
-        
-        # 取得簽到統計
-        from models.checkin import CheckInLog
-        checkin_count = db.query(CheckInLog).join(Ticket).filter(
-            Ticket.event_id == event_id
-        ).count()
+        # 取得票券與簽到統計（讀取實體化計數器）
+        counts = TicketCounterService.get_counts(db, event_id)
+        totals = counts[EVENT_TOTAL]
+        total_tickets = totals["issued"]
+        used_tickets = totals["used"]
+        checkin_count = totals["active_checkins"] + totals["revoked"]
         
         ticket_type_summary = []
         for tt in ticket_types:
-            tt_tickets = db.query(Ticket).filter(Ticket.ticket_type_id == tt.id).count()
-            tt_used = db.query(Ticket).filter(
-                Ticket.ticket_type_id == tt.id,
-                Ticket.is_used == True
-            ).count()
+            tt_counts = counts.get(tt.id, {})
+            tt_tickets = tt_counts.get("issued", 0)
+            tt_used = tt_counts.get("used", 0)
             
             ticket_type_summary.append({
                 "id": tt.id,
@@ -10,7 +10,10 @@ from sqlalchemy import func, case
 from models import CheckInLog, Ticket, Staff, Event, TicketType
 from services.checkin_service import CheckInService
 from services.ticket_service import TicketService
+from services.ticket_counter_service import TicketCounterService, EVENT_TOTAL
+from utils.metrics import instrument_service
 
+@instrument_service
 class ExportService:
     
     @staticmethod
@@ -97,30 +100,13 @@ class ExportService:
     @staticmethod
     def get_event_statistics(db: Session, event_id: int) -> Dict[str, Any]:
         """獲取活動統計資訊"""
-        # 總票券數
-        total_tickets = (db.query(Ticket)
-                        .filter(Ticket.event_id == event_id)
-                        .count())
-        
-        # 已使用票券數
-        used_tickets = (db.query(Ticket)
-                       .filter(Ticket.event_id == event_id)
-                       .filter(Ticket.is_used == True)
-                       .count())
-        
-        # 簽到記錄數（不含撤銷）
-        checkin_count = (db.query(CheckInLog)
-                        .join(Ticket, CheckInLog.ticket_id == Ticket.id)
-                        .filter(Ticket.event_id == event_id)
-                        .filter(CheckInLog.is_revoked == False)
-                        .count())
-        
-        # 撤銷記錄數
-        revoked_count = (db.query(CheckInLog)
-                        .join(Ticket, CheckInLog.ticket_id == Ticket.id)
-                        .filter(Ticket.event_id == event_id)
-                        .filter(CheckInLog.is_revoked == True)
-                        .count())
+        # 票券與簽到統計（讀取實體化計數器，不掃描 tickets / checkin_logs）
+        counts = TicketCounterService.get_counts(db, event_id)
+        totals = counts[EVENT_TOTAL]
+        total_tickets = totals['issued']
+        used_tickets = totals['used']
+        checkin_count = totals['active_checkins']  # 簽到記錄數（不含撤銷）
+        revoked_count = totals['revoked']
         
         # 簡化的票種統計
         ticket_types = db.query(TicketType).filter(TicketType.event_id == event_id).all()
@@ -128,14 +114,9 @@ class ExportService:
         
         for ticket_type in ticket_types:
             # 每個票種的統計
-            sold_count = (db.query(Ticket)
-                         .filter(Ticket.ticket_type_id == ticket_type.id)
-                         .count())
-            
-            used_count = (db.query(Ticket)
-                         .filter(Ticket.ticket_type_id == ticket_type.id)
-                         .filter(Ticket.is_used == True)
-                         .count())
+            type_counts = counts.get(ticket_type.id, {})
+            sold_count = type_counts.get('issued', 0)
+            used_count = type_counts.get('used', 0)
             
             ticket_type_stats.append({
                 'name': ticket_type.name,
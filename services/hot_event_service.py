@@ -0,0 +1,311 @@
+"""
+熱門活動票券索引服務
+
+活動進行中，簽到路徑會反覆以 Ticket.uuid 查詢同一批票券。
+「熱門活動」模式會把活動的票券預先載入為精簡的記憶體索引：
+uuid -> (ticket id, ticket_type_id, is_used)，以 dict + array 儲存而非 ORM 物件。
+簽到路由可直接在記憶體中拒絕屬於其他已載入活動的票券，不必碰資料庫；
+其餘票券仍由資料庫做最終的條件式轉換。
+
+索引只用來確定拒絕，不用來判斷「不存在」或「已使用」：
+- 票券的時間欄位來自 now()（交易開始時間），執行超過重疊時間的批次 / 匯入交易提交的票券
+  可能不會被差異同步拉到，索引中找不到的票券一律交給資料庫判斷，並把資料庫回傳的票券寫入索引
+- 使用狀態為單一行程內的資料，其他 worker 的撤銷最多延遲一個刷新週期才會反映，
+  索引標記為已使用的票券同樣交給資料庫判斷
+
+- 手動啟用：呼叫 warmup（管理 API）
+- 自動啟用：活動開始前 HOT_EVENT_AUTO_LEAD_MINUTES 分鐘至活動結束
+- 簽到 / 撤銷時同步寫入（write-through）
+- 背景每 HOT_EVENT_REFRESH_SECONDS 秒從資料庫拉取差異，讓多個 worker 的索引收斂
+"""
+import sys
+import threading
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from app.config import settings
+from models import Event, Ticket
+from services.checkin_service import CheckInStatus
+
+# 重新讀取差異時往前多看的秒數，涵蓋刷新當下尚未提交的交易（更長的交易由簽到時寫入索引補上）
+_DELTA_OVERLAP_SECONDS = 30
+_LOAD_BATCH_SIZE = 5000
+
+
+class HotEventIndex:
+    """單一活動的票券狀態索引"""
+
+    def __init__(self, event_id: int, pinned: bool = False):
+        self.event_id = event_id
+        self.pinned = pinned  # 手動啟用的索引不會被自動卸載
+        self._slots: Dict[int, int] = {}  # uuid -> slot
+        self._ticket_ids = array('q')
+        self._ticket_type_ids = array('q')  # 無票種時為 -1
+        self._used = bytearray()
+        self._lock = threading.Lock()
+        self.synced_at: Optional[datetime] = None  # 上次差異同步的資料庫時間（localtimestamp，與票券時間欄位同為不含時區）
+        self.hits = 0
+        self.rejections = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def load(self, db: Session) -> None:
+        """從資料庫完整載入活動票券（以 yield_per 分批串流，不建立 ORM 物件）"""
+        synced_at = db.execute(select(func.localtimestamp())).scalar()
+
+        slots: Dict[int, int] = {}
+        ticket_ids = array('q')
+        ticket_type_ids = array('q')
+        used = bytearray()
+        rows = db.execute(
+            select(Ticket.uuid, Ticket.id, Ticket.ticket_type_id, Ticket.is_used)
+            .where(Ticket.event_id == self.event_id)
+            .execution_options(yield_per=_LOAD_BATCH_SIZE)
+        )
+        for ticket_uuid, ticket_id, ticket_type_id, is_used in rows:
+            slots[ticket_uuid] = len(ticket_ids)
+            ticket_ids.append(ticket_id)
+            ticket_type_ids.append(ticket_type_id if ticket_type_id is not None else -1)
+            used.append(1 if is_used else 0)
+
+        with self._lock:
+            self._slots = slots
+            self._ticket_ids = ticket_ids
+            self._ticket_type_ids = ticket_type_ids
+            self._used = used
+            self.synced_at = synced_at
+
+    def refresh(self, db: Session) -> int:
+        """拉取上次同步後新增或變更的票券，回傳套用的筆數"""
+        if self.synced_at is None:
+            self.load(db)
+            return len(self)
+
+        synced_at = db.execute(select(func.localtimestamp())).scalar()
+        since = self.synced_at - timedelta(seconds=_DELTA_OVERLAP_SECONDS)
+        rows = db.execute(
+            select(Ticket.uuid, Ticket.id, Ticket.ticket_type_id, Ticket.is_used)
+            .where(Ticket.event_id == self.event_id)
+            .where(func.coalesce(Ticket.updated_at, Ticket.created_at) >= since)
+        ).all()
+
+        with self._lock:
+            for ticket_uuid, ticket_id, ticket_type_id, is_used in rows:
+                self._upsert(ticket_uuid, ticket_id, ticket_type_id, is_used)
+            self.synced_at = synced_at
+        return len(rows)
+
+    def _upsert(self, ticket_uuid: int, ticket_id: int, ticket_type_id: Optional[int], is_used: bool) -> None:
+        slot = self._slots.get(ticket_uuid)
+        if slot is None:
+            self._slots[ticket_uuid] = len(self._ticket_ids)
+            self._ticket_ids.append(ticket_id)
+            self._ticket_type_ids.append(ticket_type_id if ticket_type_id is not None else -1)
+            self._used.append(1 if is_used else 0)
+        else:
+            self._used[slot] = 1 if is_used else 0
+
+    def get(self, ticket_uuid: int) -> Optional[tuple]:
+        """回傳 (ticket_id, ticket_type_id, is_used)，不在索引中時回傳 None"""
+        slot = self._slots.get(ticket_uuid)
+        if slot is None:
+            return None
+        ticket_type_id = self._ticket_type_ids[slot]
+        return (
+            self._ticket_ids[slot],
+            ticket_type_id if ticket_type_id >= 0 else None,
+            bool(self._used[slot])
+        )
+
+    def upsert(self, ticket_uuid: int, ticket_id: int, ticket_type_id: Optional[int], is_used: bool) -> None:
+        """寫入資料庫回傳的票券（尚未同步的票券會加入索引）"""
+        with self._lock:
+            self._upsert(ticket_uuid, ticket_id, ticket_type_id, is_used)
+
+    def set_used(self, ticket_uuid: int, is_used: bool) -> None:
+        """寫入單張票券的使用狀態（不在索引中的票券略過，等待差異同步）"""
+        slot = self._slots.get(ticket_uuid)
+        if slot is not None:
+            self._used[slot] = 1 if is_used else 0
+
+    def memory_bytes(self) -> int:
+        """估算索引佔用的記憶體（dict、key 物件與各 array 緩衝區）"""
+        key_bytes = sum(sys.getsizeof(k) for k in self._slots)
+        return (
+            sys.getsizeof(self._slots) + key_bytes
+            + self._ticket_ids.buffer_info()[1] * self._ticket_ids.itemsize
+            + self._ticket_type_ids.buffer_info()[1] * self._ticket_type_ids.itemsize
+            + sys.getsizeof(self._used)
+        )
+
+    def used_count(self) -> int:
+        return self._used.count(1)
+
+    def stats(self) -> dict:
+        return {
+            "event_id": self.event_id,
+            "pinned": self.pinned,
+            "tickets": len(self),
+            "used": self.used_count(),
+            "memory_bytes": self.memory_bytes(),
+            "synced_at": self.synced_at,
+            "hits": self.hits,
+            "rejections": self.rejections
+        }
+
+
+# event_id -> 索引
+_indexes: Dict[int, HotEventIndex] = {}
+_registry_lock = threading.Lock()
+
+
+class HotEventService:
+
+    @staticmethod
+    def get_index(event_id: int) -> Optional[HotEventIndex]:
+        """取得已載入的活動索引"""
+        return _indexes.get(event_id)
+
+    @staticmethod
+    def warmup(db: Session, event_id: int, pinned: bool = True) -> HotEventIndex:
+        """載入（或重新載入）活動索引"""
+        index = HotEventIndex(event_id, pinned=pinned)
+        index.load(db)
+        with _registry_lock:
+            previous = _indexes.get(event_id)
+            if previous is not None and previous.pinned:
+                index.pinned = True
+            _indexes[event_id] = index
+        return index
+
+    @staticmethod
+    def disable(event_id: int) -> bool:
+        """卸載活動索引"""
+        with _registry_lock:
+            return _indexes.pop(event_id, None) is not None
+
+    @staticmethod
+    def precheck(event_id: int, ticket_uuid: int) -> Optional[dict]:
+        """
+        在記憶體中預先檢查簽到。
+        票券屬於其他已載入的活動時回傳 WRONG_EVENT；其餘情況回傳 None 交給資料庫判斷
+        （活動未載入、票券尚未同步，或使用狀態可能已被其他 worker 改變）。
+        """
+        index = _indexes.get(event_id)
+        if index is None:
+            return None
+
+        if index.get(ticket_uuid) is not None:
+            index.hits += 1
+            return None
+
+        for other in list(_indexes.values()):
+            entry = other.get(ticket_uuid) if other.event_id != event_id else None
+            if entry is not None:
+                index.rejections += 1
+                return HotEventService._result(CheckInStatus.WRONG_EVENT, entry[0])
+        return None
+
+    @staticmethod
+    def _result(status: str, ticket_id: Optional[int] = None) -> dict:
+        return {
+            "status": status,
+            "ticket_id": ticket_id,
+            "holder_name": None,
+            "checkin_log_id": None,
+            "checkin_time": None
+        }
+
+    @staticmethod
+    def record_checkin(event_id: int, ticket_uuid: int, result: dict) -> None:
+        """
+        簽到後寫入索引：成功或資料庫回報已使用時，以資料庫回傳的票券標記為已使用
+        （尚未同步到索引的票券一併加入）
+        """
+        if result["status"] not in (CheckInStatus.OK, CheckInStatus.ALREADY_USED):
+            return
+        index = _indexes.get(event_id)
+        if index is not None:
+            index.upsert(ticket_uuid, result["ticket_id"], result["ticket_type_id"], True)
+
+    @staticmethod
+    def record_revoke(event_id: int, ticket_uuid: int) -> None:
+        """撤銷簽到後寫入索引"""
+        index = _indexes.get(event_id)
+        if index is not None:
+            index.set_used(ticket_uuid, False)
+
+    @staticmethod
+    def check_consistency(db: Session, event_id: int, repair: bool = False) -> dict:
+        """比對索引與資料庫，回報差異；repair=True 時以資料庫為準修正索引"""
+        index = _indexes.get(event_id)
+        if index is None:
+            raise ValueError("Hot event index is not loaded")
+
+        missing: List[int] = []
+        used_mismatch: List[int] = []
+        seen = set()
+        rows = db.execute(
+            select(Ticket.uuid, Ticket.id, Ticket.ticket_type_id, Ticket.is_used)
+            .where(Ticket.event_id == event_id)
+            .execution_options(yield_per=_LOAD_BATCH_SIZE)
+        )
+        for ticket_uuid, ticket_id, ticket_type_id, is_used in rows:
+            seen.add(ticket_uuid)
+            entry = index.get(ticket_uuid)
+            if entry is None:
+                missing.append(ticket_uuid)
+                if repair:
+                    with index._lock:
+                        index._upsert(ticket_uuid, ticket_id, ticket_type_id, bool(is_used))
+            elif entry[2] != bool(is_used):
+                used_mismatch.append(ticket_uuid)
+                if repair:
+                    index.set_used(ticket_uuid, bool(is_used))
+        extra = [u for u in list(index._slots) if u not in seen]
+
+        return {
+            "event_id": event_id,
+            "db_tickets": len(seen),
+            "index_tickets": len(index),
+            "missing_in_index": len(missing),
+            "extra_in_index": len(extra),
+            "used_mismatch": len(used_mismatch),
+            "consistent": not (missing or extra or used_mismatch),
+            "repaired": repair,
+            "sample_mismatched_uuids": [str(u) for u in (missing + used_mismatch + extra)[:20]]
+        }
+
+    @staticmethod
+    def stats() -> List[dict]:
+        """所有已載入索引的統計與記憶體用量"""
+        return [index.stats() for index in list(_indexes.values())]
+
+    @staticmethod
+    def refresh_all(db: Session) -> None:
+        """
+        背景刷新：自動載入即將開始的活動、卸載已結束的自動索引，
+        並對其餘已載入的索引做差異同步。
+        """
+        lead_minutes = settings.HOT_EVENT_AUTO_LEAD_MINUTES
+        if lead_minutes > 0:
+            now = datetime.now()
+            hot_event_ids = set(db.execute(
+                select(Event.id)
+                .where(Event.is_active == True)
+                .where(Event.start_time <= now + timedelta(minutes=lead_minutes))
+                .where(Event.end_time >= now)
+            ).scalars())
+            for event_id in list(_indexes):
+                index = _indexes.get(event_id)
+                if index is not None and not index.pinned and event_id not in hot_event_ids:
+                    HotEventService.disable(event_id)
+            for event_id in hot_event_ids:
+                if event_id not in _indexes:
+                    HotEventService.warmup(db, event_id, pinned=False)
+
+        for index in list(_indexes.values()):
+            index.refresh(db)
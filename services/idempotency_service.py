@@ -0,0 +1,171 @@
+"""
+Idempotency-Key 服務（產票端點）
+
+客戶端在產票請求帶上 Idempotency-Key，網路逾時後以相同的 key 重送時，直接回傳第一次請求儲存的回應，
+不會重複發行票券。流程：
+1. claim：在請求本身的 Session（交易）中以 pg_try_advisory_xact_lock 佔用 (商戶, key)，再讀取既有記錄。
+   已完成的 key 直接回傳儲存的回應；同一個 key 的請求仍在處理中時立即拋出 IdempotencyKeyInProgressError（409），
+   不佔用連線等待。
+2. 產票時不提交，complete 在同一個交易中寫入 key 記錄（狀態碼與 zlib 壓縮的 JSON 回應）後一次提交，
+   票券與儲存的回應同時生效或同時失敗，不會出現「票券已發行但沒有回應記錄」而在重送時重複產票。
+   5xx 或未預期的例外則 release（rollback），讓客戶端可以重試。
+3. 已過期（expires_at）的記錄視為不存在，可被新的請求覆蓋，並由背景工作定期刪除。
+
+相同的 key 搭配不同的請求內容會拋出 IdempotencyKeyMismatchError。
+"""
+import json
+import zlib
+import hashlib
+from datetime import timedelta
+from typing import Any, Optional
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.config import settings
+from models import IdempotencyKey
+
+
+class IdempotencyKeyMismatchError(ValueError):
+    """相同的 Idempotency-Key 被用於不同的請求內容"""
+
+
+class IdempotencyKeyInProgressError(ValueError):
+    """相同 Idempotency-Key 的請求仍在處理中"""
+
+
+def _encode_body(body: Any) -> bytes:
+    return zlib.compress(json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode())
+
+
+def _decode_body(data: bytes) -> Any:
+    return json.loads(zlib.decompress(data))
+
+
+def _lock_id(merchant_id: int, key: str) -> int:
+    """(商戶, key) 對應的 advisory lock 編號（64 位元有號整數）"""
+    digest = hashlib.sha256(f"idempotency:{merchant_id}:{key}".encode()).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+def _try_lock(db: Session, merchant_id: int, key: str) -> bool:
+    """在目前交易中嘗試取得 (商戶, key) 的 advisory lock，不等待；交易結束時自動釋放"""
+    return db.execute(select(func.pg_try_advisory_xact_lock(_lock_id(merchant_id, key)))).scalar()
+
+
+class IdempotencyClaim:
+    """
+    claim 的結果：replayed 為 True 時 status_code / body 為儲存的回應；
+    否則呼叫端擁有這個 key，在同一個 Session 中執行請求（不提交）後必須呼叫 complete 或 release。
+    """
+
+    def __init__(
+        self,
+        db: Optional[Session],
+        merchant_id: int,
+        key: str,
+        request_hash: str,
+        status_code: Optional[int] = None,
+        body: Any = None
+    ):
+        self._db = db
+        self.merchant_id = merchant_id
+        self.key = key
+        self.request_hash = request_hash
+        self.status_code = status_code
+        self.body = body
+
+    @property
+    def replayed(self) -> bool:
+        return self._db is None
+
+    def complete(self, status_code: int, body: Any) -> None:
+        """在請求的交易中寫入 key 記錄與回應，並與產生的票券一起提交"""
+        if self._db is None:
+            return
+        db, self._db = self._db, None
+        try:
+            # 請求失敗時服務層可能已 rollback（advisory lock 隨之釋放）：重新取得鎖；
+            # 若已被其他請求取得，則由該請求負責保存回應
+            if not _try_lock(db, self.merchant_id, self.key):
+                db.rollback()
+                return
+            now = func.now()
+            stmt = insert(IdempotencyKey).values(
+                merchant_id=self.merchant_id,
+                key=self.key,
+                request_hash=self.request_hash,
+                status_code=status_code,
+                response_body=_encode_body(body),
+                created_at=now,
+                expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[IdempotencyKey.merchant_id, IdempotencyKey.key],
+                set_={
+                    "request_hash": stmt.excluded.request_hash,
+                    "status_code": stmt.excluded.status_code,
+                    "response_body": stmt.excluded.response_body,
+                    "created_at": stmt.excluded.created_at,
+                    "expires_at": stmt.excluded.expires_at,
+                },
+                where=IdempotencyKey.expires_at <= now
+            )
+            db.execute(stmt)
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+
+    def release(self) -> None:
+        """放棄這個 key（rollback 請求的交易），之後以相同 key 重送的請求會重新執行"""
+        if self._db is None:
+            return
+        db, self._db = self._db, None
+        db.rollback()
+
+
+class IdempotencyService:
+
+    @staticmethod
+    def fingerprint(operation: str, payload: Any) -> str:
+        """請求指紋：操作名稱與請求內容（JSON，鍵排序）的 SHA-256"""
+        canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(f"{operation}\n{canonical}".encode()).hexdigest()
+
+    @staticmethod
+    def claim(db: Session, merchant_id: int, key: str, request_hash: str) -> IdempotencyClaim:
+        """
+        在 db 目前的交易中佔用 (商戶, key)。新的 key（或已過期的 key）回傳未 replayed 的 claim；
+        已完成的 key 回傳儲存的回應並結束交易。請求內容不同時拋出 IdempotencyKeyMismatchError，
+        相同 key 的請求仍在處理中時立即拋出 IdempotencyKeyInProgressError。
+        """
+        if not _try_lock(db, merchant_id, key):
+            db.rollback()
+            raise IdempotencyKeyInProgressError("A request with this Idempotency-Key is still being processed")
+
+        existing = db.execute(
+            select(IdempotencyKey.request_hash, IdempotencyKey.status_code, IdempotencyKey.response_body)
+            .where(
+                IdempotencyKey.merchant_id == merchant_id,
+                IdempotencyKey.key == key,
+                IdempotencyKey.expires_at > func.now()
+            )
+        ).first()
+        if existing is None:
+            return IdempotencyClaim(db, merchant_id, key, request_hash)
+
+        db.rollback()
+        if existing.request_hash != request_hash:
+            raise IdempotencyKeyMismatchError(
+                "Idempotency-Key has already been used with a different request"
+            )
+        return IdempotencyClaim(
+            None, merchant_id, key, request_hash, existing.status_code, _decode_body(existing.response_body)
+        )
+
+    @staticmethod
+    def purge_expired(db: Session) -> int:
+        """刪除已過期的記錄，回傳刪除筆數"""
+        result = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= func.now()))
+        db.commit()
+        return result.rowcount
@@ -0,0 +1,293 @@
+"""
+QR 圖片快取服務
+
+公開的 QR 圖片端點原本每次請求都重新簽發 token 並以 qrcode + PIL 繪製 PNG。
+QR token 在同一個時間窗內固定（utils.auth.qr_token_window），因此圖片內容完全由
+(token, 格式, 尺寸) 決定，以其 SHA-256 作為內容位址：
+- 記憶體層：以位元組數為上限的 LRU（QR_IMAGE_CACHE_MB），每個程序各自一份
+- 磁碟層：QR_IMAGE_CACHE_DIR 下以雜湊命名的檔案（QR_IMAGE_DISK_CACHE_MB），同一台主機的 worker 共用；
+  每個檔案都編碼了有效的 QR token，等同簽到憑證，因此預設停用，啟用時目錄為 0700、檔案為 0600，
+  並在時間窗切換時刪除前一個時間窗的檔案
+- 未命中時交給程序池（QR_RENDER_WORKERS）繪製，不佔用事件迴圈與 GIL；
+  同一張圖片的並行請求只繪製一次
+- 內容位址同時作為強 ETag，條件式請求不需繪製即可回傳 304
+"""
+import os
+import time
+import asyncio
+import hashlib
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+from app.config import settings
+from utils.auth import qr_token_window
+from utils.qr_code import QR_IMAGE_MEDIA_TYPES, render_qr_image
+
+QR_IMAGE_BOX_SIZE = 10
+QR_IMAGE_BORDER = 4
+# 繪製方式改變（輸出位元組不同）時遞增，使舊的快取與 ETag 失效
+_RENDER_VERSION = 2
+
+
+class _MemoryTier:
+    """以位元組數為上限的 LRU"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            content = self._data.get(key)
+            if content is not None:
+                self._data.move_to_end(key)
+            return content
+
+    def set(self, key: str, content: bytes) -> None:
+        if len(content) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._data[key] = content
+            self.size += len(content)
+            while self.size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class _DiskTier:
+    """
+    磁碟快取：<目錄>/<雜湊前 2 碼>/<雜湊>.<副檔名>，以暫存檔 + os.replace 原子寫入。
+    目錄僅限擁有者存取（0700），檔案以 0600 建立；目錄屬於其他使用者時停用磁碟層。
+    超過上限時刪除最舊（mtime）的檔案直到剩 90%；時間窗切換後，前一個時間窗的檔案不會再被讀取，
+    一併刪除。多個程序同時清理時忽略已被刪除的檔案。
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None  # 首次寫入時掃描目錄
+        self._ready: Optional[bool] = None  # 首次寫入時建立並檢查目錄
+        self._window_start: Optional[int] = None  # 上次清除過期檔案時的時間窗
+        self._lock = threading.Lock()
+
+    def _ensure_directory(self) -> bool:
+        """建立快取根目錄並限制為僅擁有者可存取；目錄不屬於目前使用者時回傳 False"""
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            stat = os.stat(self.directory)
+            if hasattr(os, "getuid") and stat.st_uid != os.getuid():
+                print(f"⚠️ [WARN] QR 圖片磁碟快取目錄 {self.directory} 不屬於目前使用者，停用磁碟快取")
+                return False
+            if stat.st_mode & 0o077:
+                os.chmod(self.directory, 0o700)
+        except OSError as e:
+            print(f"⚠️ [WARN] QR 圖片磁碟快取目錄無法使用，停用磁碟快取: {e}")
+            return False
+        return True
+
+    def _usable(self) -> bool:
+        if self._ready is None:
+            with self._lock:
+                if self._ready is None:
+                    self._ready = self._ensure_directory()
+        return self._ready
+
+    def _path(self, key: str, image_format: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{image_format}")
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def get(self, key: str, image_format: str) -> Optional[bytes]:
+        if not self._usable():
+            return None
+        try:
+            with open(self._path(key, image_format), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key: str, image_format: str, content: bytes) -> None:
+        if not self._usable():
+            return
+        path = self._path(key, image_format)
+        try:
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"⚠️ [WARN] QR 圖片磁碟快取寫入失敗: {e}")
+            return
+        window_start, _ = qr_token_window()
+        with self._lock:
+            if self._window_start != window_start:
+                # 時間窗切換（或首次寫入）：刪除前一個時間窗的檔案並重新計算大小
+                self._window_start = window_start
+                self._prune(expire_before=window_start)
+            else:
+                self._size += len(content)
+                if self._size > self.max_bytes:
+                    self._prune()
+
+    def _prune(self, expire_before: Optional[float] = None) -> None:
+        files = sorted(self._files(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        for path, size, mtime in files:
+            expired = expire_before is not None and mtime < expire_before
+            if not expired and total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+
+class QRImageCache:
+    """記憶體 + 磁碟兩層的 QR 圖片快取"""
+
+    def __init__(self, memory_bytes: int, directory: str, disk_bytes: int):
+        self.memory = _MemoryTier(memory_bytes)
+        self.disk = _DiskTier(directory, disk_bytes) if directory and disk_bytes > 0 else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+
+    def get_memory(self, key: str) -> Optional[bytes]:
+        content = self.memory.get(key)
+        if content is not None:
+            self.memory_hits += 1
+        return content
+
+    def get_disk(self, key: str, image_format: str) -> Optional[bytes]:
+        if self.disk is None:
+            return None
+        content = self.disk.get(key, image_format)
+        if content is not None:
+            self.disk_hits += 1
+            self.memory.set(key, content)
+        return content
+
+    def get(self, key: str, image_format: str) -> Optional[bytes]:
+        content = self.get_memory(key)
+        if content is None:
+            content = self.get_disk(key, image_format)
+        return content
+
+    def set(self, key: str, image_format: str, content: bytes) -> None:
+        self.memory.set(key, content)
+        if self.disk is not None:
+            self.disk.set(key, image_format, content)
+
+    def stats(self) -> dict:
+        return {
+            "memory_items": len(self.memory),
+            "memory_bytes": self.memory.size,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "renders": self.renders,
+        }
+
+
+qr_image_cache = QRImageCache(
+    memory_bytes=settings.QR_IMAGE_CACHE_MB * 1024 * 1024,
+    directory=settings.QR_IMAGE_CACHE_DIR,
+    disk_bytes=settings.QR_IMAGE_DISK_CACHE_MB * 1024 * 1024,
+)
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+_render_pool_lock = threading.Lock()
+_inflight: Dict[str, "asyncio.Task"] = {}
+
+
+def _get_render_pool() -> Optional[ProcessPoolExecutor]:
+    global _render_pool
+    if settings.QR_RENDER_WORKERS <= 0:
+        return None
+    if _render_pool is None:
+        with _render_pool_lock:
+            if _render_pool is None:
+                # spawn：不複製事件迴圈、連線池等 fork 不安全的狀態
+                _render_pool = ProcessPoolExecutor(
+                    max_workers=settings.QR_RENDER_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _render_pool
+
+
+class QRImageService:
+
+    @staticmethod
+    def content_key(qr_token: str, image_format: str) -> str:
+        """圖片的內容位址（繪製版本、token、格式與尺寸的 SHA-256），同時作為 ETag"""
+        source = f"v{_RENDER_VERSION}\n{qr_token}\n{image_format}\n{QR_IMAGE_BOX_SIZE}\n{QR_IMAGE_BORDER}"
+        return hashlib.sha256(source.encode()).hexdigest()
+
+    @staticmethod
+    def max_age() -> int:
+        """圖片可被快取的秒數：到目前 token 時間窗結束為止"""
+        _, window_end = qr_token_window()
+        return max(int(window_end - time.time()), 0)
+
+    @staticmethod
+    def media_type(image_format: str) -> str:
+        return QR_IMAGE_MEDIA_TYPES[image_format]
+
+    @staticmethod
+    async def _render(key: str, qr_token: str, image_format: str) -> bytes:
+        try:
+            content = await asyncio.get_running_loop().run_in_executor(
+                _get_render_pool(), render_qr_image, qr_token, image_format, QR_IMAGE_BOX_SIZE, QR_IMAGE_BORDER
+            )
+            qr_image_cache.renders += 1
+            await asyncio.to_thread(qr_image_cache.set, key, image_format, content)
+            return content
+        finally:
+            _inflight.pop(key, None)
+
+    @staticmethod
+    async def get_image(key: str, qr_token: str, image_format: str) -> bytes:
+        """取得圖片：記憶體 → 磁碟 → 程序池繪製（同一個 key 的並行請求共用一次繪製）"""
+        content = qr_image_cache.get_memory(key)
+        if content is None:
+            content = await asyncio.to_thread(qr_image_cache.get_disk, key, image_format)
+        if content is not None:
+            return content
+
+        task = _inflight.get(key)
+        if task is None:
+            # 繪製不隨單一請求取消，完成後仍會寫入快取
+            task = asyncio.ensure_future(QRImageService._render(key, qr_token, image_format))
+            _inflight[key] = task
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def shutdown() -> None:
+        """關閉繪製程序池"""
+        global _render_pool
+        with _render_pool_lock:
+            if _render_pool is not None:
+                _render_pool.shutdown(wait=False, cancel_futures=True)
+                _render_pool = None
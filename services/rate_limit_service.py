@@ -0,0 +1,168 @@
+"""
+速率限制服務
+
+以 GCRA（與 token bucket 等價的演算法）實作：每個鍵只保存一個浮點數「理論到達時間」(TAT)，
+政策 N/T 秒代表每 T/N 秒補充一個額度、最多可瞬間突發 N 個請求。
+- memory：每個 worker 各自的 dict（鍵 -> TAT），TAT 早於現在的鍵（桶已滿）會在超過上限時清除
+- postgres：所有 worker 共用 rate_limit_buckets（UNLOGGED），每次判斷一個 upsert 語句。
+  仍會先經過本機的桶：單一 worker 看到的請求數不會超過全域數量，本機拒絕時全域必定也拒絕，
+  因此單一來源的洪水在本機就被擋下，不佔用資料庫連線。共用後端故障時放行（fail open）並記錄指標。
+"""
+import time
+import threading
+from typing import Dict, Optional
+from sqlalchemy import text, delete, extract, func
+from sqlalchemy.orm import Session
+from app.config import settings
+from models.rate_limit_bucket import RateLimitBucket
+from utils.metrics import RATE_LIMIT_REJECTIONS, RATE_LIMIT_BACKEND_ERRORS
+
+# 路由群組對應的政策設定
+RATE_LIMIT_GROUPS = {
+    "public": "RATE_LIMIT_PUBLIC",
+    "login": "RATE_LIMIT_LOGIN",
+    "mgmt": "RATE_LIMIT_MGMT",
+    "staff": "RATE_LIMIT_STAFF",
+}
+RATE_LIMIT_KEY_TYPES = ("ip", "merchant", "staff")
+
+# 允許時寫入新的 TAT 並回傳；超過突發上限時 WHERE 不成立、不回傳任何列
+_SHARED_HIT = text("""
+    WITH p AS (
+        SELECT extract(epoch FROM clock_timestamp())::float8 AS now,
+               CAST(:interval AS float8) AS interval,
+               CAST(:period AS float8) AS period
+    )
+    INSERT INTO rate_limit_buckets AS b (key, tat)
+    SELECT :key, p.now + p.interval FROM p
+    ON CONFLICT (key) DO UPDATE
+    SET tat = GREATEST(b.tat, EXCLUDED.tat - CAST(:interval AS float8)) + CAST(:interval AS float8)
+    WHERE GREATEST(b.tat, EXCLUDED.tat - CAST(:interval AS float8)) + CAST(:interval AS float8) - CAST(:period AS float8)
+          <= EXCLUDED.tat - CAST(:interval AS float8)
+    RETURNING b.tat
+""")
+
+class RateLimitPolicy:
+    """一個路由群組的政策：以哪種鍵計算、每 period 秒最多 limit 個請求（同時為突發上限）"""
+    __slots__ = ("group", "key_type", "limit", "period", "interval")
+
+    def __init__(self, group: str, key_type: str, limit: int, period: float):
+        self.group = group
+        self.key_type = key_type
+        self.limit = limit
+        self.period = period
+        self.interval = period / limit
+
+    @classmethod
+    def parse(cls, group: str, spec: str) -> Optional["RateLimitPolicy"]:
+        """解析 "<鍵>:<請求數>/<秒數>"（例如 "ip:600/60"），空字串表示不限制"""
+        spec = spec.strip()
+        if not spec:
+            return None
+        try:
+            key_type, rate = spec.split(":", 1)
+            limit, period = rate.split("/", 1)
+            policy = cls(group, key_type.strip().lower(), int(limit), float(period))
+        except (ValueError, ZeroDivisionError):
+            raise ValueError(f"Invalid rate limit policy for {group}: {spec!r} (expected '<key>:<requests>/<seconds>')")
+        if policy.key_type not in RATE_LIMIT_KEY_TYPES or policy.limit <= 0 or policy.period <= 0:
+            raise ValueError(f"Invalid rate limit policy for {group}: {spec!r}")
+        return policy
+
+
+class _MemoryBuckets:
+    """單一路由群組的本機桶：鍵 -> TAT，依最後使用順序排列以便淘汰"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._tat: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, policy: RateLimitPolicy, now: float) -> float:
+        """消耗一個額度；允許時回傳 0，否則回傳需要等待的秒數"""
+        with self._lock:
+            tat = max(self._tat.pop(key, now), now)
+            new_tat = tat + policy.interval
+            wait = new_tat - policy.period - now
+            if wait > 0:
+                self._tat[key] = tat
+                return wait
+            self._tat[key] = new_tat
+            if len(self._tat) > self.max_keys:
+                self._prune(now)
+            return 0.0
+
+    def _prune(self, now: float) -> None:
+        # 桶已滿的鍵等同不存在；仍超過上限時淘汰最久未使用的 10%
+        for key in [key for key, tat in self._tat.items() if tat <= now]:
+            del self._tat[key]
+        overflow = len(self._tat) - int(self.max_keys * 0.9)
+        if overflow > 0:
+            for key in list(self._tat)[:overflow]:
+                del self._tat[key]
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+
+_policies: Dict[str, Optional[RateLimitPolicy]] = {
+    group: RateLimitPolicy.parse(group, getattr(settings, setting))
+    for group, setting in RATE_LIMIT_GROUPS.items()
+}
+_buckets: Dict[str, _MemoryBuckets] = {
+    group: _MemoryBuckets(settings.RATE_LIMIT_MAX_KEYS) for group, policy in _policies.items() if policy is not None
+}
+
+
+class RateLimitService:
+
+    @staticmethod
+    def get_policy(group: str) -> Optional[RateLimitPolicy]:
+        """路由群組的政策，未啟用速率限制或該群組不限制時為 None"""
+        if not settings.RATE_LIMIT_ENABLED:
+            return None
+        return _policies[group]
+
+    @staticmethod
+    async def hit(group: str, key: str) -> float:
+        """
+        對 (路由群組, 鍵) 消耗一個額度。允許時回傳 0，否則回傳建議的 Retry-After 秒數。
+        """
+        policy = _policies[group]
+        wait = _buckets[group].hit(key, policy, time.time())
+        if wait > 0:
+            RATE_LIMIT_REJECTIONS.inc(group, "memory")
+            return wait
+        if settings.RATE_LIMIT_BACKEND != "postgres":
+            return 0.0
+
+        from app.database import async_engine
+        try:
+            async with async_engine.begin() as conn:
+                allowed = (await conn.execute(_SHARED_HIT, {
+                    "key": f"{group}:{key}"[:255],
+                    "interval": policy.interval,
+                    "period": policy.period,
+                })).first()
+        except Exception as e:
+            RATE_LIMIT_BACKEND_ERRORS.inc(group)
+            print(f"⚠️ [WARN] 共用速率限制後端失敗，放行請求: {e}")
+            return 0.0
+        if allowed is None:
+            RATE_LIMIT_REJECTIONS.inc(group, "postgres")
+            return policy.interval
+        return 0.0
+
+    @staticmethod
+    def purge_expired(db: Session) -> int:
+        """刪除共用後端中桶已滿（TAT 早於現在）的記錄，回傳刪除筆數"""
+        result = db.execute(
+            delete(RateLimitBucket).where(RateLimitBucket.tat <= extract("epoch", func.clock_timestamp()))
+        )
+        db.commit()
+        return result.rowcount
+
+    @staticmethod
+    def stats() -> Dict[str, int]:
+        """各路由群組本機追蹤的鍵數"""
+        return {group: len(buckets) for group, buckets in _buckets.items()}
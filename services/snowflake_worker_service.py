@@ -0,0 +1,112 @@
+"""
+Snowflake worker ID 租約服務
+
+多個 uvicorn worker 或容器同時產生 Snowflake ID 時，每個程序必須使用不同的 worker ID。
+應用程式啟動時向 snowflake_worker_leases 租用一個未使用（或租約已過期）的 worker ID，
+之後每 SNOWFLAKE_WORKER_LEASE_SECONDS / 3 續約一次；關閉時讓租約立即過期。
+
+- 租用以 INSERT ... ON CONFLICT DO UPDATE ... WHERE expires_at <= now() 完成，兩個程序不會取得同一個 ID
+- 續約時寫入已使用的最後時間戳，接手同一個 ID 的程序從其後開始配發（不受主機之間的時鐘差影響）
+- 續約失敗（例如程序暫停超過租約期限、ID 已被接手）時改租新的 ID；
+  本地租約到期前未能續約時，生成器停止配發（WorkerLeaseExpiredError），不會與接手者重複
+"""
+import os
+import time
+import uuid
+import socket
+from typing import Optional
+from sqlalchemy import text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.config import settings
+from models import SnowflakeWorkerLease
+from utils.snowflake import MAX_WORKER_ID, get_snowflake_generator
+
+_INSTANCE = uuid.uuid4().hex[:8]
+
+# 每次挑選的候選 ID 數（其他程序搶先租用時改試下一個）
+_CANDIDATES = 16
+
+
+def _owner() -> str:
+    """這個程序的租約擁有者識別（含 PID，先載入模組再 fork 的 worker 也不會相同）"""
+    return f"{socket.gethostname()}:{os.getpid()}:{_INSTANCE}"
+
+
+class SnowflakeWorkerService:
+
+    @staticmethod
+    def _lease_seconds() -> int:
+        return max(settings.SNOWFLAKE_WORKER_LEASE_SECONDS, 3)
+
+    @staticmethod
+    def acquire(db: Session) -> int:
+        """租用一個 worker ID 並套用到全域 Snowflake 生成器，回傳 worker ID"""
+        lease_seconds = SnowflakeWorkerService._lease_seconds()
+        for _ in range(3):
+            candidates = db.execute(text("""
+                SELECT g.id
+                FROM generate_series(0, :max_worker_id) AS g(id)
+                LEFT JOIN snowflake_worker_leases l ON l.worker_id = g.id
+                WHERE l.worker_id IS NULL OR l.expires_at <= now()
+                ORDER BY g.id
+                LIMIT :limit
+            """), {"max_worker_id": MAX_WORKER_ID, "limit": _CANDIDATES}).scalars().all()
+            if not candidates:
+                break
+
+            for worker_id in candidates:
+                started = time.monotonic()
+                expires_at = text(f"now() + interval '{lease_seconds} seconds'")
+                stmt = insert(SnowflakeWorkerLease).values(
+                    worker_id=worker_id, owner=_owner(), last_timestamp_ms=0, expires_at=expires_at
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[SnowflakeWorkerLease.worker_id],
+                    set_={"owner": stmt.excluded.owner, "expires_at": stmt.excluded.expires_at},
+                    where=SnowflakeWorkerLease.expires_at <= text("now()")
+                ).returning(SnowflakeWorkerLease.last_timestamp_ms)
+                last_timestamp_ms = db.execute(stmt).scalar()
+                db.commit()
+                if last_timestamp_ms is not None:
+                    get_snowflake_generator().set_worker_id(
+                        worker_id, not_before_ms=last_timestamp_ms, lease_valid_until=started + lease_seconds
+                    )
+                    return worker_id
+        raise ValueError("No free Snowflake worker ID available")
+
+    @staticmethod
+    def renew(db: Session) -> int:
+        """續約目前的 worker ID（並記錄已使用的最後時間戳）；租約已遺失時改租新的 ID。回傳 worker ID"""
+        generator = get_snowflake_generator()
+        lease_seconds = SnowflakeWorkerService._lease_seconds()
+        started = time.monotonic()
+        renewed = db.execute(
+            update(SnowflakeWorkerLease)
+            .where(SnowflakeWorkerLease.worker_id == generator.worker_id, SnowflakeWorkerLease.owner == _owner())
+            .values(
+                last_timestamp_ms=generator.last_timestamp,
+                expires_at=text(f"now() + interval '{lease_seconds} seconds'")
+            )
+            .returning(SnowflakeWorkerLease.worker_id)
+        ).scalar()
+        db.commit()
+        if renewed is None:
+            return SnowflakeWorkerService.acquire(db)
+        generator.renew_lease(started + lease_seconds)
+        return renewed
+
+    @staticmethod
+    def release(db: Session) -> Optional[int]:
+        """讓目前的租約立即過期（保留最後時間戳給下一個使用者）"""
+        generator = get_snowflake_generator()
+        released = db.execute(
+            update(SnowflakeWorkerLease)
+            .where(SnowflakeWorkerLease.worker_id == generator.worker_id, SnowflakeWorkerLease.owner == _owner())
+            .values(last_timestamp_ms=generator.last_timestamp, expires_at=text("now()"))
+            .returning(SnowflakeWorkerLease.worker_id)
+        ).scalar()
+        db.commit()
+        # 租約交出後不再以這個 ID 配發
+        generator.renew_lease(time.monotonic())
+        return released
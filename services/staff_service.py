@@ -7,6 +7,12 @@ from sqlalchemy.orm import Session
 from models import Staff, StaffEvent, Event
 from schemas.staff import StaffLogin
 from utils.security import verify_password, get_password_hash
+from utils.cache import invalidate_staff_principal, invalidate_scan_sessions, scan_session_cache
+from utils.http_cache import as_utc
+
+
+def _epoch(value: Optional[datetime]) -> Optional[float]:
+    return as_utc(value).timestamp() if value is not None else None
 
 class StaffService:
     
@@ -36,6 +42,7 @@ class StaffService:
             # 更新最後登入時間
             staff.last_login = datetime.utcnow()
             db.commit()
+            invalidate_staff_principal(staff.id)
             
         return staff
     
@@ -108,6 +115,36 @@ class StaffService:
         
         return staff_event is not None
     
+    @staticmethod
+    def get_event_permission(db: Session, staff_id: int, event_id: int) -> Optional[StaffEvent]:
+        """獲取員工在活動上的權限設定"""
+        return (db.query(StaffEvent)
+                .filter(StaffEvent.staff_id == staff_id)
+                .filter(StaffEvent.event_id == event_id)
+                .first())
+    
+    @staticmethod
+    def get_scan_session_state(db: Session, staff_id: int) -> dict:
+        """
+        員工的掃描 session 撤銷狀態（以 scan_session_cache 快取）：
+        {"valid_after": 員工層級撤銷時間, "events": {event_id: 活動層級撤銷時間}}，時間為 epoch 秒或 None。
+        員工不存在或已停用時 events 為空，所有 token 都視為已撤銷。
+        """
+        state = scan_session_cache.get(staff_id)
+        if state is not None:
+            return state
+        staff = db.query(Staff.is_active, Staff.scan_sessions_valid_after).filter(Staff.id == staff_id).first()
+        state = {"valid_after": None, "events": {}}
+        if staff is not None and staff.is_active:
+            state["valid_after"] = _epoch(staff.scan_sessions_valid_after)
+            state["events"] = {
+                row.event_id: _epoch(row.scan_sessions_valid_after)
+                for row in db.query(StaffEvent.event_id, StaffEvent.scan_sessions_valid_after)
+                .filter(StaffEvent.staff_id == staff_id)
+            }
+        scan_session_cache.set(staff_id, state)
+        return state
+
     @staticmethod
     def can_checkin(db: Session, staff_id: int, event_id: int) -> bool:
         """檢查員工是否有簽到權限"""
@@ -150,8 +187,11 @@ class StaffService:
             # 更新現有權限
             existing_permission.can_checkin = assignment.can_checkin
             existing_permission.can_revoke = assignment.can_revoke
+            # 權限已變更，讓既有的掃描 session 失效
+            existing_permission.scan_sessions_valid_after = datetime.utcnow()
             db.commit()
             db.refresh(existing_permission)
+            invalidate_scan_sessions(assignment.staff_id)
             return existing_permission
         else:
             # 建立新的權限
@@ -159,11 +199,13 @@ class StaffService:
                 staff_id=assignment.staff_id,
                 event_id=assignment.event_id,
                 can_checkin=assignment.can_checkin,
-                can_revoke=assignment.can_revoke
+                can_revoke=assignment.can_revoke,
+                scan_sessions_valid_after=datetime.utcnow()
             )
             db.add(new_permission)
             db.commit()
             db.refresh(new_permission)
+            invalidate_scan_sessions(assignment.staff_id)
             return new_permission
 
     @staticmethod
@@ -238,9 +280,16 @@ class StaffService:
             staff.hashed_password = get_password_hash(staff_data.password)
         if hasattr(staff_data, 'role'):
             staff.is_admin = staff_data.role == 'admin'
+        if getattr(staff_data, 'is_active', None) is not None:
+            staff.is_active = staff_data.is_active
+        # 停用時一併撤銷掃描 session（重新啟用後舊 token 也不會恢復有效）
+        if not staff.is_active:
+            staff.scan_sessions_valid_after = datetime.utcnow()
         
         db.commit()
         db.refresh(staff)
+        invalidate_staff_principal(staff_id)
+        invalidate_scan_sessions(staff_id)
         return staff
     
     @staticmethod
@@ -262,12 +311,17 @@ class StaffService:
             if checkin_count > 0:
                 # 如果有簽到記錄，我們不刪除員工，只是將其設為非活躍
                 staff.is_active = False
+                staff.scan_sessions_valid_after = datetime.utcnow()
                 db.commit()
+                invalidate_staff_principal(staff_id)
+                invalidate_scan_sessions(staff_id)
                 return True
             
             # 刪除員工
             db.delete(staff)
             db.commit()
+            invalidate_staff_principal(staff_id)
+            invalidate_scan_sessions(staff_id)
             return True
         except Exception as e:
             db.rollback()
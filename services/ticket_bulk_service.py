@@ -0,0 +1,82 @@
+"""
+批次票券寫入服務
+
+批次產票原本每張票券都要「查詢票券代碼是否重複 → 加入 ORM 物件 → 提交後 refresh」，
+N 張約 3N 次往返。這裡一次保留所有 Snowflake ID（generate_snowflake_ids）與由其推導的票券代碼（utils.ticket_code，
+唯一性由 uuid 保證），以多列 INSERT ... RETURNING 分段寫入，並依賴 ticket_code / uuid 的唯一索引：
+衝突的列（例如未租用 worker ID 的程序產生相同的 ID）由 ON CONFLICT DO NOTHING 略過，只對這些極少數的列
+換新的 ID 再寫入。結果直接取自 RETURNING，不需要逐列 refresh。
+
+配額預留與計數器由呼叫端（TicketService）處理，本服務不提交交易。
+"""
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import Row
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from models import Ticket
+from utils.ticket_code import generate_ticket_code
+from utils.snowflake import generate_snowflake_ids
+
+# 每次 executemany 的列數（控制單次往返的資料量與記憶體）
+_INSERT_CHUNK_SIZE = 5000
+
+# ID 衝突時最多重試的次數（實務上第一次重試就會成功）
+_MAX_CODE_ATTEMPTS = 5
+
+# 以 executemany 執行：語句只編譯一次，由 insertmanyvalues 組成多列 VALUES 批次送出並收集 RETURNING
+_INSERT_TICKETS = (insert(Ticket.__table__)
+                   .on_conflict_do_nothing()
+                   .returning(*Ticket.__table__.c))
+
+
+class TicketBulkService:
+
+    @staticmethod
+    def insert_tickets(db: Session, rows: Sequence[Dict]) -> List[Row]:
+        """
+        寫入多張票券，回傳與輸入順序一致的票券資料列（欄位同 Ticket，可用屬性存取）。
+
+        rows 為票券欄位 dict（event_id、holder_name 等），所有 dict 需有相同的鍵；
+        未提供 uuid / ticket_code 時自動產生（代碼由 uuid 推導）。自動產生的 ID 與既有票券衝突的列
+        會換新的 ID 與代碼重試，重試 _MAX_CODE_ATTEMPTS 次仍衝突時拋出 ValueError；
+        呼叫端指定的 ticket_code（須彼此不重複）已存在時直接拋出 ValueError。
+        """
+        pending = []
+        generated = set()
+        uuids = iter(generate_snowflake_ids(sum(1 for row in rows if "uuid" not in row)))
+        for index, row in enumerate(rows):
+            row = dict(row)
+            if "uuid" not in row:
+                row["uuid"] = next(uuids)
+            if not row.get("ticket_code"):
+                row["ticket_code"] = generate_ticket_code(row["uuid"])
+                generated.add(index)
+            pending.append(row)
+
+        results: List[Optional[Row]] = [None] * len(pending)
+        waiting = list(range(len(pending)))
+        for _ in range(_MAX_CODE_ATTEMPTS):
+            collided = []
+            for start in range(0, len(waiting), _INSERT_CHUNK_SIZE):
+                chunk = waiting[start:start + _INSERT_CHUNK_SIZE]
+                by_code = {pending[index]["ticket_code"]: index for index in chunk}
+                inserted = db.connection().execute(
+                    _INSERT_TICKETS, [pending[index] for index in chunk]
+                ).all()
+                for row in inserted:
+                    results[by_code.pop(row.ticket_code)] = row
+                collided.extend(by_code.values())
+
+            if not collided:
+                return results
+            for index in collided:
+                if index not in generated:
+                    raise ValueError(f"Ticket code already exists: {pending[index]['ticket_code']}")
+
+            # 只替衝突的列換新的 ID 與代碼
+            for index, ticket_uuid in zip(collided, generate_snowflake_ids(len(collided))):
+                pending[index]["uuid"] = ticket_uuid
+                pending[index]["ticket_code"] = generate_ticket_code(pending[index]["uuid"])
+            waiting = collided
+
+        raise ValueError(f"Could not generate unique ticket codes for {len(waiting)} tickets")
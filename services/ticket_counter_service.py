@@ -0,0 +1,280 @@
+"""
+活動 / 票種計數器服務
+
+ticket_counters 以 (event_id, ticket_type_id, shard) 為鍵，記錄已發行、已使用、
+有效簽到與已撤銷的數量。發行、刪除、簽到、撤銷都在同一個交易內更新計數器，
+配額檢查與活動摘要只需讀取少數幾列，不再隨活動規模掃描 tickets / checkin_logs。
+
+- ticket_type_id = 0 為活動總計（不屬於任何票種的票券只計入總計）
+- 簽到 / 撤銷寫入 shard 1..TICKET_COUNTER_SHARDS-1 中的隨機一列，讀取時加總；
+  shard 0 只給 issued，簽到不會排在進行中的發行 / 匯入交易持有的列鎖後面
+- issued 的異動（發行、刪除）固定寫入 shard 0，配額預留以該列的條件式 UPDATE 完成，
+  同一活動的發行互相排隊，不同活動互不影響
+- 多列寫入一律先鎖活動總計列、再鎖票種列，避免死結
+- changes 在每次計數器寫入時累加（只增不減，reconcile 不修改），活動總計列各 shard 的合計
+  在每個改變票券的交易提交後都會不同，做為離線清單 ETag 的版本（version_stmt）
+- reconcile 以同一個快照比對實際資料與計數器，把差額補進 shard 0，可在線上執行；
+  排程的全活動校正以 advisory lock 互斥，多個 worker 同時觸發時只有一個執行
+"""
+import random
+import hashlib
+from typing import Dict, Optional
+from sqlalchemy import select, update, func, literal, union_all, or_, case, Integer, BigInteger
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.config import settings
+from models import TicketCounter, Ticket, CheckInLog, Event, TicketType
+
+EVENT_TOTAL = 0
+COUNTER_FIELDS = ("issued", "used", "active_checkins", "revoked")
+# 排程校正的 advisory lock 編號（64 位元有號整數）
+_RECONCILE_LOCK_ID = int.from_bytes(hashlib.sha256(b"ticket_counters:reconcile").digest()[:8], "big", signed=True)
+
+
+def _random_shard() -> int:
+    """簽到 / 撤銷使用的 shard（不含配額預留使用的 shard 0）"""
+    return random.randint(1, max(1, settings.TICKET_COUNTER_SHARDS - 1))
+
+
+def _empty_counts() -> Dict[str, int]:
+    return {field: 0 for field in COUNTER_FIELDS}
+
+
+class QuotaExceededError(ValueError):
+    """配額不足；scope 為 "event" 或 "ticket_type"（ticket_type_id），remaining 為尚可發行的張數"""
+
+    def __init__(self, scope: str, quota: int, remaining: int, ticket_type_id: Optional[int] = None):
+        self.scope = scope
+        self.ticket_type_id = ticket_type_id
+        self.quota = quota
+        self.remaining = max(0, remaining)
+        super().__init__(f"{scope} quota exceeded: quota {quota}, {self.remaining} remaining")
+
+
+class TicketCounterService:
+
+    @staticmethod
+    def upsert_stmt(rows, shard: Optional[int] = None):
+        """
+        以「每張票券一列」的差額 select（欄位 event_id, ticket_type_id, issued, used,
+        active_checkins, revoked）建立計數器 upsert，同時累加票種列與活動總計列。
+        回傳的語句可直接執行，或做為 data-modifying CTE 併入其他語句。
+        """
+        src = rows.subquery("counter_delta")
+        sums = [func.sum(src.c[field]).label(field) for field in COUNTER_FIELDS]
+        by_type = (select(src.c.event_id, src.c.ticket_type_id, *sums)
+                   .where(src.c.ticket_type_id.isnot(None))
+                   .group_by(src.c.event_id, src.c.ticket_type_id))
+        by_event = (select(src.c.event_id, literal(EVENT_TOTAL, Integer).label("ticket_type_id"), *sums)
+                    .group_by(src.c.event_id))
+        grouped = union_all(by_event, by_type).subquery("counter_rows")
+        return TicketCounterService._upsert(grouped, _random_shard() if shard is None else shard)
+
+    @staticmethod
+    def _upsert(grouped, shard: int, changes: int = 1):
+        stmt = insert(TicketCounter).from_select(
+            ["event_id", "ticket_type_id", "shard", *COUNTER_FIELDS, "changes"],
+            select(
+                grouped.c.event_id,
+                grouped.c.ticket_type_id,
+                literal(shard, Integer),
+                *[grouped.c[field] for field in COUNTER_FIELDS],
+                literal(changes, BigInteger)
+            ).order_by(grouped.c.ticket_type_id)  # 活動總計列（0）先鎖
+        )
+        return stmt.on_conflict_do_update(
+            index_elements=["event_id", "ticket_type_id", "shard"],
+            set_={field: getattr(TicketCounter, field) + stmt.excluded[field] for field in (*COUNTER_FIELDS, "changes")}
+        )
+
+    @staticmethod
+    def add(
+        db: Session,
+        event_id: int,
+        ticket_type_id: Optional[int],
+        issued: int = 0,
+        used: int = 0,
+        active_checkins: int = 0,
+        revoked: int = 0
+    ) -> None:
+        """
+        累加單一 (活動, 票種) 的計數（不提交交易，由呼叫端與資料變更一起提交）。
+        issued 有異動時寫入 shard 0，與配額預留使用同一列。
+        """
+        delta = {"issued": issued, "used": used, "active_checkins": active_checkins, "revoked": revoked}
+        keys = [EVENT_TOTAL] if ticket_type_id is None else [EVENT_TOTAL, ticket_type_id]
+        shard = 0 if issued else _random_shard()
+        stmt = insert(TicketCounter).values([
+            {"event_id": event_id, "ticket_type_id": key, "shard": shard, **delta, "changes": 1}
+            for key in keys
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["event_id", "ticket_type_id", "shard"],
+            set_={field: getattr(TicketCounter, field) + stmt.excluded[field] for field in (*COUNTER_FIELDS, "changes")}
+        ))
+
+    @staticmethod
+    def reserve(db: Session, event_id: int, ticket_type_id: Optional[int], count: int) -> None:
+        """
+        在活動總配額與票種配額內預留 count 張（issued 直接累加，不提交交易）。
+
+        以 shard 0 列的條件式 UPDATE 完成「檢查 + 累加」：並行的發行請求會在該列的鎖上排隊，
+        取得鎖後以最新的 issued 重新判斷條件，因此不會超賣。配額 <= 0 或未設定視為不限。
+        配額不足時拋出 QuotaExceededError，呼叫端應 rollback。
+        """
+        TicketCounterService.reserve_many(db, event_id, {ticket_type_id: count})
+
+    @staticmethod
+    def reserve_many(db: Session, event_id: int, counts: Dict[Optional[int], int]) -> None:
+        """一次預留多個票種（ticket_type_id -> 張數，None 為不屬於任何票種）；活動總配額以合計檢查"""
+        type_ids = sorted(type_id for type_id in counts if type_id is not None)
+        db.execute(
+            insert(TicketCounter)
+            .values([
+                {"event_id": event_id, "ticket_type_id": key, "shard": 0}
+                for key in [EVENT_TOTAL, *type_ids]
+            ])
+            .on_conflict_do_nothing(index_elements=["event_id", "ticket_type_id", "shard"])
+        )
+        TicketCounterService._reserve_row(
+            db, event_id, EVENT_TOTAL, sum(counts.values()), "event",
+            select(Event.total_quota).where(Event.id == event_id).scalar_subquery()
+        )
+        for type_id in type_ids:
+            TicketCounterService._reserve_row(
+                db, event_id, type_id, counts[type_id], "ticket_type",
+                select(TicketType.quota).where(TicketType.id == type_id).scalar_subquery()
+            )
+
+    @staticmethod
+    def _reserve_row(db: Session, event_id: int, ticket_type_id: int, count: int, scope: str, quota) -> None:
+        # 其他 shard 的 issued 只來自舊資料，不會再變動，可以放在子查詢中
+        other_shards = (select(func.coalesce(func.sum(TicketCounter.issued), 0))
+                        .where(TicketCounter.event_id == event_id)
+                        .where(TicketCounter.ticket_type_id == ticket_type_id)
+                        .where(TicketCounter.shard != 0)
+                        .scalar_subquery())
+        reserved = db.execute(
+            update(TicketCounter)
+            .where(TicketCounter.event_id == event_id)
+            .where(TicketCounter.ticket_type_id == ticket_type_id)
+            .where(TicketCounter.shard == 0)
+            .where(or_(quota.is_(None), quota <= 0, TicketCounter.issued + other_shards + count <= quota))
+            .values(issued=TicketCounter.issued + count, changes=TicketCounter.changes + 1)
+            .returning(TicketCounter.issued)
+        ).first()
+        if reserved is None:
+            current_quota = db.execute(select(quota)).scalar()
+            issued = TicketCounterService.get_issued(db, event_id, None if ticket_type_id == EVENT_TOTAL else ticket_type_id)
+            raise QuotaExceededError(
+                scope, current_quota, current_quota - issued,
+                None if ticket_type_id == EVENT_TOTAL else ticket_type_id
+            )
+
+    @staticmethod
+    def get_counts(db: Session, event_id: int) -> Dict[int, Dict[str, int]]:
+        """取得活動的計數：ticket_type_id（0 為活動總計）-> 各欄位數量"""
+        rows = db.execute(
+            select(TicketCounter.ticket_type_id, *[func.sum(getattr(TicketCounter, f)).label(f) for f in COUNTER_FIELDS])
+            .where(TicketCounter.event_id == event_id)
+            .group_by(TicketCounter.ticket_type_id)
+        ).all()
+        counts = {EVENT_TOTAL: _empty_counts()}
+        for row in rows:
+            counts[row.ticket_type_id] = {field: int(getattr(row, field) or 0) for field in COUNTER_FIELDS}
+        return counts
+
+    @staticmethod
+    def get_issued(db: Session, event_id: int, ticket_type_id: Optional[int] = None) -> int:
+        """已發行票券數（不指定票種時為整個活動）"""
+        return int(db.execute(
+            select(func.coalesce(func.sum(TicketCounter.issued), 0))
+            .where(TicketCounter.event_id == event_id)
+            .where(TicketCounter.ticket_type_id == (EVENT_TOTAL if ticket_type_id is None else ticket_type_id))
+        ).scalar())
+
+    @staticmethod
+    def version_stmt(event_id: int):
+        """活動票券狀態的版本（活動總計列 changes 的合計），回傳的 select 可做為子查詢"""
+        return (select(func.coalesce(func.sum(TicketCounter.changes), 0))
+                .where(TicketCounter.event_id == event_id)
+                .where(TicketCounter.ticket_type_id == EVENT_TOTAL))
+
+    @staticmethod
+    def reconcile(db: Session, event_id: Optional[int] = None) -> int:
+        """
+        以實際資料修正計數器，回傳修正的列數。
+        實際數量與計數器總和在同一個語句（同一快照）內計算，差額累加到 shard 0；
+        與進行中的簽到並行執行也不會重複計算或遺漏。未指定活動時逐一處理所有活動。
+        """
+        if event_id is None:
+            event_ids = db.execute(select(Event.id).order_by(Event.id)).scalars().all()
+            return sum(TicketCounterService.reconcile(db, eid) for eid in event_ids)
+
+        log_stats = (select(
+                         CheckInLog.ticket_id,
+                         func.count().filter(CheckInLog.is_revoked.isnot(True)).label("active_checkins"),
+                         func.count().filter(CheckInLog.is_revoked.is_(True)).label("revoked"))
+                     .join(Ticket, Ticket.id == CheckInLog.ticket_id)
+                     .where(Ticket.event_id == event_id)
+                     .group_by(CheckInLog.ticket_id)
+                     .subquery("log_stats"))
+        per_ticket = (select(
+                          Ticket.event_id,
+                          Ticket.ticket_type_id,
+                          literal(1, Integer).label("issued"),
+                          case((Ticket.is_used.is_(True), 1), else_=0).label("used"),
+                          func.coalesce(log_stats.c.active_checkins, 0).label("active_checkins"),
+                          func.coalesce(log_stats.c.revoked, 0).label("revoked"))
+                      .outerjoin(log_stats, log_stats.c.ticket_id == Ticket.id)
+                      .where(Ticket.event_id == event_id)
+                      .subquery("per_ticket"))
+        sums = [func.sum(per_ticket.c[field]).label(field) for field in COUNTER_FIELDS]
+        actual = union_all(
+            select(per_ticket.c.ticket_type_id, *sums)
+            .where(per_ticket.c.ticket_type_id.isnot(None))
+            .group_by(per_ticket.c.ticket_type_id),
+            select(literal(EVENT_TOTAL, Integer).label("ticket_type_id"), *sums)
+        ).subquery("actual")
+        stored = (select(TicketCounter.ticket_type_id, *[func.sum(getattr(TicketCounter, f)).label(f) for f in COUNTER_FIELDS])
+                  .where(TicketCounter.event_id == event_id)
+                  .group_by(TicketCounter.ticket_type_id)
+                  .subquery("stored"))
+
+        deltas = [
+            (func.coalesce(actual.c[field], 0) - func.coalesce(stored.c[field], 0)).label(field)
+            for field in COUNTER_FIELDS
+        ]
+        diff = (select(
+                    literal(event_id, Integer).label("event_id"),
+                    func.coalesce(actual.c.ticket_type_id, stored.c.ticket_type_id).label("ticket_type_id"),
+                    *deltas)
+                .select_from(actual.join(stored, actual.c.ticket_type_id == stored.c.ticket_type_id, full=True))
+                .subquery("diff"))
+        corrections = (select(diff)
+                       .where(or_(*[diff.c[field] != 0 for field in COUNTER_FIELDS]))
+                       .subquery("corrections"))
+
+        try:
+            result = db.execute(TicketCounterService._upsert(corrections, 0, changes=0).returning(TicketCounter.ticket_type_id))
+            corrected = len(result.all())
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return corrected
+
+    @staticmethod
+    def reconcile_exclusive(db: Session) -> Optional[int]:
+        """
+        校正所有活動，但同一時間只有一個程序執行；其他 worker 已在執行時不等待，回傳 None。
+        reconcile 每個活動各自提交，交易層級的鎖會在第一次提交時釋放，
+        因此改用另一條連線持有 session 層級的 advisory lock，連線中斷時鎖也會隨之釋放。
+        """
+        with db.get_bind().connect() as lock_conn:
+            if not lock_conn.execute(select(func.pg_try_advisory_lock(_RECONCILE_LOCK_ID))).scalar():
+                return None
+            try:
+                return TicketCounterService.reconcile(db)
+            finally:
+                lock_conn.execute(select(func.pg_advisory_unlock(_RECONCILE_LOCK_ID)))
@@ -0,0 +1,217 @@
+"""
+票券匯入服務（CSV / JSONL）
+
+上傳的持有人名單（每列一張票券）以串流方式逐列解析，不會整份載入記憶體：
+1. 第一輪：逐列驗證，統計各票種的有效列數並收集錯誤（錯誤報告最多 TICKET_IMPORT_MAX_ERRORS 筆）
+2. 第二輪：重新讀取檔案，每 _IMPORT_CHUNK_SIZE 列以 TicketBulkService 多列寫入
+3. 提交前依統計結果一次預留整份檔案的活動 / 票種配額（TicketCounterService.reserve_many）
+
+整份檔案在同一個交易內完成；預設只要有任何錯誤就不匯入（skip_invalid=True 時略過錯誤列）。
+配額預留會鎖住活動的 shard 0 計數列直到提交，因此放在寫入之後，
+大型匯入不會在解析與寫入期間擋住同一活動的其他發行請求；配額不足時整個交易 rollback。
+FastAPI 的 UploadFile 會將大型上傳暫存到磁碟，兩輪讀取都只保留一個批次的資料列。
+"""
+import io
+import csv
+import json
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Set, Tuple, BinaryIO
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from app.config import settings
+from models import TicketType
+from schemas.ticket import TicketImportRow
+from services.ticket_bulk_service import TicketBulkService
+from services.ticket_counter_service import TicketCounterService, QuotaExceededError
+
+
+class ImportFormat:
+    """匯入檔案格式"""
+    CSV = "csv"
+    JSONL = "jsonl"
+
+
+# 每次寫入的列數
+_IMPORT_CHUNK_SIZE = 2000
+
+# 常見的欄位別名（CSV 標題或 JSON 鍵，不分大小寫）
+_FIELD_ALIASES = {
+    "name": "holder_name",
+    "email": "holder_email",
+    "phone": "holder_phone",
+    "user_id": "external_user_id",
+}
+
+_TICKET_FIELDS = ("holder_name", "holder_email", "holder_phone", "external_user_id", "notes", "description")
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """依副檔名或 Content-Type 判斷檔案格式，無法判斷時回傳 None"""
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return ImportFormat.CSV
+    if name.endswith((".jsonl", ".ndjson")):
+        return ImportFormat.JSONL
+    content_type = (content_type or "").lower()
+    if "csv" in content_type:
+        return ImportFormat.CSV
+    if "ndjson" in content_type or "jsonl" in content_type or "json-lines" in content_type:
+        return ImportFormat.JSONL
+    return None
+
+
+def _normalize_keys(record: dict) -> dict:
+    normalized = {}
+    for key, value in record.items():
+        key = str(key).strip().lower()
+        normalized[_FIELD_ALIASES.get(key, key)] = value
+    return normalized
+
+
+class TicketImportService:
+
+    @staticmethod
+    def iter_records(fileobj: BinaryIO, file_format: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+        """
+        逐列讀取檔案，產生 (列號, 欄位 dict, 解析錯誤)。
+        CSV 第一列為標題（列號不含標題列）；JSONL 每行一個 JSON 物件，空白行略過。
+        """
+        fileobj.seek(0)
+        text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+        try:
+            if file_format == ImportFormat.CSV:
+                reader = csv.DictReader(text)
+                for row_number, record in enumerate(reader, 1):
+                    if None in record:
+                        yield row_number, None, "too many fields"
+                        continue
+                    yield row_number, _normalize_keys(record), None
+            else:
+                for row_number, line in enumerate(text, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield row_number, None, f"invalid JSON: {e.msg}"
+                        continue
+                    if not isinstance(record, dict):
+                        yield row_number, None, "each line must be a JSON object"
+                        continue
+                    yield row_number, _normalize_keys(record), None
+        except UnicodeDecodeError:
+            raise ValueError("File must be UTF-8 encoded")
+        except csv.Error as e:
+            raise ValueError(f"Invalid CSV: {e}")
+        finally:
+            # 不關閉底層的上傳檔案
+            text.detach()
+
+    @staticmethod
+    def _validate(
+        record: dict,
+        default_ticket_type_id: Optional[int],
+        ticket_type_ids: Set[int]
+    ) -> Tuple[Optional[TicketImportRow], List[str]]:
+        try:
+            row = TicketImportRow.model_validate(record)
+        except ValidationError as e:
+            return None, [
+                f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+                for error in e.errors()
+            ]
+        if row.ticket_type_id is None:
+            row.ticket_type_id = default_ticket_type_id
+        if row.ticket_type_id is not None and row.ticket_type_id not in ticket_type_ids:
+            return None, [f"ticket_type_id: ticket type {row.ticket_type_id} does not belong to the event"]
+        return row, []
+
+    @staticmethod
+    def import_file(
+        db: Session,
+        fileobj: BinaryIO,
+        file_format: str,
+        event_id: int,
+        ticket_type_id: Optional[int] = None,
+        skip_invalid: bool = False
+    ) -> dict:
+        """
+        匯入票券，回傳 total_rows / imported / error_count / errors / errors_truncated。
+        有錯誤且 skip_invalid=False 時不寫入任何票券（imported 為 0）；
+        配額不足或檔案過大時拋出 ValueError。
+        """
+        ticket_type_ids = {
+            row.id for row in db.query(TicketType.id).filter(TicketType.event_id == event_id).all()
+        }
+        if ticket_type_id is not None and ticket_type_id not in ticket_type_ids:
+            raise ValueError("Ticket type not found or does not belong to the event")
+
+        # 第一輪：驗證並統計各票種的張數
+        total_rows = 0
+        error_count = 0
+        errors: List[dict] = []
+        counts: Counter = Counter()
+        for row_number, record, parse_error in TicketImportService.iter_records(fileobj, file_format):
+            total_rows += 1
+            if total_rows > settings.TICKET_IMPORT_MAX_ROWS:
+                raise ValueError(f"Too many rows. Maximum is {settings.TICKET_IMPORT_MAX_ROWS} per file.")
+            row, row_errors = (None, [parse_error]) if parse_error else TicketImportService._validate(
+                record, ticket_type_id, ticket_type_ids
+            )
+            if row_errors:
+                error_count += 1
+                if len(errors) < settings.TICKET_IMPORT_MAX_ERRORS:
+                    errors.append({"row": row_number, "errors": row_errors})
+                continue
+            counts[row.ticket_type_id] += 1
+
+        result = {
+            "total_rows": total_rows,
+            "imported": 0,
+            "error_count": error_count,
+            "errors": errors,
+            "errors_truncated": error_count > len(errors),
+        }
+        if (error_count and not skip_invalid) or not counts:
+            return result
+
+        try:
+            # 第二輪：分批寫入有效列
+            chunk: List[Dict] = []
+            for _, record, parse_error in TicketImportService.iter_records(fileobj, file_format):
+                if parse_error:
+                    continue
+                row, row_errors = TicketImportService._validate(record, ticket_type_id, ticket_type_ids)
+                if row_errors:
+                    continue
+                chunk.append({
+                    "event_id": event_id,
+                    "ticket_type_id": row.ticket_type_id,
+                    **{field: getattr(row, field) for field in _TICKET_FIELDS},
+                })
+                if len(chunk) >= _IMPORT_CHUNK_SIZE:
+                    TicketBulkService.insert_tickets(db, chunk)
+                    result["imported"] += len(chunk)
+                    chunk = []
+            if chunk:
+                TicketBulkService.insert_tickets(db, chunk)
+                result["imported"] += len(chunk)
+
+            # 整份檔案一次預留配額，計數列的鎖只持有到緊接著的提交
+            try:
+                TicketCounterService.reserve_many(db, event_id, counts)
+            except QuotaExceededError as e:
+                if e.scope == "event":
+                    raise ValueError(
+                        f"Event total quota exceeded. File contains {sum(counts.values())} tickets, "
+                        f"but only {e.remaining} remaining."
+                    )
+                raise ValueError(
+                    f"Ticket type quota exceeded. File contains {counts[e.ticket_type_id]} tickets "
+                    f"of ticket type {e.ticket_type_id}, but only {e.remaining} remaining."
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return result
@@ -0,0 +1,159 @@
+"""
+離線票券清單（manifest）服務
+
+閘門裝置離線驗票用的精簡快照，取代逐筆 JSON 的 get_offline_tickets：
+不含持票人資料，只有依 uuid 排序的 (uuid, ticket id) 陣列與 is_used bitset，
+並以 HMAC-SHA256 簽章。支援 since 游標只下載變更的票券，以及 ETag 條件式請求。
+
+二進位格式（big-endian）：
+    header   magic "QRTM" | version u8 | flags u8 (bit0 = delta) | reserved u16
+             | event_id u32 | total u32 | since u64 | cursor u64
+    records  count 筆 (uuid u64, ticket_id u32)，依 uuid 遞增排序
+    bitset   ceil(count / 8) bytes，第 i 個 bit（LSB 優先）為第 i 筆的 is_used
+    count    u32
+    mac      HMAC-SHA256(header..count) 32 bytes
+
+since / cursor 為票券 created_at / updated_at 的微秒時間戳；
+delta 會多回傳 since 前 _DELTA_OVERLAP_SECONDS 秒內的變更，以涵蓋時間戳較早但較晚提交的交易。
+total 是活動目前的票券總數，套用 delta 後本地筆數不符（例如票券被刪除）時裝置應重新下載完整清單。
+
+ETag 以 ticket_counters 的 changes 合計為版本：發行、刪除、簽到與撤銷都在同一個交易內累加，
+每次提交後必定改變。票券時間欄位來自 now()（交易開始時間），較早開始但較晚提交的交易
+不會改變 max(changed_at)，因此不能單獨做為 ETag。
+"""
+import hmac
+import struct
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional, Tuple
+from sqlalchemy import select, func, cast, DateTime
+from sqlalchemy.orm import Session
+from app.config import settings
+from models import Ticket
+from services.ticket_counter_service import TicketCounterService
+
+MANIFEST_VERSION = 1
+MANIFEST_MEDIA_TYPE = "application/vnd.qr-checkin.manifest"
+_MANIFEST_MAGIC = b"QRTM"
+_FLAG_DELTA = 0x01
+_HEADER = struct.Struct(">4sBBHIIQQ")
+_RECORD = struct.Struct(">QI")
+_COUNT = struct.Struct(">I")
+_DELTA_OVERLAP_SECONDS = 30
+_STREAM_CHUNK_ROWS = 2000
+_MANIFEST_KEY = hmac.new(settings.SECRET_KEY.encode(), b"ticket-manifest-v1", hashlib.sha256).digest()
+
+
+def _changed_at():
+    """
+    票券最後變更時間：updated_at，從未更新過則為 created_at。
+    與 ix_tickets_event_id_changed_at 的索引運算式相同；比較時轉換的是參數而不是欄位，索引才能使用。
+    """
+    return func.coalesce(Ticket.updated_at, Ticket.created_at)
+
+
+def _as_column_time(value: datetime):
+    """
+    將含時區的時間轉成欄位使用的時間基準：欄位為不含時區的 now()，
+    即 session 時區的本地時間，因此以 timezone(TimeZone, 參數) 在資料庫端轉換。
+    """
+    return func.timezone(func.current_setting("TimeZone"), value)
+
+
+def _to_cursor(value: Optional[datetime]) -> int:
+    if value is None:
+        return 0
+    return int(value.timestamp() * 1_000_000)
+
+
+def _from_cursor(cursor: int) -> datetime:
+    return datetime.fromtimestamp(cursor / 1_000_000, tz=timezone.utc)
+
+
+class TicketManifestService:
+
+    @staticmethod
+    def get_manifest_state(db: Session, event_id: int) -> Tuple[int, int, int]:
+        """
+        回傳活動票券的 (總數, 最新變更游標, 版本)：游標作為下一次 since 的依據，三者共同組成 ETag。
+        各值以子查詢在同一個快照取得：max 單獨成一個查詢才能由索引倒序直接取得，總數只掃描該活動的索引項目。
+        """
+        total = select(func.count()).where(Ticket.event_id == event_id).scalar_subquery()
+        changed_at = select(func.max(_changed_at())).where(Ticket.event_id == event_id).scalar_subquery()
+        version = TicketCounterService.version_stmt(event_id).scalar_subquery()
+        # 欄位為 session 時區的本地時間，轉成 timestamptz 後游標與 session 時區無關
+        total, changed_at, version = db.execute(
+            select(total, cast(changed_at, DateTime(timezone=True)), version)
+        ).one()
+        return total, _to_cursor(changed_at), int(version)
+
+    @staticmethod
+    def make_etag(event_id: int, total: int, cursor: int, version: int) -> str:
+        """ETag 只代表活動票券狀態的版本，與 since 無關"""
+        return f'"m{MANIFEST_VERSION}-{event_id}-{total}-{cursor}-{version}"'
+
+    @staticmethod
+    def iter_manifest(db: Session, event_id: int, total: int, cursor: int, since: Optional[int] = None) -> Iterator[bytes]:
+        """
+        串流產生 manifest，每次 yield 一段 bytes。
+        以 server-side cursor 分段讀取 (uuid, id, is_used) 欄位，不建立 ORM 物件。
+        """
+        mac = hmac.new(_MANIFEST_KEY, digestmod=hashlib.sha256)
+        flags = _FLAG_DELTA if since else 0
+        header = _HEADER.pack(_MANIFEST_MAGIC, MANIFEST_VERSION, flags, 0, event_id, total, since or 0, cursor)
+        mac.update(header)
+        yield header
+
+        stmt = (select(Ticket.uuid, Ticket.id, Ticket.is_used)
+                .where(Ticket.event_id == event_id)
+                .order_by(Ticket.uuid))
+        if since:
+            changed_since = _from_cursor(since) - timedelta(seconds=_DELTA_OVERLAP_SECONDS)
+            stmt = stmt.where(_changed_at() >= _as_column_time(changed_since))
+
+        count = 0
+        bitset = bytearray()
+        result = db.execute(stmt.execution_options(yield_per=_STREAM_CHUNK_ROWS))
+        for rows in result.partitions():
+            chunk = bytearray()
+            for ticket_uuid, ticket_id, is_used in rows:
+                chunk += _RECORD.pack(ticket_uuid, ticket_id)
+                if count % 8 == 0:
+                    bitset.append(0)
+                if is_used:
+                    bitset[-1] |= 1 << (count % 8)
+                count += 1
+            mac.update(chunk)
+            yield bytes(chunk)
+
+        trailer = bytes(bitset) + _COUNT.pack(count)
+        mac.update(trailer)
+        yield trailer + mac.digest()
+
+    @staticmethod
+    def parse_manifest(data: bytes, verify: bool = True) -> dict:
+        """解析 manifest（測試與伺服器端驗證用），簽章不符時拋出 ValueError"""
+        if len(data) < _HEADER.size + _COUNT.size + 32:
+            raise ValueError("Manifest is truncated")
+        body, signature = data[:-32], data[-32:]
+        if verify:
+            expected = hmac.new(_MANIFEST_KEY, body, hashlib.sha256).digest()
+            if not hmac.compare_digest(signature, expected):
+                raise ValueError("Manifest signature mismatch")
+        magic, version, flags, _, event_id, total, since, cursor = _HEADER.unpack_from(body)
+        if magic != _MANIFEST_MAGIC or version != MANIFEST_VERSION:
+            raise ValueError("Unsupported manifest format")
+        (count,) = _COUNT.unpack_from(body, len(body) - _COUNT.size)
+        bitset = body[len(body) - _COUNT.size - (count + 7) // 8:len(body) - _COUNT.size]
+        tickets = []
+        for i in range(count):
+            ticket_uuid, ticket_id = _RECORD.unpack_from(body, _HEADER.size + i * _RECORD.size)
+            tickets.append((ticket_uuid, ticket_id, bool(bitset[i // 8] >> (i % 8) & 1)))
+        return {
+            "event_id": event_id,
+            "delta": bool(flags & _FLAG_DELTA),
+            "total": total,
+            "since": since,
+            "cursor": cursor,
+            "tickets": tickets
+        }
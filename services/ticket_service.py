@@ -2,15 +2,23 @@
 Ticket Service
 """
 
+from datetime import datetime
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, select, Row
 from models.ticket import Ticket
 from models.event import Event  
 from models.ticket_type import TicketType
 from schemas.ticket import TicketCreate, TicketUpdate, BatchTicketCreate
-from utils.qr_code import generate_ticket_code
+from utils.ticket_code import generate_ticket_code, normalize_ticket_code
+from utils.snowflake import generate_snowflake_id
+from services.ticket_counter_service import TicketCounterService, QuotaExceededError
+from services.ticket_bulk_service import TicketBulkService
+from utils.metrics import instrument_service
+from utils.cache import invalidate_public_ticket
+from app.config import settings
 
+@instrument_service
 class TicketService:
     @staticmethod
     def create_ticket(db: Session, ticket_data: TicketCreate) -> Ticket:
@@ -20,92 +28,47 @@ class TicketService:
         if not event:
             raise ValueError("Event not found")
         
-        # Check event total quota limit
-        if event.total_quota is not None and event.total_quota > 0:
-            current_total_tickets = db.query(Ticket).filter(Ticket.event_id == ticket_data.event_id).count()
-            if current_total_tickets >= event.total_quota:
-                raise ValueError(f"Event total quota exceeded. Event quota ({event.total_quota}) is full.")
-        
-        # Validate ticket type belongs to event and check ticket type quota
+        # Validate ticket type belongs to event
         if ticket_data.ticket_type_id:
             ticket_type = db.query(TicketType).filter(
                 and_(TicketType.id == ticket_data.ticket_type_id, TicketType.event_id == ticket_data.event_id)
             ).first()
             if not ticket_type:
                 raise ValueError("Ticket type not found or does not belong to the event")
-
-            # Check ticket type quota
-            if ticket_type.quota is not None and ticket_type.quota > 0:
-                current_ticket_count = db.query(Ticket).filter(Ticket.ticket_type_id == ticket_data.ticket_type_id).count()
-                if current_ticket_count >= ticket_type.quota:
-                    raise ValueError(f"Ticket type quota exceeded. Quota ({ticket_type.quota}) is full.")
-        
-        # Generate unique ticket code
-        while True:
-            ticket_code = generate_ticket_code()
-            if not db.query(Ticket).filter(Ticket.ticket_code == ticket_code).first():
-                break
         
+        # Ticket code is derived from the snowflake uuid, unique without a lookup
+        ticket_uuid = generate_snowflake_id()
         ticket = Ticket(
             **ticket_data.dict(),
-            ticket_code=ticket_code
+            uuid=ticket_uuid,
+            ticket_code=generate_ticket_code(ticket_uuid)
         )
+        # Atomically reserve event / ticket type quota, then insert
+        TicketService._reserve_quota(db, ticket_data.event_id, ticket_data.ticket_type_id, 1)
         db.add(ticket)
         db.commit()
         db.refresh(ticket)
         return ticket
     
     @staticmethod
-    def create_batch_tickets(db: Session, batch_data: BatchTicketCreate) -> List[Ticket]:
+    def create_batch_tickets(db: Session, batch_data: BatchTicketCreate) -> List[Row]:
         """Create batch tickets"""
         # Check if event exists
         event = db.query(Event).filter(Event.id == batch_data.event_id).first()
         if not event:
             raise ValueError("Event not found")
         
-        # Check event total quota limit
-        if event.total_quota is not None and event.total_quota > 0:
-            current_total_tickets = db.query(Ticket).filter(Ticket.event_id == batch_data.event_id).count()
-            if current_total_tickets + batch_data.count > event.total_quota:
-                remaining_quota = event.total_quota - current_total_tickets
-                raise ValueError(f"Event total quota exceeded. Requested {batch_data.count} tickets, but only {remaining_quota} remaining.")
-        
-        # Check ticket type quota
+        # Validate ticket type belongs to event
         if batch_data.ticket_type_id:
             ticket_type = db.query(TicketType).filter(
                 and_(TicketType.id == batch_data.ticket_type_id, TicketType.event_id == batch_data.event_id)
             ).first()
             if not ticket_type:
                 raise ValueError("Ticket type not found or does not belong to the event")
-                
-            if ticket_type.quota is not None and ticket_type.quota > 0:
-                current_ticket_count = db.query(Ticket).filter(Ticket.ticket_type_id == batch_data.ticket_type_id).count()
-                if current_ticket_count + batch_data.count > ticket_type.quota:
-                    remaining_quota = ticket_type.quota - current_ticket_count
-                    raise ValueError(f"Ticket type quota exceeded. Requested {batch_data.count} tickets, but only {remaining_quota} remaining.")
         
-        tickets = []
-        for i in range(batch_data.count):
-            # Generate unique ticket code
-            while True:
-                ticket_code = generate_ticket_code()
-                if not db.query(Ticket).filter(Ticket.ticket_code == ticket_code).first():
-                    break
-            
-            ticket = Ticket(
-                event_id=batch_data.event_id,
-                ticket_type_id=batch_data.ticket_type_id,
-                ticket_code=ticket_code,
-                holder_name=f"{batch_data.holder_name_prefix}{i+1:03d}",
-                description=batch_data.description
-            )
-            tickets.append(ticket)
-            db.add(ticket)
-        
-        db.commit()
-        for ticket in tickets:
-            db.refresh(ticket)
-        return tickets
+        # Atomically reserve event / ticket type quota, then bulk insert
+        TicketService._reserve_quota(db, batch_data.event_id, batch_data.ticket_type_id, batch_data.count, batch=True)
+        return TicketService._insert_batch_tickets(db, batch_data)
         
     @staticmethod
     def get_ticket(db: Session, ticket_id: int) -> Ticket:
@@ -125,8 +88,11 @@ class TicketService:
         return db.query(Ticket).filter(Ticket.uuid == ticket_uuid).first()
     
     @staticmethod
-    def get_ticket_by_code(db: Session, ticket_code: str) -> Ticket:
-        """Get ticket by ticket code"""
+    def get_ticket_by_code(db: Session, ticket_code: str) -> Optional[Ticket]:
+        """Get ticket by ticket code (codes failing the check digit are rejected without a query)"""
+        ticket_code = normalize_ticket_code(ticket_code)
+        if ticket_code is None:
+            return None
         return db.query(Ticket).filter(Ticket.ticket_code == ticket_code).first()
     
     @staticmethod 
@@ -153,8 +119,10 @@ class TicketService:
         if not ticket:
             return False
         
+        TicketCounterService.add(db, ticket.event_id, ticket.ticket_type_id, issued=-1, used=-1 if ticket.is_used else 0)
         db.delete(ticket)
         db.commit()
+        invalidate_public_ticket(ticket.uuid)
         return True
     
     @staticmethod
@@ -169,6 +137,7 @@ class TicketService:
         
         db.commit()
         db.refresh(ticket)
+        invalidate_public_ticket(ticket.uuid)
         return ticket
     
     @staticmethod
@@ -178,14 +147,22 @@ class TicketService:
         if not ticket:
             raise ValueError("Ticket not found")
         
+        if not ticket.is_used:
+            TicketCounterService.add(db, ticket.event_id, ticket.ticket_type_id, used=1)
         ticket.is_used = True
         db.commit()
         db.refresh(ticket)
+        invalidate_public_ticket(ticket.uuid)
         return ticket
     
     @staticmethod
-    def create_batch_tickets_with_merchant(db: Session, batch_data: BatchTicketCreate, merchant_id: int = None) -> List[Ticket]:
-        """Create batch tickets (multi-tenant safe, validates event/ticket_type belongs to merchant)"""
+    def create_batch_tickets_with_merchant(
+        db: Session, batch_data: BatchTicketCreate, merchant_id: int = None, commit: bool = True
+    ) -> List[Row]:
+        """
+        Create batch tickets (multi-tenant safe, validates event/ticket_type belongs to merchant).
+        With commit=False the tickets are only flushed; the caller commits.
+        """
         # Validate event and ticket_type belong to merchant
         event_query = db.query(Event).filter(Event.id == batch_data.event_id)
         ticket_type_query = db.query(TicketType).filter(TicketType.id == batch_data.ticket_type_id)
@@ -200,40 +177,9 @@ class TicketService:
         if not event or not ticket_type:
             raise ValueError("Event or TicketType does not belong to this merchant or does not exist")
 
-        # Check event total quota limit
-        if event.total_quota is not None and event.total_quota > 0:
-            current_total_tickets = db.query(Ticket).filter(Ticket.event_id == batch_data.event_id).count()
-            if current_total_tickets + batch_data.count > event.total_quota:
-                remaining_quota = event.total_quota - current_total_tickets
-                raise ValueError(f"Event total quota exceeded. Requested {batch_data.count} tickets, but only {remaining_quota} remaining.")
-
-        # Check ticket type quota
-        if ticket_type.quota is not None and ticket_type.quota > 0:
-            current_ticket_count = db.query(Ticket).filter(Ticket.ticket_type_id == batch_data.ticket_type_id).count()
-            if current_ticket_count + batch_data.count > ticket_type.quota:
-                remaining_quota = ticket_type.quota - current_ticket_count
-                raise ValueError(f"Ticket type quota exceeded. Requested {batch_data.count} tickets, but only {remaining_quota} remaining.")
-        
-        tickets = []
-        for i in range(batch_data.count):
-            # Generate unique ticket code
-            while True:
-                ticket_code = generate_ticket_code()
-                if not db.query(Ticket).filter(Ticket.ticket_code == ticket_code).first():
-                    break
-            ticket = Ticket(
-                event_id=batch_data.event_id,
-                ticket_type_id=batch_data.ticket_type_id,
-                ticket_code=ticket_code,
-                holder_name=f"{batch_data.holder_name_prefix}{i+1:03d}",
-                description=batch_data.description  # Add description support
-            )
-            tickets.append(ticket)
-            db.add(ticket)
-        db.commit()
-        for ticket in tickets:
-            db.refresh(ticket)
-        return tickets
+        # Atomically reserve event / ticket type quota, then bulk insert
+        TicketService._reserve_quota(db, batch_data.event_id, batch_data.ticket_type_id, batch_data.count, batch=True)
+        return TicketService._insert_batch_tickets(db, batch_data, commit)
 
     @staticmethod
     def delete_ticket_with_merchant(db: Session, ticket_id: int, merchant_id: int = None) -> bool:
@@ -248,8 +194,10 @@ class TicketService:
         if not ticket:
             return False
         
+        TicketCounterService.add(db, ticket.event_id, ticket.ticket_type_id, issued=-1, used=-1 if ticket.is_used else 0)
         db.delete(ticket)
         db.commit()
+        invalidate_public_ticket(ticket.uuid)
         return True
 
     @staticmethod
@@ -270,11 +218,14 @@ class TicketService:
         
         db.commit()
         db.refresh(ticket)
+        invalidate_public_ticket(ticket.uuid)
         return ticket
 
     @staticmethod
-    def create_ticket_with_merchant(db: Session, ticket_data: TicketCreate, merchant_id: int = None) -> Ticket:
-        """Create single ticket (multi-tenant safe)"""
+    def create_ticket_with_merchant(
+        db: Session, ticket_data: TicketCreate, merchant_id: int = None, commit: bool = True
+    ) -> Ticket:
+        """Create single ticket (multi-tenant safe). With commit=False the ticket is only flushed; the caller commits."""
         # Validate event belongs to merchant and get event info
         if merchant_id:
             event = db.query(Event).filter(
@@ -287,13 +238,7 @@ class TicketService:
             if not event:
                 raise ValueError("Event not found")
 
-        # Check event total quota limit
-        if event.total_quota is not None and event.total_quota > 0:
-            current_total_tickets = db.query(Ticket).filter(Ticket.event_id == ticket_data.event_id).count()
-            if current_total_tickets >= event.total_quota:
-                raise ValueError(f"Event total quota exceeded. Event quota ({event.total_quota}) is full.")
-        
-        # Validate ticket type belongs to event and check ticket type quota  
+        # Validate ticket type belongs to event
         if ticket_data.ticket_type_id:
             if merchant_id:
                 # Multi-tenant filter
@@ -311,25 +256,21 @@ class TicketService:
             
             if not ticket_type:
                 raise ValueError("Ticket type not found or does not belong to the event")
-
-            # Check ticket type quota
-            if ticket_type.quota is not None and ticket_type.quota > 0:
-                current_ticket_count = db.query(Ticket).filter(Ticket.ticket_type_id == ticket_data.ticket_type_id).count()
-                if current_ticket_count >= ticket_type.quota:
-                    raise ValueError(f"Ticket type quota exceeded. Quota ({ticket_type.quota}) is full.")
-        
-        # Generate unique ticket code
-        while True:
-            ticket_code = generate_ticket_code()
-            if not db.query(Ticket).filter(Ticket.ticket_code == ticket_code).first():
-                break
         
+        # Ticket code is derived from the snowflake uuid, unique without a lookup
+        ticket_uuid = generate_snowflake_id()
         ticket = Ticket(
             **ticket_data.dict(),
-            ticket_code=ticket_code
+            uuid=ticket_uuid,
+            ticket_code=generate_ticket_code(ticket_uuid)
         )
+        # Atomically reserve event / ticket type quota, then insert
+        TicketService._reserve_quota(db, ticket_data.event_id, ticket_data.ticket_type_id, 1)
         db.add(ticket)
-        db.commit()
+        if commit:
+            db.commit()
+        else:
+            db.flush()
         db.refresh(ticket)
         return ticket
 
@@ -370,3 +311,77 @@ class TicketService:
         
         query = db.query(Ticket).filter(Ticket.holder_name.ilike(f"%{holder_name}%"))
         return query.offset(skip).limit(limit).all()
+
+    @staticmethod
+    def get_upcoming_member_tickets(db: Session, merchant_id: int, external_user_id: str, limit: int = 50) -> List[Row]:
+        """
+        Upcoming (not yet ended) tickets of a member within one merchant, joined with their event
+        and ticket type in a single query, ordered by event start time
+        """
+        limit = max(1, min(settings.MEMBER_TICKETS_MAX, limit))
+        query = (
+            select(
+                Ticket.uuid, Ticket.holder_name, Ticket.is_used, Ticket.description,
+                Ticket.ticket_type_id, Ticket.event_id, Ticket.created_at, Ticket.updated_at,
+                TicketType.name.label("ticket_type_name"),
+                Event.name.label("event_name"),
+                Event.description.label("event_description"),
+                Event.location.label("event_location"),
+                Event.start_time.label("event_start_time"),
+                Event.end_time.label("event_end_time"),
+                Event.updated_at.label("event_updated_at"),
+            )
+            .join(Event, Ticket.event_id == Event.id)
+            .outerjoin(TicketType, Ticket.ticket_type_id == TicketType.id)
+            .where(
+                Ticket.external_user_id == external_user_id,
+                Event.merchant_id == merchant_id,
+                Event.is_active.isnot(False),
+                Event.end_time >= datetime.utcnow(),
+            )
+            .order_by(Event.start_time, Ticket.id)
+            .limit(limit)
+        )
+        return db.execute(query).all()
+
+    @staticmethod
+    def _insert_batch_tickets(db: Session, batch_data: BatchTicketCreate, commit: bool = True) -> List[Row]:
+        """Bulk insert the tickets of a batch (and commit unless commit=False); returns ticket rows (no per-row refresh)"""
+        try:
+            tickets = TicketBulkService.insert_tickets(db, [
+                {
+                    "event_id": batch_data.event_id,
+                    "ticket_type_id": batch_data.ticket_type_id,
+                    "holder_name": f"{batch_data.holder_name_prefix}{i+1:03d}",
+                    "description": batch_data.description
+                }
+                for i in range(batch_data.count)
+            ])
+            if commit:
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return tickets
+
+    @staticmethod
+    def _reserve_quota(db: Session, event_id: int, ticket_type_id: Optional[int], count: int, batch: bool = False) -> None:
+        """
+        Reserve `count` tickets against the event total quota and the ticket type quota.
+
+        The reservation is a conditional UPDATE on the event's counter row, so concurrent
+        issuance for the same event queues on that row instead of overselling; other events
+        are not affected. The row lock is held until the caller commits.
+        """
+        if count < 1:
+            raise ValueError("Ticket count must be at least 1")
+        try:
+            TicketCounterService.reserve(db, event_id, ticket_type_id, count)
+        except QuotaExceededError as e:
+            db.rollback()
+            label = "Event total" if e.scope == "event" else "Ticket type"
+            if batch:
+                raise ValueError(f"{label} quota exceeded. Requested {count} tickets, but only {e.remaining} remaining.")
+            if e.scope == "event":
+                raise ValueError(f"Event total quota exceeded. Event quota ({e.quota}) is full.")
+            raise ValueError(f"Ticket type quota exceeded. Quota ({e.quota}) is full.")
@@ -0,0 +1,374 @@
+"""
+可列印票券輸出服務（PDF / ZIP）
+
+將活動的票券（可依票種、是否已使用篩選）繪製成可列印的票券：每張票券包含 QR Code、持有人姓名、
+票種與票券代碼。
+- PDF：A4 頁面（150 DPI），每頁 _COLUMNS x _ROWS 張，附裁切線
+- ZIP：每張票券一個 PNG（檔名為票券代碼）
+
+票券以 yield_per 分批串流讀取，每頁（ZIP 則每 _ZIP_BATCH_SIZE 張）交給程序池繪製，
+同時送出的工作最多為程序數的兩倍，結果依序寫入輸出，記憶體用量與票券總數無關。
+程序池為模組層級共用（TICKET_SHEET_WORKERS 個程序），並行的下載排隊使用同一組程序，程序總數不隨下載數增加。
+PDF 由 _PDFWriter 逐頁寫出（xref 在最後），ZIP 以不可 seek 的串流模式寫出，
+因此可以直接串流到 HTTP 回應，也可以寫入磁碟檔案。
+
+列印的票券無法重新取得 QR Code，QR token 的有效期延長到活動結束後一天（不短於一般時間窗的有效期）。
+持有人姓名等非拉丁文字需要 TICKET_SHEET_FONT_PATH 指定支援的字型（例如 Noto Sans CJK）。
+"""
+import io
+import os
+import zlib
+import zipfile
+import threading
+import multiprocessing
+from collections import deque
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from app.config import settings
+from models import Event, Ticket, TicketType
+from utils import auth
+from utils.http_cache import as_utc
+from utils.qr_code import build_qr_matrix
+from utils.ticket_code import TICKET_CODE_LENGTH
+
+
+class TicketSheetFormat:
+    """輸出格式"""
+    PDF = "pdf"
+    ZIP = "zip"
+
+
+TICKET_SHEET_MEDIA_TYPES = {
+    TicketSheetFormat.PDF: "application/pdf",
+    TicketSheetFormat.ZIP: "application/zip",
+}
+
+# A4 @ 150 DPI
+_DPI = 150
+_PAGE_WIDTH, _PAGE_HEIGHT = 1240, 1754
+_PAGE_MARGIN = 45
+_COLUMNS, _ROWS = 3, 4
+_CELL_WIDTH = (_PAGE_WIDTH - 2 * _PAGE_MARGIN) // _COLUMNS
+_CELL_HEIGHT = (_PAGE_HEIGHT - 2 * _PAGE_MARGIN) // _ROWS
+_QR_SIZE = 264  # QR Code 邊長（像素）
+_TICKETS_PER_PAGE = _COLUMNS * _ROWS
+_ZIP_BATCH_SIZE = 50
+_FETCH_BATCH_SIZE = 2000
+
+
+# --- 繪製（在程序池中執行） ---
+
+_fonts: Dict[int, object] = {}
+
+
+def _font(size: int):
+    font = _fonts.get(size)
+    if font is None:
+        from PIL import ImageFont
+        font = None
+        if settings.TICKET_SHEET_FONT_PATH:
+            try:
+                font = ImageFont.truetype(settings.TICKET_SHEET_FONT_PATH, size)
+            except OSError:
+                font = None
+        if font is None:
+            font = ImageFont.load_default(size)
+        _fonts[size] = font
+    return font
+
+
+def _fit_text(draw, text: str, font, max_width: int) -> str:
+    """超過寬度時截斷並加上省略號"""
+    if draw.textlength(text, font=font) <= max_width:
+        return text
+    while text and draw.textlength(text + "…", font=font) > max_width:
+        text = text[:-1]
+    return text + "…"
+
+
+def _format_code(code: str) -> str:
+    """新版票券代碼每 4 個字元分組（輸入時會忽略連字號）"""
+    if len(code) != TICKET_CODE_LENGTH:
+        return code
+    return "-".join(code[i:i + 4] for i in range(0, len(code), 4))
+
+
+def _qr_image(token: str, size: int):
+    from PIL import Image
+    matrix = build_qr_matrix(token)
+    modules = len(matrix)
+    raw = b"".join(bytes(0 if dark else 255 for dark in row) for row in matrix)
+    scale = max(size // modules, 1)
+    return Image.frombytes("L", (modules, modules), raw).resize((modules * scale, modules * scale), Image.NEAREST)
+
+
+def _draw_ticket(image, draw, left: int, top: int, ticket: dict) -> None:
+    qr = _qr_image(ticket["qr_token"], _QR_SIZE)
+    image.paste(qr, (left + (_CELL_WIDTH - qr.width) // 2, top + 20))
+    text_width = _CELL_WIDTH - 40
+    y = top + 20 + qr.height + 12
+    for text, size in (
+        (ticket["holder_name"] or "", 30),
+        (ticket["ticket_type"] or "", 22),
+        (_format_code(ticket["ticket_code"]), 26),
+    ):
+        font = _font(size)
+        text = _fit_text(draw, text, font, text_width)
+        draw.text((left + _CELL_WIDTH // 2, y), text, fill=0, font=font, anchor="ma")
+        y += size + 14
+
+
+def render_pdf_page(tickets: List[dict]) -> bytes:
+    """繪製一頁票券，回傳 zlib 壓縮的 8-bit 灰階點陣（_PAGE_WIDTH x _PAGE_HEIGHT）"""
+    from PIL import Image, ImageDraw
+    page = Image.new("L", (_PAGE_WIDTH, _PAGE_HEIGHT), 255)
+    draw = ImageDraw.Draw(page)
+    for index, ticket in enumerate(tickets):
+        column, row = index % _COLUMNS, index // _COLUMNS
+        left = _PAGE_MARGIN + column * _CELL_WIDTH
+        top = _PAGE_MARGIN + row * _CELL_HEIGHT
+        _draw_ticket(page, draw, left, top, ticket)
+    # 裁切線
+    for column in range(_COLUMNS + 1):
+        x = _PAGE_MARGIN + column * _CELL_WIDTH
+        draw.line([(x, _PAGE_MARGIN), (x, _PAGE_MARGIN + _ROWS * _CELL_HEIGHT)], fill=200)
+    for row in range(_ROWS + 1):
+        y = _PAGE_MARGIN + row * _CELL_HEIGHT
+        draw.line([(_PAGE_MARGIN, y), (_PAGE_MARGIN + _COLUMNS * _CELL_WIDTH, y)], fill=200)
+    return zlib.compress(page.tobytes(), 6)
+
+
+def render_ticket_pngs(tickets: List[dict]) -> List[Tuple[str, bytes]]:
+    """繪製每張票券的 PNG，回傳 [(檔名, PNG)]"""
+    from PIL import Image, ImageDraw
+    results = []
+    for ticket in tickets:
+        image = Image.new("L", (_CELL_WIDTH, _CELL_HEIGHT), 255)
+        _draw_ticket(image, ImageDraw.Draw(image), 0, 0, ticket)
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", optimize=False)
+        results.append((f"{ticket['ticket_code']}.png", buffer.getvalue()))
+    return results
+
+
+# --- 輸出 ---
+
+class _StreamSink:
+    """只能附加寫入的緩衝區：寫入者寫入後由產生器取出已完成的位元組（不支援 seek）"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class _PDFWriter:
+    """逐頁寫出的最小 PDF 寫入器：每頁一張灰階點陣圖，頁面樹與 xref 在最後寫出"""
+
+    _CATALOG, _PAGES = 1, 2
+
+    def __init__(self, out):
+        self._out = out
+        self._offsets: Dict[int, int] = {}
+        self._pages: List[int] = []
+        self._next_object = 3
+        out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _object(self, number: int, body: bytes, stream: Optional[bytes] = None) -> None:
+        self._offsets[number] = self._out.tell()
+        self._out.write(b"%d 0 obj\n" % number + body)
+        if stream is not None:
+            self._out.write(b"\nstream\n" + stream + b"\nendstream")
+        self._out.write(b"\nendobj\n")
+
+    def add_page(self, compressed_pixels: bytes, width: int, height: int) -> None:
+        image, content, page = self._next_object, self._next_object + 1, self._next_object + 2
+        self._next_object += 3
+        page_width, page_height = width * 72 / _DPI, height * 72 / _DPI
+        self._object(image, (
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+            b"/BitsPerComponent 8 /Filter /FlateDecode /Length %d >>" % (width, height, len(compressed_pixels))
+        ), compressed_pixels)
+        drawing = b"q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q" % (page_width, page_height)
+        self._object(content, b"<< /Length %d >>" % len(drawing), drawing)
+        self._object(page, (
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] "
+            b"/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+            % (self._PAGES, page_width, page_height, image, content)
+        ))
+        self._pages.append(page)
+
+    def close(self) -> None:
+        kids = b" ".join(b"%d 0 R" % page for page in self._pages)
+        self._object(self._PAGES, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._pages)))
+        self._object(self._CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % self._PAGES)
+        xref_offset = self._out.tell()
+        count = self._next_object
+        self._out.write(b"xref\n0 %d\n0000000000 65535 f \n" % count)
+        for number in range(1, count):
+            self._out.write(b"%010d 00000 n \n" % self._offsets[number])
+        self._out.write(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, self._CATALOG, xref_offset)
+        )
+
+
+_sheet_pool: Optional[ProcessPoolExecutor] = None
+_sheet_pool_lock = threading.Lock()
+
+
+def _sheet_workers() -> int:
+    return settings.TICKET_SHEET_WORKERS or os.cpu_count() or 1
+
+
+def _get_sheet_pool() -> ProcessPoolExecutor:
+    global _sheet_pool
+    if _sheet_pool is None:
+        with _sheet_pool_lock:
+            if _sheet_pool is None:
+                # spawn：不複製事件迴圈、連線池等 fork 不安全的狀態
+                _sheet_pool = ProcessPoolExecutor(
+                    max_workers=_sheet_workers(),
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _sheet_pool
+
+
+def _bounded_map(pool: ProcessPoolExecutor, fn: Callable, items: Iterable, window: int) -> Iterator:
+    """
+    依序回傳 fn(item) 的結果，同時送出的工作最多 window 個（Executor.map 會一次送出全部）。
+    中途停止迭代時取消本次尚未開始的工作（程序池為共用，不關閉）。
+    """
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class TicketSheetService:
+
+    @staticmethod
+    def _filtered(stmt, event_id: int, ticket_type_id: Optional[int], is_used: Optional[bool]):
+        stmt = stmt.where(Ticket.event_id == event_id)
+        if ticket_type_id is not None:
+            stmt = stmt.where(Ticket.ticket_type_id == ticket_type_id)
+        if is_used is not None:
+            stmt = stmt.where(Ticket.is_used == is_used)
+        return stmt
+
+    @staticmethod
+    def count_tickets(
+        db: Session, event_id: int, ticket_type_id: Optional[int] = None, is_used: Optional[bool] = None
+    ) -> int:
+        """符合篩選條件的票券張數"""
+        stmt = TicketSheetService._filtered(select(func.count(Ticket.id)), event_id, ticket_type_id, is_used)
+        return db.execute(stmt).scalar()
+
+    @staticmethod
+    def _iter_tickets(
+        db: Session, event: Event, ticket_type_id: Optional[int], is_used: Optional[bool]
+    ) -> Iterator[dict]:
+        # 列印的票券在活動結束後一天才過期（不短於一般 token）；naive 的 end_time 視為 UTC
+        print_expire = int(as_utc(event.end_time).timestamp()) + 86400
+        stmt = TicketSheetService._filtered(
+            select(Ticket.uuid, Ticket.event_id, Ticket.ticket_code, Ticket.holder_name, TicketType.name)
+            .outerjoin(TicketType, TicketType.id == Ticket.ticket_type_id)
+            .order_by(Ticket.id),
+            event.id, ticket_type_id, is_used
+        )
+        expire = max(print_expire, auth.qr_token_expire())
+        for ticket_uuid, event_id, ticket_code, holder_name, ticket_type in db.execute(
+            stmt.execution_options(yield_per=_FETCH_BATCH_SIZE)
+        ):
+            yield {
+                "qr_token": auth.create_qr_token(ticket_uuid, event_id, expire=expire),
+                "holder_name": holder_name,
+                "ticket_type": ticket_type,
+                "ticket_code": ticket_code,
+            }
+
+    @staticmethod
+    def iter_sheets(
+        db: Session,
+        event: Event,
+        sheet_format: str,
+        ticket_type_id: Optional[int] = None,
+        is_used: Optional[bool] = None
+    ) -> Iterator[bytes]:
+        """
+        繪製票券並逐段產生輸出檔案的位元組（PDF 或 ZIP）。
+        呼叫端可將結果串流到 HTTP 回應或寫入檔案；中途停止迭代時會取消尚未完成的繪製工作。
+        """
+        window = _sheet_workers() * 2
+        tickets = TicketSheetService._iter_tickets(db, event, ticket_type_id, is_used)
+        sink = _StreamSink()
+        pool = _get_sheet_pool()
+        if sheet_format == TicketSheetFormat.PDF:
+            writer = _PDFWriter(sink)
+            with closing(_bounded_map(pool, render_pdf_page, _chunks(tickets, _TICKETS_PER_PAGE), window)) as pages:
+                for compressed_pixels in pages:
+                    writer.add_page(compressed_pixels, _PAGE_WIDTH, _PAGE_HEIGHT)
+                    yield sink.drain()
+            writer.close()
+        else:
+            with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+                with closing(_bounded_map(pool, render_ticket_pngs, _chunks(tickets, _ZIP_BATCH_SIZE), window)) as batches:
+                    for files in batches:
+                        for name, content in files:
+                            archive.writestr(name, content)
+                        yield sink.drain()
+        yield sink.drain()
+
+    @staticmethod
+    def write_sheets(db: Session, event: Event, sheet_format: str, fileobj, **filters) -> int:
+        """將票券輸出寫入檔案物件，回傳寫入的位元組數"""
+        written = 0
+        for chunk in TicketSheetService.iter_sheets(db, event, sheet_format, **filters):
+            fileobj.write(chunk)
+            written += len(chunk)
+        return written
+
+    @staticmethod
+    def shutdown() -> None:
+        """關閉繪製程序池"""
+        global _sheet_pool
+        with _sheet_pool_lock:
+            if _sheet_pool is not None:
+                _sheet_pool.shutdown(wait=False, cancel_futures=True)
+                _sheet_pool = None
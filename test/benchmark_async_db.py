@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+同步 vs 非同步資料庫端點吞吐量比較
+
+模擬 N 台掃描器（預設 500）同時對票券查詢端點發出請求：
+- sync:  `def` 端點 + SessionLocal，每個進行中的請求佔用一個 threadpool slot（預設 40）
+- async: `async def` 端點 + AsyncSessionLocal（asyncpg），不經過 threadpool
+
+兩種端點都在行程內以 ASGI 直接呼叫，排除 HTTP 伺服器與網路的影響。
+需要可連線的 DATABASE_URL，且資料庫內至少有一張票券。
+
+用法：
+    DATABASE_URL=postgresql://... python test/benchmark_async_db.py --scanners 500 --requests 4
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from fastapi import FastAPI, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db, get_async_db, SessionLocal, engine, async_engine
+from models.ticket import Ticket
+from services.ticket_service import TicketService
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/sync/{ticket_uuid}")
+    def sync_lookup(ticket_uuid: int, db: Session = Depends(get_db)):
+        ticket = TicketService.get_ticket_by_uuid(db, ticket_uuid)
+        if not ticket:
+            raise HTTPException(status_code=404)
+        return {"uuid": str(ticket.uuid), "is_used": ticket.is_used}
+
+    @app.get("/async/{ticket_uuid}")
+    async def async_lookup(ticket_uuid: int, db: AsyncSession = Depends(get_async_db)):
+        ticket = await db.run_sync(TicketService.get_ticket_by_uuid, ticket_uuid)
+        if not ticket:
+            raise HTTPException(status_code=404)
+        return {"uuid": str(ticket.uuid), "is_used": ticket.is_used}
+
+    return app
+
+
+async def run_mode(client: httpx.AsyncClient, mode: str, uuids: list, scanners: int, per_scanner: int) -> dict:
+    latencies = []
+
+    async def scanner(idx: int):
+        for i in range(per_scanner):
+            ticket_uuid = uuids[(idx * per_scanner + i) % len(uuids)]
+            start = time.perf_counter()
+            resp = await client.get(f"/{mode}/{ticket_uuid}")
+            latencies.append(time.perf_counter() - start)
+            assert resp.status_code == 200, resp.text
+
+    start = time.perf_counter()
+    await asyncio.gather(*(scanner(i) for i in range(scanners)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "elapsed": elapsed,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000
+    }
+
+
+async def main(scanners: int, per_scanner: int):
+    with SessionLocal() as db:
+        uuids = list(db.execute(select(Ticket.uuid).limit(1000)).scalars())
+    if not uuids:
+        print("❌ 資料庫內沒有票券，請先建立測試資料")
+        return
+
+    app = build_app()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        # 預熱連線池
+        await run_mode(client, "sync", uuids, 10, 2)
+        await run_mode(client, "async", uuids, 10, 2)
+
+        print(f"🚦 {scanners} 台掃描器 × 每台 {per_scanner} 次查詢")
+        print(f"{'mode':<6} {'requests':>8} {'elapsed(s)':>10} {'req/s':>10} {'p50(ms)':>9} {'p99(ms)':>9}")
+        for mode in ("sync", "async"):
+            r = await run_mode(client, mode, uuids, scanners, per_scanner)
+            print(f"{r['mode']:<6} {r['requests']:>8} {r['elapsed']:>10.2f} {r['rps']:>10.0f} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f}")
+
+    await async_engine.dispose()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync vs async lookup throughput")
+    parser.add_argument("--scanners", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=4, help="requests per scanner")
+    args = parser.parse_args()
+    asyncio.run(main(args.scanners, args.requests))
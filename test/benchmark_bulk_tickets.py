@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+批次產票效能比較：逐張寫入 vs 批次寫入引擎
+
+- per-row: 舊做法，每張票券「產生代碼 → SELECT 檢查重複 → 加入 ORM 物件」，提交後逐張 refresh
+- bulk:    TicketService.create_batch_tickets（配額預留 + TicketBulkService 多列 INSERT ... RETURNING）
+
+每個數量各建立一個活動，量測完成後刪除測試資料。逐張寫入在大數量時需要數分鐘，
+預設只量測到 --per-row-max 張。需要可連線的 DATABASE_URL。
+
+用法：
+    DATABASE_URL=postgresql://... python test/benchmark_bulk_tickets.py --sizes 1000 10000 100000
+"""
+import os
+import sys
+import time
+import random
+import string
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal
+from models import Merchant, Event, TicketType, Ticket, TicketCounter
+from schemas.ticket import BatchTicketCreate
+from services.ticket_service import TicketService
+
+
+def create_event(db, merchant_id: int) -> tuple:
+    now = datetime.utcnow()
+    event = Event(merchant_id=merchant_id, name="bulk-benchmark",
+                  start_time=now + timedelta(days=1), end_time=now + timedelta(days=2))
+    db.add(event)
+    db.flush()
+    ticket_type = TicketType(event_id=event.id, name="bench", quota=0)
+    db.add(ticket_type)
+    db.commit()
+    return event.id, ticket_type.id
+
+
+def legacy_ticket_code(length: int = 8) -> str:
+    """舊版隨機票券代碼"""
+    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
+
+
+def per_row(db, event_id: int, ticket_type_id: int, count: int) -> int:
+    """舊版 create_batch_tickets 的寫入方式"""
+    tickets = []
+    for i in range(count):
+        while True:
+            ticket_code = legacy_ticket_code()
+            if not db.query(Ticket).filter(Ticket.ticket_code == ticket_code).first():
+                break
+        ticket = Ticket(event_id=event_id, ticket_type_id=ticket_type_id,
+                        ticket_code=ticket_code, holder_name=f"票券{i+1:03d}")
+        tickets.append(ticket)
+        db.add(ticket)
+    db.commit()
+    for ticket in tickets:
+        db.refresh(ticket)
+    return len(tickets)
+
+
+def bulk(db, event_id: int, ticket_type_id: int, count: int) -> int:
+    return len(TicketService.create_batch_tickets(
+        db, BatchTicketCreate(event_id=event_id, ticket_type_id=ticket_type_id, count=count)
+    ))
+
+
+def cleanup(db, event_ids: list, merchant_id: int) -> None:
+    for event_id in event_ids:
+        db.query(Ticket).filter(Ticket.event_id == event_id).delete(synchronize_session=False)
+        db.query(TicketCounter).filter(TicketCounter.event_id == event_id).delete(synchronize_session=False)
+        db.query(TicketType).filter(TicketType.event_id == event_id).delete(synchronize_session=False)
+        db.query(Event).filter(Event.id == event_id).delete(synchronize_session=False)
+    db.query(Merchant).filter(Merchant.id == merchant_id).delete(synchronize_session=False)
+    db.commit()
+
+
+def main(sizes: list, per_row_max: int):
+    db = SessionLocal()
+    merchant = Merchant(name=f"bulk-benchmark-{int(time.time())}")
+    db.add(merchant)
+    db.commit()
+    merchant_id = merchant.id
+    event_ids = []
+    try:
+        print(f"{'tickets':>8} {'mode':<8} {'seconds':>9} {'tickets/s':>11}")
+        for size in sizes:
+            for name, fn in (("per-row", per_row), ("bulk", bulk)):
+                if name == "per-row" and size > per_row_max:
+                    print(f"{size:>8} {name:<8} {'skipped':>9}")
+                    continue
+                event_id, ticket_type_id = create_event(db, merchant_id)
+                event_ids.append(event_id)
+                start = time.perf_counter()
+                created = fn(db, event_id, ticket_type_id, size)
+                elapsed = time.perf_counter() - start
+                assert created == size
+                assert db.query(Ticket).filter(Ticket.event_id == event_id).count() == size
+                db.expunge_all()
+                print(f"{size:>8} {name:<8} {elapsed:>9.2f} {size / elapsed:>11.0f}")
+    finally:
+        db.rollback()
+        cleanup(db, event_ids, merchant_id)
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-row vs bulk ticket issuance benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--per-row-max", type=int, default=10000)
+    args = parser.parse_args()
+    main(args.sizes, args.per_row_max)
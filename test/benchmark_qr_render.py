@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+QR 圖片繪製效能測試：直接由矩陣輸出（utils.qr_raster）對照原本的 qrcode + PIL 路徑
+
+分別量測：
+- 矩陣建立（qrcode 編碼與遮罩選擇，兩種路徑共用）
+- 只算點陣輸出：PIL 影像建立 + PNG 編碼 / SvgPathFillImage 對照 matrix_to_png / matrix_to_svg
+- 端到端：render_qr_png / render_qr_svg（新）對照舊版 make_image + save
+並以 PIL 解碼新舊 PNG 比對每個像素，確認輸出影像一致。
+
+用法：
+    python test/benchmark_qr_render.py --iterations 200 --box-size 10
+"""
+import os
+import sys
+import time
+import argparse
+from io import BytesIO
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import qrcode
+from qrcode.image.svg import SvgPathFillImage
+from PIL import Image
+
+from utils.auth import create_qr_token
+from utils.qr_code import build_qr_matrix, render_qr_png, render_qr_svg
+from utils.qr_raster import matrix_to_png, matrix_to_svg
+
+
+def _make_qr(data: str, box_size: int, border: int, image_factory=None):
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=border,
+        image_factory=image_factory,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr
+
+
+def pil_png_from_qr(qr) -> bytes:
+    """舊版 PNG 路徑（make 之後的部分）"""
+    buffer = BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def pil_svg_from_qr(qr) -> bytes:
+    """舊版 SVG 路徑（make 之後的部分）"""
+    buffer = BytesIO()
+    qr.make_image(image_factory=SvgPathFillImage).save(buffer)
+    return buffer.getvalue()
+
+
+def legacy_png(data: str, box_size: int, border: int) -> bytes:
+    return pil_png_from_qr(_make_qr(data, box_size, border))
+
+
+def legacy_svg(data: str, box_size: int, border: int) -> bytes:
+    return pil_svg_from_qr(_make_qr(data, box_size, border, SvgPathFillImage))
+
+
+def timed(fn, iterations: int) -> float:
+    """回傳每次呼叫的平均微秒數"""
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def same_pixels(a: bytes, b: bytes) -> bool:
+    image_a = Image.open(BytesIO(a)).convert("L")
+    image_b = Image.open(BytesIO(b)).convert("L")
+    return image_a.size == image_b.size and image_a.tobytes() == image_b.tobytes()
+
+
+def main(iterations: int, box_size: int, border: int) -> int:
+    token = create_qr_token(ticket_uuid=123456789012345678, event_id=42)
+    qr = _make_qr(token, box_size, border)
+    svg_qr = _make_qr(token, box_size, border, SvgPathFillImage)
+    matrix = build_qr_matrix(token, border)
+    modules = len(matrix)
+
+    new_png = matrix_to_png(matrix, box_size)
+    old_png = pil_png_from_qr(qr)
+    identical = same_pixels(new_png, old_png)
+    palette_ok = same_pixels(matrix_to_png(matrix, box_size, (0, 0, 0), (255, 255, 255)), old_png)
+
+    print(f"🔳 {modules}x{modules} 模組（含留白 {border}），box_size {box_size} → "
+          f"{modules * box_size}x{modules * box_size} 像素，{iterations} 次平均")
+    print(f"📦 PNG  PIL {len(old_png):>6} bytes   直接輸出 {len(new_png):>6} bytes")
+    print(f"📦 SVG  PIL {len(pil_svg_from_qr(svg_qr)):>6} bytes   直接輸出 {len(matrix_to_svg(matrix, box_size)):>6} bytes")
+
+    rows = [
+        ("矩陣建立（共用）", timed(lambda: build_qr_matrix(token, border), iterations), None),
+        ("PNG 點陣輸出",
+         timed(lambda: pil_png_from_qr(qr), iterations),
+         timed(lambda: matrix_to_png(matrix, box_size), iterations)),
+        ("SVG 輸出",
+         timed(lambda: pil_svg_from_qr(svg_qr), iterations),
+         timed(lambda: matrix_to_svg(matrix, box_size), iterations)),
+        ("PNG 端到端",
+         timed(lambda: legacy_png(token, box_size, border), iterations),
+         timed(lambda: render_qr_png(token, box_size, border), iterations)),
+        ("SVG 端到端",
+         timed(lambda: legacy_svg(token, box_size, border), iterations),
+         timed(lambda: render_qr_svg(token, box_size, border), iterations)),
+    ]
+    print(f"{'':<16}{'PIL / qrcode':>14}{'直接輸出':>12}{'加速':>8}")
+    for name, old, new in rows:
+        if new is None:
+            print(f"{name:<16}{old:>12.0f}µs")
+        else:
+            print(f"{name:<16}{old:>12.0f}µs{new:>10.0f}µs{old / new:>7.1f}x")
+
+    print(f"{'✅' if identical else '❌'} 灰階 PNG 與 PIL 輸出像素一致")
+    print(f"{'✅' if palette_ok else '❌'} 調色盤 PNG 與 PIL 輸出像素一致")
+    return 0 if identical and palette_ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="QR PNG/SVG rasterizer benchmark (direct vs PIL)")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--box-size", type=int, default=10)
+    parser.add_argument("--border", type=int, default=4)
+    args = parser.parse_args()
+    sys.exit(main(args.iterations, args.box_size, args.border))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+QR token 格式比較：JWT vs 精簡二進位簽章
+
+量測兩種格式的產生 / 驗證耗時，以及以 ERROR_CORRECT_L、fit=True 產生 QR Code
+時所需的 version 與模組數（邊長）。不需要資料庫或伺服器。
+
+用法：
+    python test/benchmark_qr_token.py --iterations 20000
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import qrcode
+
+from utils.auth import create_jwt_qr_token, create_compact_qr_token, decode_qr_token
+from utils.snowflake import generate_snowflake_id
+
+
+def time_per_call(fn, iterations: int) -> float:
+    """回傳每次呼叫的平均微秒數"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def qr_size(data: str) -> tuple:
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.version, qr.modules_count
+
+
+def main(iterations: int):
+    ticket_uuid = generate_snowflake_id()
+    event_id = 123456
+
+    print(f"🔁 每項 {iterations} 次")
+    print(f"{'format':<8} {'chars':>6} {'encode(us)':>11} {'verify(us)':>11} {'qr version':>11} {'modules':>9}")
+    for name, create in (("jwt", create_jwt_qr_token), ("compact", create_compact_qr_token)):
+        token = create(ticket_uuid, event_id)
+        payload = decode_qr_token(token)
+        assert payload["ticket_uuid"] == ticket_uuid and payload["event_id"] == event_id
+
+        encode_us = time_per_call(lambda: create(ticket_uuid, event_id), iterations)
+        verify_us = time_per_call(lambda: decode_qr_token(token), iterations)
+        version, modules = qr_size(token)
+        print(f"{name:<8} {len(token):>6} {encode_us:>11.1f} {verify_us:>11.1f} {version:>11} {modules:>6}x{modules}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="QR token format benchmark")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.iterations)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Snowflake ID 多程序唯一性與效能測試
+
+啟動 --processes 個程序（模擬多個 uvicorn worker / 容器）同時產生 ID，收集全部 ID 後檢查是否重複。
+worker ID 的分配方式：
+- lease:  各程序向資料庫租用 worker ID（SnowflakeWorkerService，應用程式啟動時的做法），需要 DATABASE_URL
+- pid:    未設定 SNOWFLAKE_WORKER_ID 且未租用時的預設（由主機名稱與 PID 推導，可能重複）
+- fixed:  舊版的固定 machine_id=1, datacenter_id=1（所有程序共用同一個 ID 空間）
+
+每個程序以 generate_id 逐一產生一半、generate_many 批次產生另一半，並回報各自的速率。
+任何重複都會以非 0 結束（fixed 模式預期會重複，用於對照）。
+
+用法：
+    DATABASE_URL=postgresql://... python test/benchmark_snowflake_workers.py --processes 8 --ids 200000
+    python test/benchmark_snowflake_workers.py --mode fixed
+"""
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from array import array
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def worker(mode: str, count: int, batch: int, barrier, queue) -> None:
+    from utils.snowflake import SnowflakeIDGenerator, get_snowflake_generator
+    db = None
+    if mode == "lease":
+        from app.database import SessionLocal
+        from services.snowflake_worker_service import SnowflakeWorkerService
+        db = SessionLocal()
+        SnowflakeWorkerService.acquire(db)
+        generator = get_snowflake_generator()
+    elif mode == "fixed":
+        generator = SnowflakeIDGenerator(machine_id=1, datacenter_id=1)
+    else:
+        generator = get_snowflake_generator()
+
+    ids = array("q")
+    barrier.wait()
+    start = time.perf_counter()
+    for _ in range(count // 2):
+        ids.append(generator.generate_id())
+    single_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    remaining = count - count // 2
+    while remaining > 0:
+        ids.extend(generator.generate_many(min(batch, remaining)))
+        remaining -= min(batch, remaining)
+    many_elapsed = time.perf_counter() - start
+
+    if db is not None:
+        SnowflakeWorkerService.release(db)
+        db.close()
+    queue.put((generator.worker_id, single_elapsed, many_elapsed, ids.tobytes()))
+
+
+def main(processes: int, count: int, batch: int, mode: str) -> int:
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(processes)
+    queue = context.Queue()
+    workers = [
+        context.Process(target=worker, args=(mode, count, batch, barrier, queue))
+        for _ in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    results = [queue.get() for _ in workers]
+    for process in workers:
+        process.join()
+
+    all_ids = array("q")
+    single_rates, many_rates = [], []
+    for _, single_elapsed, many_elapsed, data in results:
+        ids = array("q")
+        ids.frombytes(data)
+        all_ids.extend(ids)
+        single_rates.append((count // 2) / single_elapsed)
+        many_rates.append((count - count // 2) / many_elapsed)
+
+    worker_ids = sorted(result[0] for result in results)
+    duplicates = len(all_ids) - len(set(all_ids))
+    print(f"⚙️  模式 {mode}，程序 {processes}，每程序 {count} 個 ID（generate_many 每次 {batch} 個）")
+    print(f"🆔 worker ID: {worker_ids}")
+    print(f"🚀 generate_id   平均 {sum(single_rates) / len(single_rates):>12,.0f} ID/s（每程序）")
+    print(f"🚀 generate_many 平均 {sum(many_rates) / len(many_rates):>12,.0f} ID/s（每程序）")
+    print(f"{'✅' if duplicates == 0 else '❌'} 共 {len(all_ids):,} 個 ID，重複 {duplicates:,} 個")
+    return 0 if duplicates == 0 else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-process Snowflake ID uniqueness benchmark")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--ids", type=int, default=200000, help="每個程序產生的 ID 數")
+    parser.add_argument("--batch", type=int, default=5000, help="generate_many 每次產生的 ID 數")
+    parser.add_argument("--mode", choices=("lease", "pid", "fixed"), default="lease")
+    args = parser.parse_args()
+    sys.exit(main(args.processes, args.ids, args.batch, args.mode))
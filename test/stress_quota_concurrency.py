@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+票券配額併發壓力測試：驗證 32 個並行發行者不會超賣
+
+建立兩個活動：
+- 目標活動：總配額 --event-quota，其中一個票種配額 --type-quota，另一個票種只受活動總配額限制
+- 對照活動：不限配額，與目標活動同時發行，確認不同活動之間不會互相排隊
+
+每個發行者（執行緒，各自一個 Session）在同一時間開始，輪流以單張 / 批次發行直到收到配額不足。
+結束後比對成功發行的張數、tickets 實際筆數、ticket_counters 與配額，任何超賣都會以非 0 結束。
+需要可連線的 DATABASE_URL（會建立測試資料，結束後刪除）。
+
+用法：
+    DATABASE_URL=postgresql://... python test/stress_quota_concurrency.py --writers 32
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import func
+
+from app.config import settings
+from app.database import SessionLocal
+from models import Merchant, Event, TicketType, Ticket, TicketCounter
+from schemas.ticket import TicketCreate, BatchTicketCreate
+from services.ticket_service import TicketService
+
+
+def setup(event_quota: int, type_quota: int) -> dict:
+    db = SessionLocal()
+    try:
+        merchant = Merchant(name=f"quota-stress-{int(time.time())}")
+        db.add(merchant)
+        db.flush()
+        now = datetime.utcnow()
+        target = Event(merchant_id=merchant.id, name="quota-stress", total_quota=event_quota,
+                       start_time=now + timedelta(days=1), end_time=now + timedelta(days=2))
+        control = Event(merchant_id=merchant.id, name="quota-stress-control", total_quota=None,
+                        start_time=now + timedelta(days=1), end_time=now + timedelta(days=2))
+        db.add_all([target, control])
+        db.flush()
+        limited = TicketType(event_id=target.id, name="limited", quota=type_quota)
+        open_type = TicketType(event_id=target.id, name="open", quota=0)
+        control_type = TicketType(event_id=control.id, name="control", quota=0)
+        db.add_all([limited, open_type, control_type])
+        db.commit()
+        return {
+            "merchant_id": merchant.id,
+            "target": target.id,
+            "control": control.id,
+            "limited": limited.id,
+            "open": open_type.id,
+            "control_type": control_type.id,
+        }
+    finally:
+        db.close()
+
+
+def teardown(ids: dict) -> None:
+    db = SessionLocal()
+    try:
+        for event_id in (ids["target"], ids["control"]):
+            db.query(Ticket).filter(Ticket.event_id == event_id).delete(synchronize_session=False)
+            db.query(TicketCounter).filter(TicketCounter.event_id == event_id).delete(synchronize_session=False)
+            db.query(TicketType).filter(TicketType.event_id == event_id).delete(synchronize_session=False)
+            db.query(Event).filter(Event.id == event_id).delete(synchronize_session=False)
+        db.query(Merchant).filter(Merchant.id == ids["merchant_id"]).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def writer(ids: dict, barrier: threading.Barrier, max_batch: int, issued: Counter, errors: list, lock: threading.Lock):
+    rng = random.Random()
+    db = SessionLocal()
+    local = Counter()
+    exhausted = set()
+    try:
+        barrier.wait()
+        while len(exhausted) < 2:
+            ticket_type_id = rng.choice([t for t in (ids["limited"], ids["open"]) if t not in exhausted])
+            count = rng.randint(1, max_batch)
+            try:
+                if count == 1:
+                    TicketService.create_ticket_with_merchant(
+                        db, TicketCreate(event_id=ids["target"], ticket_type_id=ticket_type_id, holder_name="stress"),
+                        ids["merchant_id"]
+                    )
+                else:
+                    TicketService.create_batch_tickets_with_merchant(
+                        db, BatchTicketCreate(event_id=ids["target"], ticket_type_id=ticket_type_id, count=count),
+                        ids["merchant_id"]
+                    )
+                local[ticket_type_id] += count
+            except ValueError as e:
+                if "quota exceeded" not in str(e):
+                    raise
+                # 配額不足時改以單張再試，直到確定該票種（或整個活動）已滿
+                if count == 1:
+                    exhausted.add(ticket_type_id)
+                    if str(e).startswith("Event total"):
+                        exhausted.update((ids["limited"], ids["open"]))
+            # 對照活動（不限配額）與目標活動交錯發行
+            TicketService.create_ticket_with_merchant(
+                db, TicketCreate(event_id=ids["control"], ticket_type_id=ids["control_type"], holder_name="control"),
+                ids["merchant_id"]
+            )
+            local["control"] += 1
+    except Exception as e:
+        errors.append(repr(e))
+    finally:
+        db.close()
+        with lock:
+            issued.update(local)
+
+
+def main(writers: int, event_quota: int, type_quota: int, max_batch: int) -> int:
+    if settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW < writers:
+        print(f"⚠️ 連線池 ({settings.DB_POOL_SIZE}+{settings.DB_MAX_OVERFLOW}) 小於發行者數量，部分發行者會等待連線")
+
+    ids = setup(event_quota, type_quota)
+    issued: Counter = Counter()
+    errors: list = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(writers)
+    threads = [
+        threading.Thread(target=writer, args=(ids, barrier, max_batch, issued, errors, lock))
+        for _ in range(writers)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    db = SessionLocal()
+    try:
+        def ticket_count(**filters):
+            return db.query(func.count(Ticket.id)).filter_by(**filters).scalar()
+
+        def counter_issued(event_id, ticket_type_id):
+            return db.query(func.coalesce(func.sum(TicketCounter.issued), 0)).filter(
+                TicketCounter.event_id == event_id, TicketCounter.ticket_type_id == ticket_type_id
+            ).scalar()
+
+        actual_total = ticket_count(event_id=ids["target"])
+        actual_limited = ticket_count(ticket_type_id=ids["limited"])
+        actual_open = ticket_count(ticket_type_id=ids["open"])
+        actual_control = ticket_count(event_id=ids["control"])
+        checks = [
+            ("活動總數 <= 總配額", actual_total <= event_quota),
+            ("活動總數 == 總配額（配額用盡）", actual_total == event_quota),
+            ("限額票種 <= 票種配額", actual_limited <= type_quota),
+            ("成功發行張數 == tickets 筆數", issued[ids["limited"]] + issued[ids["open"]] == actual_total),
+            ("限額票種成功張數 == tickets 筆數", issued[ids["limited"]] == actual_limited),
+            ("對照活動成功張數 == tickets 筆數", issued["control"] == actual_control),
+            ("計數器（活動總計）== tickets 筆數", counter_issued(ids["target"], 0) == actual_total),
+            ("計數器（限額票種）== tickets 筆數", counter_issued(ids["target"], ids["limited"]) == actual_limited),
+            ("計數器（不限票種）== tickets 筆數", counter_issued(ids["target"], ids["open"]) == actual_open),
+            ("沒有非預期錯誤", not errors),
+        ]
+    finally:
+        db.close()
+        teardown(ids)
+
+    print(f"👥 發行者 {writers}，總配額 {event_quota}，限額票種配額 {type_quota}，批次上限 {max_batch}，耗時 {elapsed:.2f}s")
+    print(f"🎫 目標活動 {actual_total}（限額 {actual_limited} / 不限 {actual_open}），對照活動 {actual_control}")
+    for error in errors[:5]:
+        print(f"   {error}")
+    for name, passed in checks:
+        print(f"{'✅' if passed else '❌'} {name}")
+    return 0 if all(passed for _, passed in checks) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent ticket issuance oversell stress test")
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--event-quota", type=int, default=500)
+    parser.add_argument("--type-quota", type=int, default=200)
+    parser.add_argument("--max-batch", type=int, default=5)
+    args = parser.parse_args()
+    sys.exit(main(args.writers, args.event_quota, args.type_quota, args.max_batch))
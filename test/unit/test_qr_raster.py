@@ -0,0 +1,103 @@
+"""
+直接由 QR 矩陣輸出的 PNG / SVG（utils.qr_raster），與 qrcode + PIL 的輸出逐像素比對
+"""
+import re
+from io import BytesIO
+import pytest
+import qrcode
+from utils.auth import create_compact_qr_token, create_jwt_qr_token
+from utils.qr_code import build_qr_matrix, render_qr_png, render_qr_svg
+from utils.qr_raster import matrix_to_png, matrix_to_svg, matrix_to_svg_path
+
+Image = pytest.importorskip("PIL.Image")
+
+_EXPIRE = 1_900_000_000
+# 不同長度的資料得到不同的 QR 版本（模組數 21 / 25 / 33 ...，多數不是 8 的倍數）
+_PAYLOADS = [
+    "A",
+    create_compact_qr_token(766927864107892739, 46, _EXPIRE),
+    create_jwt_qr_token(766927864107892739, 46, _EXPIRE),
+    "https://example.com/member-ticket?member_token=" + "x" * 120,
+]
+
+
+def _pil_image(data: str, box_size: int, border: int, **colors):
+    qr = qrcode.QRCode(
+        version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=box_size, border=border
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.make_image(**(colors or {"fill_color": "black", "back_color": "white"})).get_image()
+
+
+def _decode(png: bytes, mode: str):
+    image = Image.open(BytesIO(png))
+    image.load()
+    return image.convert(mode)
+
+
+@pytest.mark.parametrize("data", _PAYLOADS)
+@pytest.mark.parametrize("box_size, border", [(1, 0), (3, 1), (10, 4), (7, 2)])
+def test_grayscale_png_matches_pil(data, box_size, border):
+    png = matrix_to_png(build_qr_matrix(data, border), box_size)
+    ours = _decode(png, "L")
+    expected = _pil_image(data, box_size, border).convert("L")
+    assert ours.size == expected.size
+    assert ours.tobytes() == expected.tobytes()
+
+
+@pytest.mark.parametrize("data", _PAYLOADS[:2])
+def test_palette_png_matches_pil(data):
+    fill, back = (20, 40, 160), (250, 240, 200)
+    png = matrix_to_png(build_qr_matrix(data, 4), 5, fill_color=fill, back_color=back)
+    ours = _decode(png, "RGB")
+    assert Image.open(BytesIO(png)).mode == "P"
+    expected = _pil_image(data, 5, 4, fill_color=fill, back_color=back).convert("RGB")
+    assert ours.tobytes() == expected.tobytes()
+
+
+def test_png_is_one_bit_and_compact():
+    png = render_qr_png(_PAYLOADS[1])
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
+    image = Image.open(BytesIO(png))
+    assert image.mode == "1"
+    modules = len(build_qr_matrix(_PAYLOADS[1]))
+    assert image.size == (modules * 10, modules * 10)
+
+
+@pytest.mark.parametrize("level", [0, 1, 9])
+def test_compress_level_does_not_change_pixels(level):
+    matrix = build_qr_matrix(_PAYLOADS[1])
+    default = _decode(matrix_to_png(matrix, 4), "L").tobytes()
+    assert _decode(matrix_to_png(matrix, 4, compress_level=level), "L").tobytes() == default
+
+
+def _matrix_from_path(path: str, modules: int):
+    grid = [[False] * modules for _ in range(modules)]
+    for x, y, length, back in re.findall(r"M(\d+) (\d+)h(\d+)v1h(-\d+)z", path):
+        x, y, length = int(x), int(y), int(length)
+        assert int(back) == -length
+        for column in range(x, x + length):
+            assert not grid[y][column], "overlapping sub-paths"
+            grid[y][column] = True
+    return grid
+
+
+@pytest.mark.parametrize("data", _PAYLOADS)
+def test_svg_path_covers_exactly_the_dark_modules(data):
+    matrix = build_qr_matrix(data, 4)
+    path = matrix_to_svg_path(matrix)
+    assert re.fullmatch(r"(M\d+ \d+h\d+v1h-\d+z)*", path)
+    assert _matrix_from_path(path, len(matrix)) == [list(row) for row in matrix]
+
+
+def test_svg_document():
+    matrix = build_qr_matrix(_PAYLOADS[1], 4)
+    modules = len(matrix)
+    svg = render_qr_svg(_PAYLOADS[1], 10).decode()
+    assert svg.startswith('<svg xmlns="http://www.w3.org/2000/svg"')
+    assert f'width="{modules * 10}" height="{modules * 10}"' in svg
+    assert f'viewBox="0 0 {modules} {modules}"' in svg
+    assert matrix_to_svg(matrix, 10).decode() == svg
+    colored = matrix_to_svg(matrix, 10, fill_color="#123456", back_color="#abcdef").decode()
+    assert 'fill="#123456"' in colored and 'fill="#abcdef"' in colored
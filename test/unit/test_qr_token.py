@@ -0,0 +1,118 @@
+"""
+精簡二進位 QR token（>BQII + 截斷 HMAC）與 QR token 時間窗
+"""
+import hmac
+import time
+import base64
+import hashlib
+import pytest
+from fastapi import HTTPException
+from app.config import settings
+from utils import auth
+
+
+def _future(seconds: int = 3600) -> int:
+    return int(time.time()) + seconds
+
+
+def _token_bytes(token: str) -> bytearray:
+    return bytearray(base64.b32decode(token))
+
+
+def _token_str(raw: bytes) -> str:
+    return base64.b32encode(bytes(raw)).decode("ascii")
+
+
+@pytest.mark.parametrize("ticket_uuid, event_id", [(0, 0), (1, 1), (766927864107892739, 46), (2 ** 64 - 1, 2 ** 32 - 1)])
+def test_compact_round_trip(ticket_uuid, event_id):
+    expire = _future()
+    token = auth.create_compact_qr_token(ticket_uuid, event_id, expire)
+    assert auth.decode_qr_token(token) == {
+        "ticket_uuid": ticket_uuid, "event_id": event_id, "exp": expire, "type": "qr_token"
+    }
+
+
+def test_compact_token_is_qr_alphanumeric():
+    token = auth.create_compact_qr_token(766927864107892739, 46, _future())
+    # 25 bytes -> 40 個 base32 字元，無 padding，全部屬於 QR 英數模式字元集
+    assert len(token) == 40
+    assert set(token) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZ234567")
+    assert "." not in token
+
+
+def test_decode_accepts_lowercase_and_whitespace():
+    token = auth.create_compact_qr_token(42, 7, _future())
+    assert auth.decode_qr_token(f" {token.lower()}\n")["ticket_uuid"] == 42
+
+
+@pytest.mark.parametrize("position", [0, 1, 9, 13, 16, 17, 24])
+def test_tampered_byte_is_rejected(position):
+    raw = _token_bytes(auth.create_compact_qr_token(42, 7, _future()))
+    raw[position] ^= 0x01
+    with pytest.raises(HTTPException) as excinfo:
+        auth.decode_qr_token(_token_str(raw))
+    assert excinfo.value.status_code == 401
+
+
+def test_expired_token_is_rejected():
+    token = auth.create_compact_qr_token(42, 7, int(time.time()) - 1)
+    with pytest.raises(HTTPException):
+        auth.decode_qr_token(token)
+
+
+@pytest.mark.parametrize("token", ["", "AAAA", "not base32!", "A" * 40, "A" * 48])
+def test_malformed_tokens_are_rejected(token):
+    with pytest.raises(HTTPException):
+        auth.decode_qr_token(token)
+
+
+def test_other_version_is_rejected():
+    raw = _token_bytes(auth.create_compact_qr_token(42, 7, _future()))
+    body = bytes([auth.QR_TOKEN_VERSION + 1]) + bytes(raw[1:auth._QR_TOKEN_BODY.size])
+    mac = hmac.new(auth._QR_TOKEN_KEY, body, hashlib.sha256).digest()[:auth._QR_TOKEN_MAC_SIZE]
+    with pytest.raises(HTTPException):
+        auth.decode_qr_token(_token_str(body + mac))
+
+
+def test_jwt_tokens_still_decode():
+    expire = _future()
+    token = auth.create_jwt_qr_token(42, 7, expire)
+    payload = auth.decode_qr_token(token)
+    assert (payload["ticket_uuid"], payload["event_id"], payload["exp"]) == (42, 7, expire)
+
+
+def test_access_token_is_not_a_qr_token():
+    with pytest.raises(HTTPException):
+        auth.decode_qr_token(auth.create_access_token({"sub": "1", "type": "staff"}))
+
+
+def test_window_is_deterministic():
+    now = 1_800_000_123.75
+    start, end = auth.qr_token_window(now)
+    assert auth.qr_token_window(now) == (start, end)
+    assert start <= now < end
+    assert start % (end - start) == 0
+    # 同一時間窗內任一時間點都得到相同的時間窗，下一個時間窗緊接在後
+    assert auth.qr_token_window(start) == (start, end)
+    assert auth.qr_token_window(end - 0.001) == (start, end)
+    assert auth.qr_token_window(end)[0] == end
+
+
+def test_window_never_exceeds_half_the_lifetime(monkeypatch):
+    monkeypatch.setattr(settings, "QR_TOKEN_WINDOW_SECONDS", 10 * 3600)
+    monkeypatch.setattr(settings, "QR_TOKEN_EXPIRE_HOURS", 2)
+    start, end = auth.qr_token_window(1_800_000_000)
+    assert end - start == 3600
+
+
+def test_tokens_are_stable_within_a_window(monkeypatch):
+    monkeypatch.setattr(settings, "QR_TOKEN_FORMAT", "compact")
+    clock = [1_800_000_000.0]
+    monkeypatch.setattr(auth.time, "time", lambda: clock[0])
+    start, end = auth.qr_token_window()
+    first = auth.create_qr_token(42, 7)
+    clock[0] = end - 1
+    assert auth.create_qr_token(42, 7) == first
+    clock[0] = end
+    assert auth.create_qr_token(42, 7) != first
+    assert auth.qr_token_expire() == end + settings.QR_TOKEN_EXPIRE_HOURS * 3600
@@ -0,0 +1,120 @@
+"""
+速率限制：政策解析與本機 GCRA 桶（services.rate_limit_service）
+"""
+import asyncio
+import pytest
+from app.config import settings
+from services import rate_limit_service
+from services.rate_limit_service import RateLimitPolicy, RateLimitService, _MemoryBuckets
+
+
+def _policy(limit: int = 5, period: float = 10.0) -> RateLimitPolicy:
+    return RateLimitPolicy("public", "ip", limit, period)
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("ip:600/60", ("ip", 600, 60.0, 0.1)),
+    (" Merchant : 10 / 1 ", ("merchant", 10, 1.0, 0.1)),
+    ("staff:3/1.5", ("staff", 3, 1.5, 0.5)),
+])
+def test_parse(spec, expected):
+    policy = RateLimitPolicy.parse("public", spec)
+    assert (policy.key_type, policy.limit, policy.period, policy.interval) == expected
+
+
+@pytest.mark.parametrize("spec", ["", "   "])
+def test_parse_empty_means_unlimited(spec):
+    assert RateLimitPolicy.parse("public", spec) is None
+
+
+@pytest.mark.parametrize("spec", ["ip", "ip:10", "ip:x/60", "ip:10/0", "ip:0/60", "ip:-1/60", "user:10/60", "10/60"])
+def test_parse_rejects_invalid_specs(spec):
+    with pytest.raises(ValueError):
+        RateLimitPolicy.parse("public", spec)
+
+
+def test_burst_up_to_limit_then_reject():
+    buckets, policy = _MemoryBuckets(100), _policy(5, 10.0)
+    now = 1000.0
+    assert [buckets.hit("a", policy, now) for _ in range(5)] == [0.0] * 5
+    # 第 6 個請求需等待一個補充間隔（10 / 5 = 2 秒）
+    assert buckets.hit("a", policy, now) == pytest.approx(2.0)
+
+
+def test_rejected_requests_do_not_consume_quota():
+    buckets, policy = _MemoryBuckets(100), _policy(5, 10.0)
+    now = 1000.0
+    for _ in range(5):
+        buckets.hit("a", policy, now)
+    for _ in range(50):
+        assert buckets.hit("a", policy, now) > 0
+    assert buckets.hit("a", policy, now + 2.0) == 0.0
+
+
+def test_refill_one_token_per_interval():
+    buckets, policy = _MemoryBuckets(100), _policy(5, 10.0)
+    now = 1000.0
+    for _ in range(5):
+        buckets.hit("a", policy, now)
+    assert buckets.hit("a", policy, now + 1.0) == pytest.approx(1.0)
+    assert buckets.hit("a", policy, now + 2.0) == 0.0
+    assert buckets.hit("a", policy, now + 2.0) > 0
+    # 閒置整個週期後恢復完整的突發額度，但不會累積超過上限
+    later = now + 100.0
+    assert [buckets.hit("a", policy, later) for _ in range(5)] == [0.0] * 5
+    assert buckets.hit("a", policy, later) > 0
+
+
+def test_steady_rate_is_allowed():
+    buckets, policy = _MemoryBuckets(100), _policy(5, 10.0)
+    now = 1000.0
+    for step in range(100):
+        assert buckets.hit("a", policy, now + step * policy.interval) == 0.0
+
+
+def test_keys_are_independent():
+    buckets, policy = _MemoryBuckets(100), _policy(1, 60.0)
+    assert buckets.hit("a", policy, 1000.0) == 0.0
+    assert buckets.hit("a", policy, 1000.0) > 0
+    assert buckets.hit("b", policy, 1000.0) == 0.0
+
+
+def test_prune_drops_full_buckets_first():
+    buckets, policy = _MemoryBuckets(10), _policy(1, 1.0)
+    for key in range(10):
+        buckets.hit(f"idle-{key}", policy, 1000.0)
+    # 1000 秒後閒置鍵的桶都已補滿，超過上限時全部清除，只留下新的鍵
+    buckets.hit("new", policy, 2000.0)
+    assert len(buckets) == 1
+
+
+def test_prune_evicts_least_recently_used_keys():
+    buckets, policy = _MemoryBuckets(10), _policy(1, 3600.0)
+    for key in range(11):
+        buckets.hit(f"k{key}", policy, 1000.0)
+    assert len(buckets) == 9
+    # 最久未使用的鍵被淘汰，額度重置；最近使用的鍵仍受限制
+    assert buckets.hit("k0", policy, 1000.0) == 0.0
+    assert buckets.hit("k10", policy, 1000.0) > 0
+
+
+def test_service_memory_backend(monkeypatch):
+    policy = _policy(2, 60.0)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BACKEND", "memory")
+    monkeypatch.setitem(rate_limit_service._policies, "public", policy)
+    monkeypatch.setitem(rate_limit_service._buckets, "public", _MemoryBuckets(100))
+
+    async def hits():
+        return [await RateLimitService.hit("public", "203.0.113.7") for _ in range(3)]
+
+    allowed_1, allowed_2, rejected = asyncio.run(hits())
+    assert allowed_1 == allowed_2 == 0.0
+    assert rejected == pytest.approx(30.0, abs=1.0)
+    assert RateLimitService.get_policy("public") is policy
+    assert RateLimitService.stats()["public"] == 1
+
+
+def test_disabled_has_no_policy(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    assert all(RateLimitService.get_policy(group) is None for group in rate_limit_service.RATE_LIMIT_GROUPS)
@@ -0,0 +1,44 @@
+"""
+掃描 session token：payload 驗證與依撤銷時間判斷失效
+"""
+import time
+import pytest
+from utils.scan_session import (
+    create_scan_session_token, decode_scan_session_token, decode_scan_session_payload, is_scan_session_revoked
+)
+
+
+def test_round_trip():
+    before = time.time()
+    token, _ = create_scan_session_token(7, 46, True, False)
+    session = decode_scan_session_token(token)
+    assert (session["staff_id"], session["event_id"], session["can_checkin"], session["can_revoke"]) == (7, 46, True, False)
+    assert before - 0.001 <= session["issued_at"] <= time.time() + 0.001
+
+
+@pytest.mark.parametrize("payload", [
+    {"type": "staff", "sub": "7", "event_id": 46, "iat": 1.0},
+    {"type": "scan_session", "event_id": 46, "iat": 1.0},
+    {"type": "scan_session", "sub": "7", "iat": 1.0},
+    {"type": "scan_session", "sub": "x", "event_id": 46, "iat": 1.0},
+])
+def test_invalid_payloads(payload):
+    assert decode_scan_session_payload(payload) is None
+
+
+def test_tampered_token_is_rejected():
+    token, _ = create_scan_session_token(7, 46, True, False)
+    assert decode_scan_session_token(token[:-2] + ("A" if token[-2] != "A" else "B") + token[-1]) is None
+
+
+@pytest.mark.parametrize("state, revoked", [
+    ({"valid_after": None, "events": {46: None}}, False),
+    ({"valid_after": None, "events": {}}, True),  # 員工停用 / 刪除，或權限已移除
+    ({"valid_after": None, "events": {47: None}}, True),
+    ({"valid_after": 1000.0, "events": {46: None}}, True),
+    ({"valid_after": 999.0, "events": {46: None}}, False),
+    ({"valid_after": None, "events": {46: 1000.0}}, True),
+    ({"valid_after": 500.0, "events": {46: 999.5}}, False),
+])
+def test_revocation(state, revoked):
+    assert is_scan_session_revoked(state, 46, 1000.0) is revoked
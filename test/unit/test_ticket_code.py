@@ -0,0 +1,117 @@
+"""
+由 Snowflake uuid 推導的票券代碼（Feistel 置換、Crockford base32、Luhn mod 32 檢查碼）
+"""
+import itertools
+import random
+import pytest
+from utils.ticket_code import (
+    TICKET_CODE_ALPHABET, TICKET_CODE_LENGTH, generate_ticket_code, normalize_ticket_code, ticket_uuid_from_code
+)
+from utils.snowflake import generate_snowflake_ids
+
+_rng = random.Random(16)
+_SAMPLE_UUIDS = [0, 1, 2, 31, 32, 2 ** 32 - 1, 2 ** 32, 2 ** 63 - 1, 2 ** 64 - 1] + \
+    [_rng.getrandbits(63) for _ in range(2000)]
+
+
+@pytest.mark.parametrize("ticket_uuid", _SAMPLE_UUIDS[:9])
+def test_edge_values_round_trip(ticket_uuid):
+    code = generate_ticket_code(ticket_uuid)
+    assert len(code) == TICKET_CODE_LENGTH
+    assert set(code) <= set(TICKET_CODE_ALPHABET)
+    assert ticket_uuid_from_code(code) == ticket_uuid
+
+
+def test_round_trip():
+    for ticket_uuid in _SAMPLE_UUIDS:
+        code = generate_ticket_code(ticket_uuid)
+        assert normalize_ticket_code(code) == code
+        assert ticket_uuid_from_code(code) == ticket_uuid
+
+
+def test_snowflake_ids_round_trip():
+    for ticket_uuid in generate_snowflake_ids(1000):
+        assert ticket_uuid_from_code(generate_ticket_code(ticket_uuid)) == ticket_uuid
+
+
+def test_no_collisions_over_consecutive_ids():
+    # 連續的 uuid（同一毫秒內的序號）與打散後的範圍都不應產生重複代碼
+    start = 7_000_000_000_000_000_000
+    uuids = list(range(start, start + 50_000)) + _SAMPLE_UUIDS
+    codes = {generate_ticket_code(ticket_uuid) for ticket_uuid in uuids}
+    assert len(codes) == len(set(uuids))
+
+
+def test_consecutive_ids_do_not_share_prefix():
+    # 置換後相鄰的 uuid 不會只差最後幾個字元
+    first, second = generate_ticket_code(10 ** 18), generate_ticket_code(10 ** 18 + 1)
+    assert first[:6] != second[:6]
+
+
+def test_input_normalization():
+    code = generate_ticket_code(123456789)
+    spaced = " ".join([code[:4], code[4:9], code[9:]]).lower()
+    assert normalize_ticket_code(spaced) == code
+    assert normalize_ticket_code(f"{code[:7]}-{code[7:]}") == code
+    # Crockford：O / I / L 視為 0 / 1 / 1
+    confusable = code.replace("0", "O").replace("1", "I")
+    assert normalize_ticket_code(confusable) == code
+
+
+def test_single_character_errors_are_rejected():
+    for ticket_uuid in _SAMPLE_UUIDS[:200]:
+        code = generate_ticket_code(ticket_uuid)
+        for position in range(TICKET_CODE_LENGTH):
+            for char in TICKET_CODE_ALPHABET:
+                if char == code[position]:
+                    continue
+                typo = code[:position] + char + code[position + 1:]
+                assert normalize_ticket_code(typo) is None, (code, typo)
+                assert ticket_uuid_from_code(typo) is None
+
+
+def test_adjacent_transpositions_are_rejected():
+    # Luhn mod N 唯一無法偵測的相鄰對調是值 0 與 N-1（"0" / "Z"）
+    undetectable = {"0", "Z"}
+    data = "0123456789ABC"
+    for position in range(len(data) - 1):
+        for first, second in itertools.permutations(TICKET_CODE_ALPHABET, 2):
+            if {first, second} == undetectable:
+                continue
+            chars = list(data)
+            chars[position], chars[position + 1] = first, second
+            code = _with_check("".join(chars))
+            swapped = list(code)
+            swapped[position], swapped[position + 1] = swapped[position + 1], swapped[position]
+            assert normalize_ticket_code("".join(swapped)) is None, (code, position)
+
+
+def test_transpositions_in_generated_codes_are_rejected():
+    for ticket_uuid in _SAMPLE_UUIDS[:500]:
+        code = generate_ticket_code(ticket_uuid)
+        for position in range(TICKET_CODE_LENGTH - 1):
+            if code[position] == code[position + 1] or {code[position], code[position + 1]} == {"0", "Z"}:
+                continue
+            swapped = code[:position] + code[position + 1] + code[position] + code[position + 2:]
+            assert normalize_ticket_code(swapped) is None, (code, swapped)
+
+
+@pytest.mark.parametrize("legacy", ["A1B2C3D4", "ABCDEF123456", "ab12-cd34", "abcd efgh ijkl"])
+def test_legacy_codes_pass_through(legacy):
+    normalized = "".join(legacy.split()).replace("-", "").upper()
+    assert normalize_ticket_code(legacy) == normalized
+    assert ticket_uuid_from_code(legacy) is None
+
+
+@pytest.mark.parametrize("invalid", ["", "ABC", "0123456789ABCDE", "0123456789AB*D", "0123456789ABU0"])
+def test_invalid_lengths_and_characters_are_rejected(invalid):
+    assert normalize_ticket_code(invalid) is None
+    assert ticket_uuid_from_code(invalid) is None
+
+
+def _with_check(data: str) -> str:
+    """補上唯一能通過驗證的檢查碼"""
+    for char in TICKET_CODE_ALPHABET:
+        if normalize_ticket_code(data + char) is not None:
+            return data + char
+    raise AssertionError("no valid check character")
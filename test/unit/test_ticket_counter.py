@@ -0,0 +1,12 @@
+"""
+票券計數器的 shard 分配：簽到 / 撤銷不寫入配額預留使用的 shard 0
+"""
+import pytest
+from app.config import settings
+from services import ticket_counter_service
+
+
+@pytest.mark.parametrize("shards, expected", [(0, {1}), (1, {1}), (2, {1}), (8, set(range(1, 8)))])
+def test_checkin_shards_exclude_shard_zero(monkeypatch, shards, expected):
+    monkeypatch.setattr(settings, "TICKET_COUNTER_SHARDS", shards)
+    assert {ticket_counter_service._random_shard() for _ in range(2000)} == expected
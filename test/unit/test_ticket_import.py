@@ -0,0 +1,64 @@
+"""
+票券匯入的逐列解析與驗證（不需要資料庫）
+"""
+import io
+import pytest
+from pydantic import ValidationError
+from schemas.ticket import TicketImportRow
+from services.ticket_import_service import TicketImportService, ImportFormat
+
+
+def _validate_file(content: str, file_format: str, default_ticket_type_id=None, ticket_type_ids=(1, 2)):
+    results = []
+    for row_number, record, error in TicketImportService.iter_records(io.BytesIO(content.encode()), file_format):
+        assert error is None, (row_number, error)
+        row, errors = TicketImportService._validate(record, default_ticket_type_id, set(ticket_type_ids))
+        results.append((row_number, row, errors))
+    return results
+
+
+def test_blank_ticket_type_id_is_none():
+    assert TicketImportRow(holder_name="a", ticket_type_id="").ticket_type_id is None
+    assert TicketImportRow(holder_name="a", ticket_type_id="  ").ticket_type_id is None
+    assert TicketImportRow(holder_name="a", ticket_type_id=" 2 ").ticket_type_id == 2
+
+
+def test_invalid_ticket_type_id_is_rejected():
+    with pytest.raises(ValidationError):
+        TicketImportRow(holder_name="a", ticket_type_id="vip")
+
+
+def test_csv_with_mixed_ticket_type_column():
+    content = (
+        "holder_name,holder_email,ticket_type_id\n"
+        "王大明,ming@test.com,2\n"
+        "李小華,,\n"
+        "陳美玲,mei@test.com, \n"
+    )
+    results = _validate_file(content, ImportFormat.CSV, default_ticket_type_id=1)
+    assert [errors for _, _, errors in results] == [[], [], []]
+    assert [row.ticket_type_id for _, row, _ in results] == [2, 1, 1]
+    assert results[1][1].holder_email is None
+
+
+def test_csv_with_mixed_ticket_type_column_without_default():
+    content = "holder_name,ticket_type_id\na,1\nb,\n"
+    results = _validate_file(content, ImportFormat.CSV)
+    assert [row.ticket_type_id for _, row, _ in results] == [1, None]
+
+
+def test_jsonl_null_and_blank_ticket_type_id():
+    content = (
+        '{"holder_name": "a", "ticket_type_id": 2}\n'
+        '{"holder_name": "b", "ticket_type_id": null}\n'
+        '{"holder_name": "c", "ticket_type_id": ""}\n'
+    )
+    results = _validate_file(content, ImportFormat.JSONL, default_ticket_type_id=1)
+    assert [row.ticket_type_id for _, row, _ in results] == [2, 1, 1]
+
+
+def test_ticket_type_of_other_event_is_reported():
+    results = _validate_file("holder_name,ticket_type_id\na,9\n", ImportFormat.CSV, ticket_type_ids=(1,))
+    (_, row, errors), = results
+    assert row is None
+    assert errors == ["ticket_type_id: ticket type 9 does not belong to the event"]
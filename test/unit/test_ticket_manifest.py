@@ -0,0 +1,138 @@
+"""
+離線票券清單（manifest）的二進位格式：產生 → 解析的往返與簽章驗證
+"""
+import random
+import pytest
+from sqlalchemy.dialects import postgresql
+from services import ticket_manifest_service
+from services.ticket_manifest_service import TicketManifestService, MANIFEST_VERSION
+
+
+class _Result:
+    """模擬 yield_per 的查詢結果：partitions() 依批次大小分段回傳資料列"""
+
+    def __init__(self, rows, size):
+        self._rows = rows
+        self._size = size
+
+    def partitions(self):
+        for start in range(0, len(self._rows), self._size):
+            yield self._rows[start:start + self._size]
+
+
+class _Session:
+    def __init__(self, rows, size=ticket_manifest_service._STREAM_CHUNK_ROWS):
+        self.rows = rows
+        self.size = size
+        self.statements = []
+
+    def execute(self, stmt):
+        self.statements.append(stmt)
+        return _Result(self.rows, self.size)
+
+
+def _tickets(count: int, seed: int = 8):
+    rng = random.Random(seed)
+    uuids = sorted(rng.sample(range(1, 2 ** 63), count))
+    return [(ticket_uuid, index + 1, rng.random() < 0.3) for index, ticket_uuid in enumerate(uuids)]
+
+
+def _build(rows, event_id=46, cursor=1_792_309_051_603_032, since=None, size=None):
+    db = _Session(rows) if size is None else _Session(rows, size)
+    data = b"".join(TicketManifestService.iter_manifest(db, event_id, len(rows), cursor, since))
+    return data, db
+
+
+@pytest.mark.parametrize("count", [0, 1, 7, 8, 9, 2001, 4100])
+def test_round_trip(count):
+    rows = _tickets(count)
+    data, _ = _build(rows)
+    manifest = TicketManifestService.parse_manifest(data)
+    assert manifest["event_id"] == 46
+    assert manifest["total"] == count
+    assert manifest["delta"] is False
+    assert manifest["since"] == 0
+    assert manifest["cursor"] == 1_792_309_051_603_032
+    assert manifest["tickets"] == rows
+
+
+def test_round_trip_with_small_partitions():
+    # 每批 3 筆：bitset 的位元組跨越批次邊界
+    rows = _tickets(50)
+    data, _ = _build(rows, size=3)
+    assert TicketManifestService.parse_manifest(data)["tickets"] == rows
+    assert data == _build(rows)[0]
+
+
+def test_delta_header_and_filter():
+    rows = _tickets(5)
+    since = 1_792_309_000_000_000
+    data, db = _build(rows, since=since)
+    manifest = TicketManifestService.parse_manifest(data)
+    assert manifest["delta"] is True
+    assert manifest["since"] == since
+    assert manifest["tickets"] == rows
+    # 差異查詢以索引運算式比較（參數轉換成欄位的時間基準，不轉換欄位）
+    sql = str(db.statements[0].compile(dialect=postgresql.dialect()))
+    assert "coalesce(tickets.updated_at, tickets.created_at) >= timezone(current_setting(" in sql
+    assert "CAST(tickets" not in sql
+
+
+def test_record_size():
+    data, _ = _build(_tickets(16))
+    # header 32 + 16 筆 x 12 bytes + bitset 2 + count 4 + mac 32
+    assert len(data) == 32 + 16 * 12 + 2 + 4 + 32
+
+
+@pytest.mark.parametrize("position", [0, 4, 8, 12, 20, 40, -40, -33, -1])
+def test_tampered_byte_is_rejected(position):
+    data = bytearray(_build(_tickets(20))[0])
+    data[position] ^= 0x01
+    with pytest.raises(ValueError):
+        TicketManifestService.parse_manifest(bytes(data))
+
+
+def test_flipped_used_bit_is_rejected():
+    rows = _tickets(20)
+    data = bytearray(_build(rows)[0])
+    bitset_offset = 32 + 20 * 12
+    data[bitset_offset] ^= 0x01
+    with pytest.raises(ValueError, match="signature"):
+        TicketManifestService.parse_manifest(bytes(data))
+    # 不驗證簽章時可解析，但該票券的使用狀態已被竄改
+    tampered = TicketManifestService.parse_manifest(bytes(data), verify=False)["tickets"]
+    assert tampered[0][2] != rows[0][2]
+
+
+def test_signature_depends_on_key(monkeypatch):
+    data, _ = _build(_tickets(10))
+    monkeypatch.setattr(ticket_manifest_service, "_MANIFEST_KEY", b"another key")
+    with pytest.raises(ValueError, match="signature"):
+        TicketManifestService.parse_manifest(data)
+
+
+@pytest.mark.parametrize("length", [0, 10, 67])
+def test_truncated_manifest_is_rejected(length):
+    data, _ = _build(_tickets(3))
+    with pytest.raises(ValueError):
+        TicketManifestService.parse_manifest(data[:length])
+
+
+def test_unsupported_version_is_rejected(monkeypatch):
+    monkeypatch.setattr(ticket_manifest_service, "MANIFEST_VERSION", MANIFEST_VERSION + 1)
+    data, _ = _build(_tickets(3))
+    monkeypatch.setattr(ticket_manifest_service, "MANIFEST_VERSION", MANIFEST_VERSION)
+    with pytest.raises(ValueError, match="Unsupported"):
+        TicketManifestService.parse_manifest(data)
+
+
+def test_etag_depends_only_on_state():
+    etag = TicketManifestService.make_etag(46, 100, 123, 9)
+    assert etag == TicketManifestService.make_etag(46, 100, 123, 9)
+    assert len({etag, TicketManifestService.make_etag(46, 101, 123, 9), TicketManifestService.make_etag(46, 100, 124, 9),
+                TicketManifestService.make_etag(47, 100, 123, 9)}) == 4
+
+
+def test_etag_changes_with_version_alone():
+    # 較晚提交的交易不一定改變總數與最新變更時間，但一定會累加計數器的 changes
+    assert TicketManifestService.make_etag(46, 100, 123, 9) != TicketManifestService.make_etag(46, 100, 123, 10)
@@ -3,4 +3,5 @@
 """
 from .auth import create_access_token, create_qr_token, verify_token, decode_qr_token
 from .qr_code import generate_qr_code, generate_ticket_qr_url
-from .security import verify_password, get_password_hash, generate_login_code, generate_ticket_code
+from .security import verify_password, get_password_hash, generate_login_code
+from .ticket_code import generate_ticket_code, normalize_ticket_code
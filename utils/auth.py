@@ -1,6 +1,11 @@
 """
 JWT token 相關工具
 """
+import hmac
+import time
+import base64
+import struct
+import hashlib
 from datetime import datetime, timedelta
 from typing import Union, Any
 from jose import jwt, JWTError
@@ -20,9 +25,52 @@ def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def create_qr_token(ticket_uuid: int, event_id: int) -> str:
-    """建立 QR Code 用的 JWT token (使用 Snowflake ID)"""
-    expire = datetime.utcnow() + timedelta(hours=settings.QR_TOKEN_EXPIRE_HOURS)
+# 精簡 QR token：版本(1) + ticket uuid(8) + event id(4) + 過期時間秒數(4) + 截斷 HMAC-SHA256(8)
+# 共 25 bytes，base32 後為 40 個 QR 英數模式字元（無 padding），L 級容錯只需 version 2 (25x25)
+QR_TOKEN_VERSION = 1
+_QR_TOKEN_BODY = struct.Struct(">BQII")
+_QR_TOKEN_MAC_SIZE = 8
+_QR_TOKEN_SIZE = _QR_TOKEN_BODY.size + _QR_TOKEN_MAC_SIZE
+# 以衍生金鑰簽章，避免與 JWT 共用同一把 HMAC 金鑰
+_QR_TOKEN_KEY = hmac.new(settings.SECRET_KEY.encode(), b"qr-token-v1", hashlib.sha256).digest()
+
+
+def qr_token_window(now: Union[float, None] = None) -> tuple:
+    """
+    目前 QR token 時間窗的 (開始, 結束) Unix 秒數。同一個時間窗內產生的 token 過期時間相同，
+    因此同一張票券的 token（與其 QR 圖片）在時間窗內不變，可被快取；有效期介於
+    QR_TOKEN_EXPIRE_HOURS 減一個時間窗與 QR_TOKEN_EXPIRE_HOURS 之間。
+    """
+    now = time.time() if now is None else now
+    # 時間窗不超過有效期的一半，避免 token 一產生就接近過期
+    window = max(min(settings.QR_TOKEN_WINDOW_SECONDS, settings.QR_TOKEN_EXPIRE_HOURS * 1800), 1)
+    start = int(now) // window * window
+    return start, start + window
+
+def qr_token_expire() -> int:
+    """目前時間窗產生的 QR token 過期時間（Unix 秒）"""
+    start, _ = qr_token_window()
+    return start + settings.QR_TOKEN_EXPIRE_HOURS * 3600
+
+def create_qr_token(ticket_uuid: int, event_id: int, expire: Union[int, None] = None) -> str:
+    """
+    建立 QR Code 用的 token (使用 Snowflake ID)，格式由 QR_TOKEN_FORMAT 決定。
+    expire 為過期時間（Unix 秒），未提供時依 QR token 時間窗計算。
+    """
+    if settings.QR_TOKEN_FORMAT == "jwt":
+        return create_jwt_qr_token(ticket_uuid, event_id, expire)
+    return create_compact_qr_token(ticket_uuid, event_id, expire)
+
+def create_compact_qr_token(ticket_uuid: int, event_id: int, expire: Union[int, None] = None) -> str:
+    """建立精簡二進位簽章的 QR token（僅含 A-Z、2-7）"""
+    expire = qr_token_expire() if expire is None else expire
+    body = _QR_TOKEN_BODY.pack(QR_TOKEN_VERSION, ticket_uuid, event_id, expire)
+    mac = hmac.new(_QR_TOKEN_KEY, body, hashlib.sha256).digest()[:_QR_TOKEN_MAC_SIZE]
+    return base64.b32encode(body + mac).decode("ascii")
+
+def create_jwt_qr_token(ticket_uuid: int, event_id: int, expire: Union[int, None] = None) -> str:
+    """建立舊版 JWT 格式的 QR token"""
+    expire = qr_token_expire() if expire is None else expire
     payload = {
         "ticket_uuid": ticket_uuid,
         "event_id": event_id,
@@ -41,6 +89,12 @@ def decode_qr_token(token: str) -> dict:
         detail="Could not validate QR token",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    # JWT 一定含有 "."，精簡格式的 base32 字元集則不會出現
+    if "." not in token:
+        payload = _decode_compact_qr_token(token)
+        if payload is None:
+            raise credentials_exception
+        return payload
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         if payload.get("type") != "qr_token":
@@ -51,6 +105,28 @@ def decode_qr_token(token: str) -> dict:
     except JWTError:
         raise credentials_exception
 
+def _decode_compact_qr_token(token: str) -> Union[dict, None]:
+    """驗證精簡格式 QR token，簽章錯誤、版本不符或已過期時回傳 None"""
+    try:
+        raw = base64.b32decode(token.strip().upper())
+    except (ValueError, TypeError):
+        return None
+    if len(raw) != _QR_TOKEN_SIZE:
+        return None
+    body, mac = raw[:_QR_TOKEN_BODY.size], raw[_QR_TOKEN_BODY.size:]
+    expected = hmac.new(_QR_TOKEN_KEY, body, hashlib.sha256).digest()[:_QR_TOKEN_MAC_SIZE]
+    if not hmac.compare_digest(mac, expected):
+        return None
+    version, ticket_uuid, event_id, expire = _QR_TOKEN_BODY.unpack(body)
+    if version != QR_TOKEN_VERSION or expire < time.time():
+        return None
+    return {
+        "ticket_uuid": ticket_uuid,
+        "event_id": event_id,
+        "exp": expire,
+        "type": "qr_token"
+    }
+
 def verify_token(token: str) -> dict:
     """
     驗證並解碼 access token。
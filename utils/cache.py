@@ -0,0 +1,105 @@
+"""
+行程內快取工具
+"""
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+from app.config import settings
+
+
+class TTLCache:
+    """
+    有容量上限的 TTL 快取（LRU 淘汰），執行緒安全，並記錄命中 / 未命中次數。
+    僅在單一行程內有效，多 worker 部署時各自獨立，資料最久延遲 ttl 秒。
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """取得快取值，不存在或已過期時回傳 None"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """寫入快取，超過容量時淘汰最久未使用的項目"""
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """移除單一快取項目"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """清空快取"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """回傳命中統計"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+# 已驗證員工身分快取：token subject (staff_id) -> StaffProfile
+staff_principal_cache = TTLCache(
+    maxsize=settings.STAFF_PRINCIPAL_CACHE_SIZE,
+    ttl=settings.STAFF_PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+
+def invalidate_staff_principal(staff_id: int) -> None:
+    """員工資料更新或停用時清除其快取身分"""
+    staff_principal_cache.invalidate(str(staff_id))
+
+
+# 掃描 session 撤銷狀態快取：staff_id -> 撤銷時間（與員工身分快取使用相同的容量與 TTL）
+scan_session_cache = TTLCache(
+    maxsize=settings.STAFF_PRINCIPAL_CACHE_SIZE,
+    ttl=settings.STAFF_PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+
+def invalidate_scan_sessions(staff_id: int) -> None:
+    """撤銷掃描 session 後清除快取狀態（其他 worker 最久延遲 TTL 秒）"""
+    scan_session_cache.invalidate(staff_id)
+
+
+# 公開票券查詢快取：ticket uuid -> (TicketPublic, 最後修改時間)
+public_ticket_cache = TTLCache(
+    maxsize=settings.PUBLIC_TICKET_CACHE_SIZE,
+    ttl=settings.PUBLIC_TICKET_CACHE_TTL_SECONDS
+)
+
+
+def invalidate_public_ticket(ticket_uuid: int) -> None:
+    """票券更新、刪除或簽到狀態改變時清除其公開快取（其他 worker 最久延遲 TTL 秒）"""
+    public_ticket_cache.invalidate(ticket_uuid)
@@ -0,0 +1,63 @@
+"""
+HTTP 快取工具（ETag / Last-Modified / 條件式請求）
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+
+def strong_etag(value: str) -> str:
+    """以雜湊值等識別字串建立強 ETag"""
+    return f'"{value}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match 是否符合 ETag（RFC 9110 弱比較：忽略 W/ 前綴）。
+    符合時應回傳 304 Not Modified。
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def as_utc(value: datetime) -> datetime:
+    """資料庫的 naive 時間一律視為 UTC"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def http_date(value: datetime) -> str:
+    """Last-Modified 等標頭使用的 HTTP 日期（IMF-fixdate）"""
+    return format_datetime(as_utc(value).replace(microsecond=0), usegmt=True)
+
+
+def not_modified(
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    etag: str,
+    last_modified: Optional[datetime] = None
+) -> bool:
+    """
+    條件式 GET 是否可回傳 304。
+    有 If-None-Match 時只比對 ETag（RFC 9110 13.2.2），否則以秒為精度比對 If-Modified-Since。
+    """
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    if not if_modified_since or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return as_utc(last_modified).replace(microsecond=0) <= since
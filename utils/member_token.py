@@ -0,0 +1,41 @@
+"""
+會員 token 工具
+
+商戶後端（例如 LINE 整合）以 API Key 為自己的會員（external_user_id）簽發 token，
+會員以此 token 呼叫公開端點查詢自己在該商戶的票券，不需要知道個別票券的 uuid。
+token 限定商戶，僅能查詢該商戶活動的票券。
+"""
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from jose import jwt, JWTError
+from app.config import settings
+
+MEMBER_TOKEN_TYPE = "member"
+
+
+def create_member_token(merchant_id: int, external_user_id: str, expires_minutes: Optional[int] = None) -> Tuple[str, datetime]:
+    """建立會員 token，回傳 (token, 過期時間)"""
+    expire = datetime.utcnow() + timedelta(minutes=expires_minutes or settings.MEMBER_TOKEN_EXPIRE_MINUTES)
+    payload = {
+        "sub": external_user_id,
+        "type": MEMBER_TOKEN_TYPE,
+        "merchant_id": merchant_id,
+        "exp": expire
+    }
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM), expire
+
+
+def decode_member_token(token: str) -> Optional[dict]:
+    """解碼並驗證會員 token，簽章錯誤、過期或類型不符時回傳 None"""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("type") != MEMBER_TOKEN_TYPE:
+        return None
+    try:
+        merchant_id = int(payload["merchant_id"])
+        external_user_id = str(payload["sub"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return {"merchant_id": merchant_id, "external_user_id": external_user_id}
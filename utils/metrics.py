@@ -0,0 +1,223 @@
+"""
+Prometheus 格式的行程內指標
+
+不依賴 prometheus_client：提供 Counter / Gauge / Histogram 三種基本型別，
+以 /metrics 端點輸出 text exposition format (0.0.4)。
+每次觀測只做一次 bisect 與加法（持鎖），開銷在微秒以下，可常駐於正式環境。
+指標為單一行程內的資料，多 worker 部署時由 Prometheus 分別抓取各 worker 後加總。
+"""
+import time
+import threading
+import functools
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 預設延遲分桶（秒），涵蓋記憶體命中（<1ms）到逾時等級的請求
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """指標基底：名稱、說明、標籤名稱與各標籤組合的值"""
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Sequence[str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(v) for v in labels)
+
+    def clear(self) -> None:
+        """清除所有標籤組合（用於每次抓取重建的快照型指標）"""
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in sorted(items):
+            lines.extend(self._render_sample(labels, value))
+        return lines
+
+    def _render_sample(self, labels: Tuple[str, ...], value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """只增不減的計數器"""
+    type_name = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """可增可減的量測值"""
+    type_name = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """分桶直方圖（各桶只記錄落在該桶的次數，輸出時再累加）"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [各桶次數..., +Inf 桶次數, 總和]
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[slot] += 1
+            state[-1] += value
+
+    def _render_sample(self, labels: Tuple[str, ...], state) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+            cumulative += count
+            le = _format_labels(self.labelnames, labels, ("le", _format_value(bound)))
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+        plain = _format_labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{plain} {_format_value(state[-1])}")
+        lines.append(f"{self.name}_count{plain} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """指標註冊表；collector 會在每次抓取時被呼叫，用來更新快照型的 gauge"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"⚠️ [WARN] 指標收集失敗: {e}")
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.",
+    ("method", "route", "status")
+))
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.", ("method",)
+))
+DB_POOL_CHECKOUT_WAIT = REGISTRY.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled DB connection.", ("pool",),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+))
+DB_POOL_CONNECTIONS = REGISTRY.register(Gauge(
+    "db_pool_connections", "DB pool connections by state (in_use, idle, overflow, size).", ("pool", "state")
+))
+SERVICE_METHOD_DURATION = REGISTRY.register(Histogram(
+    "service_method_duration_seconds", "Service method execution time.", ("service", "method")
+))
+CHECKIN_OUTCOMES = REGISTRY.register(Counter(
+    "checkin_outcomes_total", "Check-in results by entry point and status.", ("source", "status")
+))
+RATE_LIMIT_REJECTIONS = REGISTRY.register(Counter(
+    "rate_limit_rejections_total", "Requests rejected by the rate limiter, by route group and deciding backend.",
+    ("group", "backend")
+))
+RATE_LIMIT_BACKEND_ERRORS = REGISTRY.register(Counter(
+    "rate_limit_backend_errors_total", "Shared rate limit backend failures (requests were allowed).", ("group",)
+))
+
+
+def render_metrics() -> str:
+    """輸出所有指標（Prometheus text format）"""
+    return REGISTRY.render()
+
+
+def record_checkin_outcome(source: str, status: str) -> None:
+    """記錄一筆簽到結果；source 為 single / batch / sync"""
+    CHECKIN_OUTCOMES.inc(source, status)
+
+
+def observe_pool_wait(pool_name: str, seconds: float) -> None:
+    DB_POOL_CHECKOUT_WAIT.observe(seconds, pool_name)
+
+
+def instrument_service(cls, service_name: Optional[str] = None):
+    """
+    為 service 類別的公開 staticmethod 加上執行時間量測。
+    以類別裝飾器使用；底線開頭的內部方法不量測。
+    """
+    service_name = service_name or cls.__name__
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith("_") or not isinstance(value, staticmethod):
+            continue
+        setattr(cls, attr, staticmethod(_timed(value.__func__, service_name, attr)))
+    return cls
+
+
+def _timed(func: Callable, service_name: str, method_name: str) -> Callable:
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            SERVICE_METHOD_DURATION.observe(time.perf_counter() - start, service_name, method_name)
+    return wrapper
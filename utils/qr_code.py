@@ -2,23 +2,57 @@
 QR Code generation utility
 """
 import qrcode
-import random
-import string
-from io import BytesIO
 from base64 import b64encode
-from typing import Optional
+from typing import List, Optional
+from utils.qr_raster import matrix_to_png, matrix_to_svg
 
-def generate_ticket_code(length: int = 8) -> str:
+QR_IMAGE_MEDIA_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+def _make_qr(data: str, border: int):
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr
+
+def build_qr_matrix(data: str, border: int = 4) -> List[List[bool]]:
     """
-    Generate a random ticket code
-    
+    Build the QR Code module matrix (True = dark), including a `border`-module quiet zone
+    """
+    return _make_qr(data, border).get_matrix()
+
+def render_qr_png(data: str, size: int = 10, border: int = 4) -> bytes:
+    """
+    Render a QR Code as 1-bit PNG bytes (written directly from the module matrix, without PIL)
+
     Args:
-        length: Length of the ticket code (default: 8)
-        
-    Returns:
-        Random alphanumeric ticket code
+        data: Data to encode
+        size: QR Code size (pixels per module)
+        border: Border size (modules)
     """
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
+    return matrix_to_png(build_qr_matrix(data, border), size)
+
+def render_qr_svg(data: str, size: int = 10, border: int = 4) -> bytes:
+    """
+    Render a QR Code as SVG bytes (single path on a white background).
+    The viewBox is measured in modules; `size` sets the width/height in pixels.
+    """
+    return matrix_to_svg(build_qr_matrix(data, border), size)
+
+def render_qr_image(data: str, image_format: str = "png", size: int = 10, border: int = 4) -> bytes:
+    """
+    Render a QR Code in the given format ("png" or "svg").
+    Module-level so it can run in a process pool.
+    """
+    if image_format == "svg":
+        return render_qr_svg(data, size, border)
+    return render_qr_png(data, size, border)
 
 def generate_qr_code(data: str, size: int = 10, border: int = 4) -> str:
     """
@@ -32,22 +66,7 @@ def generate_qr_code(data: str, size: int = 10, border: int = 4) -> str:
     Returns:
         base64 encoded PNG image string
     """
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=size,
-        border=border,
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert to base64
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    img_str = b64encode(buffer.getvalue()).decode()
-    
+    img_str = b64encode(render_qr_png(data, size, border)).decode()
     return f"data:image/png;base64,{img_str}"
 
 def generate_ticket_qr_url(base_url: str, qr_token: str) -> str:
@@ -68,23 +87,4 @@ def generate_qr_code_response(data: str):
     Generate QR Code and return FastAPI Response
     """
     from fastapi.responses import Response
-    import qrcode
-    from io import BytesIO
-    
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert to PNG bytes
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    
-    return Response(content=buffer.getvalue(), media_type="image/png")
+    return Response(content=render_qr_png(data), media_type="image/png")
@@ -0,0 +1,117 @@
+"""
+QR Code 點陣輸出（不經過 PIL）
+
+qrcode 模組產生的是布林矩陣，原本的做法是建立 PIL 影像、逐模組畫方塊再編碼成 PNG。
+這裡直接由矩陣寫出 PNG：
+- 每 8 個模組打包成 1 個位元組，再查表放大成 box_size 個位元組（水平放大不逐像素處理）
+- 每種模組列只組一次掃描線，垂直放大的重複列以 Up 濾波寫成全 0 的位元組
+- 整張影像只呼叫一次 zlib.compress，手動寫出 IHDR / PLTE / IDAT / IEND
+- 預設為 1-bit 灰階；指定顏色時輸出 1-bit 調色盤 PNG
+SVG 則輸出單一 path：每列連續的深色模組合併成一個矩形子路徑。
+"""
+import zlib
+import struct
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+Color = Tuple[int, int, int]
+
+# 模組（bool 轉成的 0 / 1 位元組）→ 位元字串
+_MODULE_BITS = bytes.maketrans(b"\x00\x01", b"01")
+
+
+@lru_cache(maxsize=32)
+def _expand_table(box_size: int) -> List[bytes]:
+    """
+    8 個模組（1 個位元組，1 = 深色）→ 放大後的 8 x box_size 個像素，剛好是 box_size 個位元組。
+    像素值 0 = 深色（灰階黑 / 調色盤索引 0），1 = 淺色。
+    """
+    table = []
+    for value in range(256):
+        bits = "".join(("0" if value >> (7 - i) & 1 else "1") * box_size for i in range(8))
+        table.append(int(bits, 2).to_bytes(box_size, "big"))
+    return table
+
+
+def _chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+
+def matrix_to_png(
+    matrix: Sequence[Sequence[bool]],
+    box_size: int = 10,
+    fill_color: Optional[Color] = None,
+    back_color: Optional[Color] = None,
+    compress_level: int = 6
+) -> bytes:
+    """
+    將 QR 矩陣（True = 深色，含留白）輸出為 1-bit PNG，每個模組 box_size x box_size 像素。
+    未指定顏色時為黑白灰階；指定 fill_color / back_color（RGB）時輸出調色盤 PNG。
+    """
+    modules = len(matrix)
+    width = modules * box_size
+    row_bytes = (width + 7) // 8
+    module_bytes = (modules + 7) // 8
+    padding = b"\x00" * (-modules % 8)
+    expand = _expand_table(box_size)
+
+    # 同一模組列放大後的其餘 box_size - 1 條掃描線與上一條相同，使用 Up 濾波（2）即為全 0，壓縮幾乎不花時間
+    repeat = (b"\x02" + bytes(row_bytes)) * (box_size - 1)
+    rows = []
+    cache = {}
+    for row in matrix:
+        packed = bytes(row) + padding
+        scanline = cache.get(packed)
+        if scanline is None:
+            bits = int(packed.translate(_MODULE_BITS), 2).to_bytes(module_bytes, "big")
+            scanline = b"\x00" + b"".join([expand[byte] for byte in bits])[:row_bytes]
+            cache[packed] = scanline
+        rows.append(scanline)
+        rows.append(repeat)
+    pixels = zlib.compress(b"".join(rows), compress_level)
+
+    palette = fill_color is not None or back_color is not None
+    color_type = 3 if palette else 0
+    header = struct.pack(">IIBBBBB", width, width, 1, color_type, 0, 0, 0)
+    chunks = [_PNG_SIGNATURE, _chunk(b"IHDR", header)]
+    if palette:
+        chunks.append(_chunk(b"PLTE", bytes(fill_color or (0, 0, 0)) + bytes(back_color or (255, 255, 255))))
+    chunks.append(_chunk(b"IDAT", pixels))
+    chunks.append(_chunk(b"IEND", b""))
+    return b"".join(chunks)
+
+
+def matrix_to_svg_path(matrix: Sequence[Sequence[bool]]) -> str:
+    """深色模組的 SVG path（以模組為單位，每段連續的深色模組一個矩形子路徑）"""
+    parts: List[str] = []
+    for y, row in enumerate(matrix):
+        x = 0
+        length = len(row)
+        while x < length:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < length and row[x]:
+                x += 1
+            parts.append(f"M{start} {y}h{x - start}v1h{start - x}z")
+    return "".join(parts)
+
+
+def matrix_to_svg(
+    matrix: Sequence[Sequence[bool]],
+    box_size: int = 10,
+    fill_color: str = "#000",
+    back_color: str = "#fff"
+) -> bytes:
+    """將 QR 矩陣輸出為 SVG（白底 + 單一 path），viewBox 以模組為單位，寬高為 modules x box_size 像素"""
+    modules = len(matrix)
+    size = modules * box_size
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {modules} {modules}" shape-rendering="crispEdges">'
+        f'<rect width="{modules}" height="{modules}" fill="{back_color}"/>'
+        f'<path fill="{fill_color}" d="{matrix_to_svg_path(matrix)}"/></svg>'
+    ).encode()
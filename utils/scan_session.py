@@ -0,0 +1,77 @@
+"""
+掃描 session token 工具
+
+員工裝置以登入 JWT 換取短效、限定單一活動的掃描 token，
+token 內嵌 StaffEvent 權限，簽到 / 撤銷時不必逐次查詢權限。
+撤銷時間記錄在 staff / staff_events 的 scan_sessions_valid_after（所有 worker 共用），
+在此之前簽發的 token 一律失效；員工停用、刪除或活動權限被移除時 token 也失效。
+驗證時讀取的撤銷狀態以 STAFF_PRINCIPAL_CACHE_TTL_SECONDS 快取，
+撤銷在處理請求的 worker 立即生效，其他 worker 最久延遲一個 TTL。
+"""
+import time
+from datetime import datetime, timedelta
+from typing import Tuple, Optional
+from jose import jwt, JWTError
+from app.config import settings
+
+SCAN_SESSION_TOKEN_TYPE = "scan_session"
+
+
+def create_scan_session_token(staff_id: int, event_id: int, can_checkin: bool, can_revoke: bool) -> Tuple[str, datetime]:
+    """建立掃描 session token，回傳 (token, 過期時間)"""
+    expire = datetime.utcnow() + timedelta(minutes=settings.SCAN_SESSION_EXPIRE_MINUTES)
+    payload = {
+        "sub": str(staff_id),
+        "type": SCAN_SESSION_TOKEN_TYPE,
+        "event_id": event_id,
+        "can_checkin": bool(can_checkin),
+        "can_revoke": bool(can_revoke),
+        # 使用毫秒精度，避免與同一秒內的撤銷互相混淆
+        "iat": round(time.time(), 3),
+        "exp": expire
+    }
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM), expire
+
+
+def decode_scan_session_payload(payload: dict) -> Optional[dict]:
+    """
+    驗證已解碼的掃描 session payload，回傳 staff_id、event_id、權限與簽發時間 issued_at。
+    payload 類型不符或欄位缺漏時回傳 None；撤銷由 is_scan_session_revoked 另外檢查。
+    """
+    if payload.get("type") != SCAN_SESSION_TOKEN_TYPE:
+        return None
+    try:
+        staff_id = int(payload["sub"])
+        event_id = int(payload["event_id"])
+        issued_at = float(payload["iat"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return {
+        "staff_id": staff_id,
+        "event_id": event_id,
+        "can_checkin": bool(payload.get("can_checkin")),
+        "can_revoke": bool(payload.get("can_revoke")),
+        "issued_at": issued_at
+    }
+
+
+def decode_scan_session_token(token: str) -> Optional[dict]:
+    """解碼掃描 session token，無效時回傳 None（不檢查撤銷）"""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    return decode_scan_session_payload(payload)
+
+
+def is_scan_session_revoked(state: dict, event_id: int, issued_at: float) -> bool:
+    """
+    依員工的掃描 session 狀態（StaffService.get_scan_session_state）檢查在 issued_at 簽發的 token 是否失效。
+    沒有該活動的權限（含員工不存在或已停用）時視為已撤銷。
+    """
+    if event_id not in state["events"]:
+        return True
+    for valid_after in (state["valid_after"], state["events"][event_id]):
+        if valid_after is not None and issued_at <= valid_after:
+            return True
+    return False
@@ -19,8 +19,3 @@ def generate_login_code(length: int = 8) -> str:
     """生成隨機登入碼"""
     characters = string.ascii_uppercase + string.digits
     return ''.join(secrets.choice(characters) for _ in range(length))
-
-def generate_ticket_code(length: int = 12) -> str:
-    """生成票券代碼"""
-    characters = string.ascii_uppercase + string.digits
-    return ''.join(secrets.choice(characters) for _ in range(length))
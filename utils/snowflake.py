@@ -1,51 +1,154 @@
 """
 Snowflake ID 生成器
 基於 Twitter Snowflake 演算法，生成 64-bit 唯一 ID
+
+64-bit 結構：1-bit符號 + 41-bit時間戳 + 10-bit worker ID（5-bit資料中心 + 5-bit機器）+ 12-bit序號。
+同一個 worker ID 同時只能有一個程序使用，worker ID 依序由以下來源決定：
+1. SNOWFLAKE_WORKER_ID 環境變數（0 ~ 1023，由部署指定）
+2. 應用程式啟動時向資料庫租用（services/snowflake_worker_service，多個 worker / 容器不會重複）
+3. 以上皆無時（例如獨立腳本）由主機名稱與 PID 推導，不保證唯一
+
+時鐘小幅回撥（SNOWFLAKE_MAX_CLOCK_BACKWARD_MS 以內）時沿用上次的時間戳繼續配發，
+超過容許範圍才拋出 ClockMovedBackwardsError。
 """
+import os
 import time
+import zlib
+import socket
 import threading
-from typing import Optional
+from typing import List, Optional
+from app.config import settings
+
+MAX_WORKER_ID = 0x3FF  # 10 bits
+_MAX_SEQUENCE = 0xFFF  # 12 bits
+
+
+class ClockMovedBackwardsError(Exception):
+    """系統時鐘回撥超過容許範圍"""
+
+
+class WorkerLeaseExpiredError(Exception):
+    """worker ID 的租約已過期（未能及時續約），停止配發以免與接手的程序重複"""
+
+
+def _default_worker_id() -> int:
+    """未指定 worker ID 時，由主機名稱與 PID 推導（盡量分散，但不保證唯一）"""
+    if settings.SNOWFLAKE_WORKER_ID is not None:
+        return settings.SNOWFLAKE_WORKER_ID & MAX_WORKER_ID
+    return zlib.crc32(f"{socket.gethostname()}:{os.getpid()}".encode()) & MAX_WORKER_ID
+
 
 class SnowflakeIDGenerator:
-    def __init__(self, machine_id: int = 1, datacenter_id: int = 1):
-        # 64-bit 結構：1-bit符號 + 41-bit時間戳 + 5-bit資料中心 + 5-bit機器 + 12-bit序號
+    def __init__(self, machine_id: int = 1, datacenter_id: int = 1, max_clock_backward_ms: int = 0):
         self.machine_id = machine_id & 0x1F      # 5 bits
         self.datacenter_id = datacenter_id & 0x1F # 5 bits
-        self.sequence = 0                         # 12 bits
+        self.sequence = 0                         # 目前毫秒內下一個可用的序號
         self.last_timestamp = -1
         self.epoch = 1609459200000  # 2021-01-01 00:00:00 UTC (毫秒)
+        self.max_clock_backward_ms = max_clock_backward_ms
+        self.lease_valid_until: Optional[float] = None  # time.monotonic()；None 表示不檢查租約
         self.lock = threading.Lock()
-    
-    def generate_id(self) -> int:
+
+    @property
+    def worker_id(self) -> int:
+        return (self.datacenter_id << 5) | self.machine_id
+
+    def set_worker_id(self, worker_id: int, not_before_ms: int = 0, lease_valid_until: Optional[float] = None) -> None:
+        """
+        切換 worker ID（例如取得新的租約）。not_before_ms 為該 worker ID 前一個使用者最後使用的時間戳，
+        之後配發的 ID 時間戳一律大於它。
+        """
         with self.lock:
-            timestamp = int(time.time() * 1000)
-            
-            if timestamp < self.last_timestamp:
-                raise Exception("時鐘回撥，無法生成 ID")
-            
-            if timestamp == self.last_timestamp:
-                self.sequence = (self.sequence + 1) & 0xFFF  # 12 bits
-                if self.sequence == 0:
-                    # 等待下一毫秒
-                    while timestamp <= self.last_timestamp:
-                        timestamp = int(time.time() * 1000)
-            else:
-                self.sequence = 0
-            
+            if worker_id != self.worker_id:
+                self.datacenter_id = (worker_id >> 5) & 0x1F
+                self.machine_id = worker_id & 0x1F
+                self.last_timestamp = max(self.last_timestamp, not_before_ms)
+                self.sequence = _MAX_SEQUENCE + 1  # 下一個 ID 使用新的毫秒
+            self.lease_valid_until = lease_valid_until
+
+    def renew_lease(self, lease_valid_until: Optional[float]) -> None:
+        with self.lock:
+            self.lease_valid_until = lease_valid_until
+
+    def _tick(self) -> int:
+        """取得可配發的時間戳（呼叫前需持有 lock），確保該毫秒還有可用的序號"""
+        if self.lease_valid_until is not None and time.monotonic() > self.lease_valid_until:
+            raise WorkerLeaseExpiredError(f"Snowflake worker {self.worker_id} lease expired")
+
+        timestamp = int(time.time() * 1000)
+        if timestamp > self.last_timestamp:
             self.last_timestamp = timestamp
-            
+            self.sequence = 0
+            return timestamp
+
+        if self.last_timestamp - timestamp > self.max_clock_backward_ms:
+            raise ClockMovedBackwardsError(
+                f"時鐘回撥 {self.last_timestamp - timestamp} ms，無法生成 ID"
+            )
+        if self.sequence > _MAX_SEQUENCE:
+            # 本毫秒序號用盡：在容許範圍內預借下一毫秒，否則等待時鐘追上
+            while self.last_timestamp + 1 - timestamp > self.max_clock_backward_ms:
+                time.sleep(0.0001)
+                timestamp = int(time.time() * 1000)
+            self.last_timestamp = max(self.last_timestamp + 1, timestamp)
+            self.sequence = 0
+        return self.last_timestamp
+
+    def generate_id(self) -> int:
+        with self.lock:
+            timestamp = self._tick()
+            sequence = self.sequence
+            self.sequence += 1
             # 組合 ID
-            return ((timestamp - self.epoch) << 22) | (self.datacenter_id << 17) | (self.machine_id << 12) | self.sequence
+            return ((timestamp - self.epoch) << 22) | (self.datacenter_id << 17) | (self.machine_id << 12) | sequence
+
+    def generate_many(self, count: int) -> List[int]:
+        """一次配發 count 個遞增的 ID（每毫秒整段保留序號，不必逐一取得 lock 與時間）"""
+        ids: List[int] = []
+        with self.lock:
+            worker_bits = (self.datacenter_id << 17) | (self.machine_id << 12)
+            while len(ids) < count:
+                timestamp = self._tick()
+                take = min(count - len(ids), _MAX_SEQUENCE + 1 - self.sequence)
+                base = ((timestamp - self.epoch) << 22) | worker_bits
+                ids.extend(range(base + self.sequence, base + self.sequence + take))
+                self.sequence += take
+        return ids
 
 # 全域實例
 _snowflake_generator = None
+_generator_lock = threading.Lock()
 
 def get_snowflake_generator() -> SnowflakeIDGenerator:
     global _snowflake_generator
     if _snowflake_generator is None:
-        _snowflake_generator = SnowflakeIDGenerator()
+        with _generator_lock:
+            if _snowflake_generator is None:
+                worker_id = _default_worker_id()
+                _snowflake_generator = SnowflakeIDGenerator(
+                    machine_id=worker_id & 0x1F,
+                    datacenter_id=worker_id >> 5,
+                    max_clock_backward_ms=settings.SNOWFLAKE_MAX_CLOCK_BACKWARD_MS
+                )
     return _snowflake_generator
 
+def _reset_after_fork() -> None:
+    # fork 出的子程序不沿用父程序的 worker ID 與序號狀態
+    global _snowflake_generator, _generator_lock
+    _snowflake_generator = None
+    _generator_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
 def generate_snowflake_id() -> int:
     """生成 Snowflake ID"""
-    return get_snowflake_generator().generate_id()
\ No newline at end of file
+    return get_snowflake_generator().generate_id()
+
+def generate_snowflake_ids(count: int) -> List[int]:
+    """一次生成 count 個 Snowflake ID（批次產票使用）"""
+    return get_snowflake_generator().generate_many(count)
+
+def snowflake_timestamp_ms(snowflake_id: int) -> int:
+    """取出 Snowflake ID 內嵌的生成時間（Unix 毫秒）"""
+    return (snowflake_id >> 22) + get_snowflake_generator().epoch
@@ -0,0 +1,117 @@
+"""
+票券代碼
+
+票券代碼由票券的 Snowflake uuid 推導：以金鑰化的 Feistel 置換（64-bit，可逆）打散 uuid，
+再以 Crockford base32 編碼成 13 個字元，最後附加一個 Luhn mod 32 檢查碼，共 14 個字元。
+
+- uuid 唯一，置換為雙射，因此代碼不需查詢資料庫即保證唯一
+- 代碼不透露 uuid 的時間順序，沒有金鑰無法由代碼推回 uuid
+- 檢查碼可偵測所有單一字元錯誤與大部分相鄰字元對調，人工輸入的錯誤在查詢資料庫前即可拒絕
+- 輸入時忽略大小寫、空白與連字號，並將 O / I / L 視為 0 / 1 / 1（Crockford 規則）
+
+舊版隨機代碼（8 或 12 個字元）沒有檢查碼，仍可照原樣查詢。
+"""
+import hmac
+import hashlib
+from typing import Optional
+from app.config import settings
+
+TICKET_CODE_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+TICKET_CODE_LENGTH = 14  # 13 個資料字元 + 1 個檢查碼
+
+# 舊版 generate_ticket_code 產生的代碼長度（utils/qr_code: 8、utils/security: 12）
+LEGACY_TICKET_CODE_LENGTHS = (8, 12)
+
+_BASE = len(TICKET_CODE_ALPHABET)
+_DATA_LENGTH = TICKET_CODE_LENGTH - 1
+_VALUES = {char: value for value, char in enumerate(TICKET_CODE_ALPHABET)}
+_VALUES.update({"O": 0, "I": 1, "L": 1})
+_ROUNDS = 4
+_MASK32 = 0xFFFFFFFF
+
+_round_hashes: Optional[list] = None
+
+
+def _round_hash(round_index: int):
+    """各回合的金鑰化 blake2b 狀態（由 SECRET_KEY 衍生，首次使用時建立後複製使用）"""
+    global _round_hashes
+    if _round_hashes is None:
+        key = hmac.new(settings.SECRET_KEY.encode(), b"ticket-code-v1", hashlib.sha256).digest()
+        _round_hashes = [
+            hashlib.blake2b(bytes((index,)), key=key, digest_size=4) for index in range(_ROUNDS)
+        ]
+    return _round_hashes[round_index].copy()
+
+
+def _round(value: int, round_index: int) -> int:
+    digest = _round_hash(round_index)
+    digest.update(value.to_bytes(4, "big"))
+    return int.from_bytes(digest.digest(), "big")
+
+
+def _permute(value: int) -> int:
+    left, right = value >> 32, value & _MASK32
+    for round_index in range(_ROUNDS):
+        left, right = right, left ^ _round(right, round_index)
+    return (left << 32) | right
+
+
+def _unpermute(value: int) -> int:
+    left, right = value >> 32, value & _MASK32
+    for round_index in reversed(range(_ROUNDS)):
+        left, right = right ^ _round(left, round_index), left
+    return (left << 32) | right
+
+
+def _check_char(data: str) -> str:
+    """Luhn mod 32 檢查碼"""
+    total = 0
+    factor = 2
+    for char in reversed(data):
+        addend = factor * _VALUES[char]
+        total += addend // _BASE + addend % _BASE
+        factor = 1 if factor == 2 else 2
+    return TICKET_CODE_ALPHABET[(_BASE - total % _BASE) % _BASE]
+
+
+def generate_ticket_code(ticket_uuid: int) -> str:
+    """由票券 uuid 產生票券代碼"""
+    value = _permute(ticket_uuid & 0xFFFFFFFFFFFFFFFF)
+    chars = []
+    for _ in range(_DATA_LENGTH):
+        value, digit = divmod(value, _BASE)
+        chars.append(TICKET_CODE_ALPHABET[digit])
+    data = "".join(reversed(chars))
+    return data + _check_char(data)
+
+
+def normalize_ticket_code(code: str) -> Optional[str]:
+    """
+    整理人工輸入的票券代碼：去除空白與連字號並轉為大寫。
+    新版代碼會套用 Crockford 對照並驗證檢查碼，錯誤時回傳 None；
+    舊版長度的代碼原樣回傳，其他長度回傳 None。
+    """
+    code = "".join(code.split()).replace("-", "").upper()
+    if len(code) in LEGACY_TICKET_CODE_LENGTHS:
+        return code
+    if len(code) != TICKET_CODE_LENGTH:
+        return None
+    if any(char not in _VALUES for char in code):
+        return None
+    code = "".join(TICKET_CODE_ALPHABET[_VALUES[char]] for char in code)
+    if _check_char(code[:-1]) != code[-1]:
+        return None
+    return code
+
+
+def ticket_uuid_from_code(code: str) -> Optional[int]:
+    """由新版票券代碼還原票券 uuid（代碼無效或為舊版代碼時回傳 None）"""
+    code = normalize_ticket_code(code)
+    if code is None or len(code) != TICKET_CODE_LENGTH:
+        return None
+    value = 0
+    for char in code[:-1]:
+        value = value * _BASE + _VALUES[char]
+    if value >> 64:
+        return None
+    return _unpermute(value)